@@ -6,6 +6,7 @@ from django.db.models import Q, F
 from .models import Annotation
 from .serializers import AnnotationSerializer
 from .annotation_filter import AnnotationFilter
+from core.response_cache import CachedListMixin
 
 
 def generic_filter(queryset, query_params):
@@ -59,7 +60,7 @@ class AnnotationCount(APIView):
         return Response({"count": count}, status=status.HTTP_200_OK)
 
 
-class AnnotationViewSet(viewsets.ModelViewSet):
+class AnnotationViewSet(CachedListMixin, viewsets.ModelViewSet):
     """
     This endpoint can be used to get existing annotations together with the image url under constraints for example
     for creating datasets for ML
@@ -73,6 +74,7 @@ class AnnotationViewSet(viewsets.ModelViewSet):
 
     queryset = Annotation.objects.all()
     serializer_class = AnnotationSerializer
+    cache_log_path = "image__frame__log"
 
     def get_queryset(self):
         qs = Annotation.objects.all()
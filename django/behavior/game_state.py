@@ -0,0 +1,73 @@
+"""
+Builds the GameStateTimeline of a log from the decide_game_state option.
+"""
+
+from django.db import connection
+
+from .models import GameStateTimeline
+
+GAME_STATE_OPTION = "decide_game_state"
+
+
+def build_game_state_timeline(log_id):
+    """
+    (Re)computes the game state transitions of a log in one query and stores them.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT frame_id, frame_number, frame_time, state FROM (
+                SELECT
+                    f.id AS frame_id,
+                    f.frame_number,
+                    f.frame_time,
+                    s.name AS state,
+                    LAG(s.name) OVER (ORDER BY f.frame_number) AS previous_state
+                FROM behavior_behaviorframeoption bfo
+                JOIN behavior_behavioroption o ON o.id = bfo.options_id_id
+                JOIN behavior_behavioroptionstate s ON s.id = bfo.active_state_id
+                JOIN cognition_cognitionframe f ON f.id = bfo.frame_id
+                WHERE o.log_id = %s AND o.option_name = %s
+            ) states
+            WHERE previous_state IS DISTINCT FROM state
+            ORDER BY frame_number;
+            """,
+            [log_id, GAME_STATE_OPTION],
+        )
+        transitions = [
+            {
+                "state": state,
+                "frame": frame_id,
+                "frame_number": frame_number,
+                "frame_time": frame_time,
+            }
+            for frame_id, frame_number, frame_time, state in cursor.fetchall()
+        ]
+
+    def first(state):
+        return next((t for t in transitions if t["state"] == state), {})
+
+    standby = first("standby")
+    playing = first("playing")
+
+    timeline, _ = GameStateTimeline.objects.update_or_create(
+        log_id=log_id,
+        defaults={
+            "first_standby_frame_id": standby.get("frame"),
+            "first_standby_time": standby.get("frame_time"),
+            "first_playing_frame_id": playing.get("frame"),
+            "first_playing_time": playing.get("frame_time"),
+            "transitions": transitions,
+        },
+    )
+    return timeline
+
+
+def get_game_state_timeline(log_id):
+    """
+    Returns the stored timeline of a log, logs ingested before the timeline existed get it built on first use.
+    """
+    timeline = GameStateTimeline.objects.filter(log_id=log_id).first()
+    if timeline is None:
+        timeline = build_game_state_timeline(log_id)
+    return timeline
@@ -0,0 +1,111 @@
+"""
+Maintains BehaviorStateInterval, the run length encoded form of BehaviorFrameOption.
+
+Intervals are computed with a gaps and islands query: behavior frames of a log are ranked by frame
+number, rows of the same option and state whose rank minus their row number within the option and
+state is equal belong to the same stretch of consecutive frames.
+
+Ingest only adds BehaviorFrameOption rows, so a batch only changes the intervals that overlap or
+touch its frame range. update_intervals deletes those and recomputes the region they cover.
+"""
+
+from django.db import connection, transaction
+
+from .models import BehaviorStateInterval
+
+HAS_BEHAVIOR = """
+    EXISTS (SELECT 1 FROM behavior_behaviorframeoption bfo WHERE bfo.frame_id = f.id)
+"""
+
+NEIGHBOUR_FRAMES_QUERY = f"""
+    SELECT
+        (SELECT max(f.frame_number) FROM cognition_cognitionframe f
+         WHERE f.log_id = %(log)s AND f.frame_number < %(first)s AND {HAS_BEHAVIOR}),
+        (SELECT min(f.frame_number) FROM cognition_cognitionframe f
+         WHERE f.log_id = %(log)s AND f.frame_number > %(last)s AND {HAS_BEHAVIOR})
+"""
+
+DELETE_QUERY = """
+    DELETE FROM behavior_behaviorstateinterval
+    WHERE log_id = %(log)s AND last_frame >= %(first)s AND first_frame <= %(last)s
+    RETURNING first_frame, last_frame
+"""
+
+INSERT_QUERY = """
+    WITH frame_options AS (
+        SELECT
+            bfo.options_id_id AS option_id,
+            bfo.active_state_id AS state_id,
+            f.frame_number,
+            f.frame_time,
+            dense_rank() OVER (ORDER BY f.frame_number) AS frame_rank
+        FROM behavior_behaviorframeoption bfo
+        JOIN cognition_cognitionframe f ON f.id = bfo.frame_id
+        WHERE f.log_id = %(log)s AND f.frame_number BETWEEN %(first)s AND %(last)s
+    ), islands AS (
+        SELECT *, frame_rank - row_number() OVER (
+            PARTITION BY option_id, state_id ORDER BY frame_number
+        ) AS island
+        FROM frame_options
+    )
+    INSERT INTO behavior_behaviorstateinterval
+        (log_id, option_id, state_id, first_frame, last_frame, start_time, end_time)
+    SELECT
+        %(log)s, option_id, state_id,
+        min(frame_number), max(frame_number), min(frame_time), max(frame_time)
+    FROM islands
+    GROUP BY option_id, state_id, island
+"""
+
+
+def update_intervals(log_id, first_frame=None, last_frame=None):
+    """
+    Recomputes the intervals of a log after rows for frames between first_frame and last_frame
+    were added. Without a range, or if the log has no intervals yet (e.g. it was ingested before
+    the table existed), all intervals of the log are rebuilt.
+    Returns the number of intervals written.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        if (
+            first_frame is None
+            or last_frame is None
+            or not BehaviorStateInterval.objects.filter(log=log_id).exists()
+        ):
+            BehaviorStateInterval.objects.filter(log=log_id).delete()
+            first_frame, last_frame = -(2**31), 2**31 - 1
+        else:
+            # intervals ending right before or starting right after the range can grow into it
+            params = {"log": log_id, "first": first_frame, "last": last_frame}
+            cursor.execute(NEIGHBOUR_FRAMES_QUERY, params)
+            previous_frame, next_frame = cursor.fetchone()
+            if previous_frame is not None:
+                params["first"] = previous_frame
+            if next_frame is not None:
+                params["last"] = next_frame
+
+            # deleted intervals widen the region, which can overlap further intervals
+            while True:
+                cursor.execute(DELETE_QUERY, params)
+                deleted = cursor.fetchall()
+                if not deleted:
+                    break
+                for deleted_first, deleted_last in deleted:
+                    params["first"] = min(params["first"], deleted_first)
+                    params["last"] = max(params["last"], deleted_last)
+            first_frame, last_frame = params["first"], params["last"]
+
+        cursor.execute(
+            INSERT_QUERY, {"log": log_id, "first": first_frame, "last": last_frame}
+        )
+        return cursor.rowcount
+
+
+def get_intervals(log_id):
+    """
+    Returns the intervals of a log, logs ingested before the table existed get them built on first
+    use.
+    """
+    intervals = BehaviorStateInterval.objects.filter(log=log_id)
+    if not intervals.exists():
+        update_intervals(log_id)
+    return intervals
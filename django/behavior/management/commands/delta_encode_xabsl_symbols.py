@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from behavior.models import XabslSymbolSparse
+from behavior.symbol_deltas import KEYFRAME_INTERVAL, delta_encode, full_snapshots
+from common.models import Log
+from core.bulk import bulk_update
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrites the full XabslSymbolSparse snapshots of logs as keyframes and deltas, "
+        "run VACUUM on the table afterwards to give the space back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("log_ids", nargs="*", type=int)
+        parser.add_argument(
+            "--all", action="store_true", help="process the symbols of all logs"
+        )
+        parser.add_argument(
+            "--keyframe-interval",
+            type=int,
+            default=KEYFRAME_INTERVAL,
+            help="number of frames between keyframes",
+        )
+
+    def handle(self, *args, **options):
+        log_ids = options["log_ids"]
+        if options["all"]:
+            log_ids = list(Log.objects.order_by("id").values_list("id", flat=True))
+        if not log_ids:
+            self.stderr.write("you need to provide log ids or --all")
+            return
+
+        for log_id in log_ids:
+            rows = XabslSymbolSparse.objects.filter(frame__log=log_id)
+            if rows.filter(keyframe=False).exists():
+                self.stdout.write(f"log {log_id}: already delta encoded")
+                continue
+            encoded = delta_encode(full_snapshots(log_id), options["keyframe_interval"])
+            with transaction.atomic():
+                updated = bulk_update(
+                    XabslSymbolSparse,
+                    [
+                        {
+                            "id": row_id,
+                            "data": data,
+                            "keyframe": keyframe,
+                            "removed": removed,
+                        }
+                        for row_id, data, keyframe, removed in encoded
+                    ],
+                )
+            self.stdout.write(f"log {log_id}: encoded {len(updated)} frames")
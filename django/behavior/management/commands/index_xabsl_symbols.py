@@ -0,0 +1,43 @@
+from django.db import connection
+from django.db.models import Index
+from django.db.models.fields.json import KeyTransform
+from django.core.management.base import BaseCommand
+
+from behavior.models import XabslSymbolSparse
+from behavior.symbol_query import symbol_index_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates expression indexes on XabslSymbolSparse for symbols that are often filtered "
+        "with comparisons, equality filters are covered by the GIN index on data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("symbols", nargs="+")
+        parser.add_argument(
+            "--drop", action="store_true", help="remove the indexes of the symbols"
+        )
+
+    def handle(self, *args, **options):
+        table = XabslSymbolSparse._meta.db_table
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(cursor, table)
+
+        # concurrently so ingest is not blocked while large tables are indexed
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for symbol in options["symbols"]:
+                index = Index(
+                    KeyTransform(symbol, "data"), name=symbol_index_name(symbol)
+                )
+                if options["drop"]:
+                    if index.name in existing:
+                        schema_editor.remove_index(
+                            XabslSymbolSparse, index, concurrently=True
+                        )
+                    self.stdout.write(f"{symbol}: dropped {index.name}")
+                elif index.name in existing:
+                    self.stdout.write(f"{symbol}: {index.name} already exists")
+                else:
+                    schema_editor.add_index(XabslSymbolSparse, index, concurrently=True)
+                    self.stdout.write(f"{symbol}: created {index.name}")
@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-18 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("behavior", "0002_initial"),
+        ("cognition", "0010_representationchunk"),
+        ("common", "0032_experiment_experiment_folder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameStateTimeline",
+            fields=[
+                (
+                    "log",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="game_state_timeline",
+                        serialize=False,
+                        to="common.log",
+                    ),
+                ),
+                ("first_standby_time", models.IntegerField(blank=True, null=True)),
+                ("first_playing_time", models.IntegerField(blank=True, null=True)),
+                ("transitions", models.JSONField(blank=True, null=True)),
+                (
+                    "first_playing_frame",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="cognition.cognitionframe",
+                    ),
+                ),
+                (
+                    "first_standby_frame",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="cognition.cognitionframe",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "GameStateTimeline",
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 6.0 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+# the old bulk endpoints could insert the same option or state more than once, the duplicates are
+# merged into the row with the lowest id before the constraints are created
+MERGE_DUPLICATES = """
+CREATE TEMP TABLE option_map ON COMMIT DROP AS
+SELECT id, min(id) OVER (
+    PARTITION BY log_id, xabsl_internal_option_id, option_name
+) AS keep_id
+FROM behavior_behavioroption;
+
+UPDATE behavior_behavioroptionstate s SET option_id_id = m.keep_id
+FROM option_map m WHERE s.option_id_id = m.id AND m.id <> m.keep_id;
+
+CREATE TEMP TABLE state_map ON COMMIT DROP AS
+SELECT id, min(id) OVER (
+    PARTITION BY option_id_id, xabsl_internal_state_id, name
+) AS keep_id
+FROM behavior_behavioroptionstate;
+
+-- frame options that end up with the same option, frame and state are dropped
+DELETE FROM behavior_behaviorframeoption f
+USING (
+    SELECT f.id, row_number() OVER (
+        PARTITION BY om.keep_id, f.frame_id, sm.keep_id ORDER BY f.id
+    ) AS n
+    FROM behavior_behaviorframeoption f
+    JOIN option_map om ON om.id = f.options_id_id
+    JOIN state_map sm ON sm.id = f.active_state_id
+) d
+WHERE f.id = d.id AND d.n > 1;
+
+UPDATE behavior_behaviorframeoption f
+SET options_id_id = om.keep_id, active_state_id = sm.keep_id
+FROM option_map om, state_map sm
+WHERE om.id = f.options_id_id AND sm.id = f.active_state_id
+AND (om.id <> om.keep_id OR sm.id <> sm.keep_id);
+
+DELETE FROM behavior_behavioroptionstate s USING state_map m
+WHERE s.id = m.id AND m.id <> m.keep_id;
+
+DELETE FROM behavior_behavioroption o USING option_map m
+WHERE o.id = m.id AND m.id <> m.keep_id;
+
+DROP TABLE option_map;
+DROP TABLE state_map;
+
+-- run the deferred foreign key checks now, the table can not be altered with pending checks
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("behavior", "0003_gamestatetimeline"),
+        ("common", "0033_logrepresentationcount"),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_DUPLICATES, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="behavioroption",
+            constraint=models.UniqueConstraint(
+                fields=("log", "xabsl_internal_option_id", "option_name"),
+                name="unique_behavior_option",
+                nulls_distinct=False,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="behavioroptionstate",
+            constraint=models.UniqueConstraint(
+                fields=("option_id", "xabsl_internal_state_id", "name"),
+                name="unique_behavior_option_state",
+                nulls_distinct=False,
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0 on 2026-10-18 17:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("behavior", "0004_unique_behavior_options"),
+        ("common", "0033_logrepresentationcount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BehaviorStateInterval",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("first_frame", models.IntegerField()),
+                ("last_frame", models.IntegerField()),
+                ("start_time", models.IntegerField(blank=True, null=True)),
+                ("end_time", models.IntegerField(blank=True, null=True)),
+                (
+                    "log",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="behavior_state_intervals",
+                        to="common.log",
+                    ),
+                ),
+                (
+                    "option",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="state_intervals",
+                        to="behavior.behavioroption",
+                    ),
+                ),
+                (
+                    "state",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="state_intervals",
+                        to="behavior.behavioroptionstate",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["log", "option", "state"],
+                        name="behavior_be_log_id_a26e90_idx",
+                    ),
+                    models.Index(
+                        fields=["log", "first_frame", "last_frame"],
+                        name="behavior_be_log_id_ec5295_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
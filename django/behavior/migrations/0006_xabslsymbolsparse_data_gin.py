@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 17:35
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("behavior", "0005_behaviorstateinterval"),
+        ("cognition", "0011_cognitionframe_cognition_c_log_id_129cb4_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="xabslsymbolsparse",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["data"],
+                name="xabslsymbolsparse_data_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+        ),
+    ]
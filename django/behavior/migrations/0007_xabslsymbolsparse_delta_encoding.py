@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("behavior", "0006_xabslsymbolsparse_data_gin"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="xabslsymbolsparse",
+            name="keyframe",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="xabslsymbolsparse",
+            name="removed",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from common.models import Log
 from cognition.models import CognitionFrame
@@ -16,6 +17,16 @@ class BehaviorOption(models.Model):
     xabsl_internal_option_id = models.IntegerField(blank=True, null=True)
     option_name = models.CharField(max_length=40, blank=True, null=True)
 
+    class Meta:
+        # conflict target of the bulk upsert, the ids are often not sent
+        constraints = [
+            models.UniqueConstraint(
+                fields=["log", "xabsl_internal_option_id", "option_name"],
+                nulls_distinct=False,
+                name="unique_behavior_option",
+            )
+        ]
+
     def __str__(self):
         return f"{self.log}-{self.option_name}"
 
@@ -32,6 +43,16 @@ class BehaviorOptionState(models.Model):
     name = models.CharField(max_length=40, blank=True, null=True)
     target = models.BooleanField(blank=True, null=True)
 
+    class Meta:
+        # conflict target of the bulk upsert, an option belongs to a single log
+        constraints = [
+            models.UniqueConstraint(
+                fields=["option_id", "xabsl_internal_state_id", "name"],
+                nulls_distinct=False,
+                name="unique_behavior_option_state",
+            )
+        ]
+
     def __str__(self):
         return f"{self.log}-{self.name}"
 
@@ -65,6 +86,34 @@ class BehaviorFrameOption(models.Model):
         unique_together = ("options_id", "frame", "active_state")
 
 
+class BehaviorStateInterval(models.Model):
+    """
+    Run length encoded BehaviorFrameOption rows: one row per stretch of consecutive behavior frames
+    in which an option was active in the same state. Derived from BehaviorFrameOption on ingest,
+    see behavior/intervals.py.
+    """
+
+    log = models.ForeignKey(
+        Log, on_delete=models.CASCADE, related_name="behavior_state_intervals"
+    )
+    option = models.ForeignKey(
+        BehaviorOption, on_delete=models.CASCADE, related_name="state_intervals"
+    )
+    state = models.ForeignKey(
+        BehaviorOptionState, on_delete=models.CASCADE, related_name="state_intervals"
+    )
+    first_frame = models.IntegerField()
+    last_frame = models.IntegerField()
+    start_time = models.IntegerField(blank=True, null=True)
+    end_time = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["log", "option", "state"]),
+            models.Index(fields=["log", "first_frame", "last_frame"]),
+        ]
+
+
 class XabslSymbolComplete(models.Model):
     log = models.OneToOneField(
         Log,
@@ -86,6 +135,9 @@ class XabslSymbolSparse(models.Model):
         CognitionFrame, on_delete=models.CASCADE, related_name="xabsl_symbol_sparse"
     )
     data = models.JSONField(blank=True, null=True)
+    # delta encoded rows only hold the changed symbols, see behavior/symbol_deltas.py
+    keyframe = models.BooleanField(default=True)
+    removed = models.JSONField(blank=True, null=True)
 
     class Meta:
         verbose_name_plural = "XabslSymbolSparse"
@@ -94,3 +146,46 @@ class XabslSymbolSparse(models.Model):
                 fields=["frame"], name="unique_frame_id_xabslsymbolsparse"
             )
         ]
+        indexes = [
+            # answers the containment checks of symbol equality filters
+            GinIndex(
+                fields=["data"],
+                opclasses=["jsonb_path_ops"],
+                name="xabslsymbolsparse_data_gin",
+            ),
+        ]
+
+
+class GameStateTimeline(models.Model):
+    """
+    Materialized game state timeline of a log, derived from the decide_game_state option in
+    BehaviorFrameOption. The first standby frame is the anchor for synchronizing logs with videos.
+    """
+
+    log = models.OneToOneField(
+        Log,
+        on_delete=models.CASCADE,
+        related_name="game_state_timeline",
+        primary_key=True,
+    )
+    first_standby_frame = models.ForeignKey(
+        CognitionFrame,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    first_standby_time = models.IntegerField(blank=True, null=True)
+    first_playing_frame = models.ForeignKey(
+        CognitionFrame,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    first_playing_time = models.IntegerField(blank=True, null=True)
+    # list of {"state", "frame", "frame_number", "frame_time"} for every change of the game state
+    transitions = models.JSONField(blank=True, null=True)
+
+    class Meta:
+        verbose_name_plural = "GameStateTimeline"
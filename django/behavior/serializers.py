@@ -7,12 +7,16 @@ class BehaviorOptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.BehaviorOption
         fields = "__all__"
+        # existing rows are returned by create instead of being rejected
+        validators = []
 
 
 class BehaviorOptionsStateSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.BehaviorOptionState
         fields = "__all__"
+        # existing rows are returned by create instead of being rejected
+        validators = []
 
 
 class BehaviorFrameOptionSerializer(serializers.ModelSerializer):
@@ -37,6 +41,15 @@ class BehaviorFrameOptionCustomSerializer(serializers.ModelSerializer):
         fields = ["frame"]
 
 
+class BehaviorStateIntervalSerializer(serializers.ModelSerializer):
+    option_name = serializers.CharField(source="option.option_name", read_only=True)
+    state_name = serializers.CharField(source="state.name", read_only=True)
+
+    class Meta:
+        model = models.BehaviorStateInterval
+        fields = "__all__"
+
+
 class XabslSymbolCompleteSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.XabslSymbolComplete
@@ -47,3 +60,9 @@ class XabslSymbolSparseSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.XabslSymbolSparse
         fields = "__all__"
+
+
+class GameStateTimelineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.GameStateTimeline
+        fields = "__all__"
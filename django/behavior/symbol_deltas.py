@@ -0,0 +1,277 @@
+"""
+Delta encoding of XabslSymbolSparse.
+
+Most symbols keep their value for many frames, so instead of a full snapshot per frame a log can
+store keyframes with the full symbol state and, in between, rows that only hold the symbols that
+changed since the previous frame. Symbols that disappear are listed in removed.
+
+The first frame of every upload is a keyframe and a keyframe is written every KEYFRAME_INTERVAL
+frames, which bounds the number of rows that have to be replayed to get the state at a frame.
+Rows are replayed in frame order, so a delta row is applied on top of whatever row is stored
+before it. Uploads of separate frame ranges can arrive in any order, but a delta upload may not
+interleave with the rows already stored for its log and no upload may put rows in between a
+stored row and the delta row following it, see check_upload.
+"""
+
+import json
+
+from django.db import connection
+
+from cognition.models import CognitionFrame
+from common.models import Log
+
+from .models import XabslSymbolSparse
+from .symbol_query import matches, parse_condition
+
+KEYFRAME_INTERVAL = 100
+
+KEYFRAME_QUERY = """
+    SELECT max(f.frame_number)
+    FROM behavior_xabslsymbolsparse s
+    JOIN cognition_cognitionframe f ON f.id = s.frame_id
+    WHERE f.log_id = %(log)s AND f.frame_number <= %(first)s AND s.keyframe
+"""
+
+# frames whose next stored row is a delta row, a row stored at them would break its chain
+NEXT_DELTA_QUERY = """
+    SELECT u.log_id, u.frame_number
+    FROM unnest(%(logs)s::bigint[], %(frame_numbers)s::bigint[]) AS u(log_id, frame_number)
+    CROSS JOIN LATERAL (
+        SELECT s.keyframe
+        FROM behavior_xabslsymbolsparse s
+        JOIN cognition_cognitionframe f ON f.id = s.frame_id
+        WHERE f.log_id = u.log_id AND f.frame_number > u.frame_number
+        ORDER BY f.frame_number
+        LIMIT 1
+    ) next
+    WHERE NOT next.keyframe
+    ORDER BY u.log_id, u.frame_number
+"""
+
+# with symbols only the given keys of data are sent over the wire
+REPLAY_QUERY = """
+    SELECT
+        s.id,
+        f.frame_number,
+        s.keyframe,
+        s.removed,
+        CASE WHEN %(symbols)s::text[] IS NULL OR jsonb_typeof(s.data) <> 'object'
+        THEN s.data ELSE (
+            SELECT coalesce(jsonb_object_agg(key, value), '{}'::jsonb)
+            FROM jsonb_each(s.data)
+            WHERE key = ANY(%(symbols)s::text[])
+        ) END
+    FROM behavior_xabslsymbolsparse s
+    JOIN cognition_cognitionframe f ON f.id = s.frame_id
+    WHERE f.log_id = %(log)s AND f.frame_number BETWEEN %(start)s AND %(last)s
+    ORDER BY f.frame_number
+"""
+
+
+def _changed(old, new):
+    # 1 == True in python, but they are different symbol values
+    return type(old) is not type(new) or old != new
+
+
+def delta_encode(snapshots, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Turns (id, data) snapshots of one log in frame order into (id, data, keyframe, removed)
+    rows, the id is passed through unchanged.
+    """
+    previous = None
+    since_keyframe = 0
+    for row_id, data in snapshots:
+        data = data or {}
+        if previous is None or since_keyframe >= keyframe_interval:
+            since_keyframe = 0
+            yield row_id, data, True, None
+        else:
+            changed = {
+                key: value
+                for key, value in data.items()
+                if key not in previous or _changed(previous[key], value)
+            }
+            removed = [key for key in previous if key not in data]
+            yield row_id, changed, False, removed or None
+        since_keyframe += 1
+        previous = data
+
+
+def upload_frames(rows):
+    """
+    Returns {frame id: (log id, frame number)} of the rows of an upload.
+    """
+    return {
+        frame_id: (log_id, frame_number)
+        for frame_id, log_id, frame_number in CognitionFrame.objects.filter(
+            id__in={row["frame"] for row in rows}
+        ).values_list("id", "log_id", "frame_number")
+    }
+
+
+def check_upload(frames, delta):
+    """
+    Raises ValueError if rows stored at frames ({frame id: (log id, frame number)}) would end up
+    between a stored row and the delta row replayed on top of it, or, for delta uploads, if rows
+    are already stored anywhere between the first and last frame of the upload of a log. Locks
+    the logs, call it in the transaction that stores the rows.
+    """
+    by_log = {}
+    for log_id, frame_number in frames.values():
+        by_log.setdefault(log_id, []).append(frame_number)
+    list(Log.objects.select_for_update().filter(id__in=by_log).order_by("id"))
+
+    if delta:
+        for log_id, frame_numbers in by_log.items():
+            stored = (
+                XabslSymbolSparse.objects.filter(
+                    frame__log=log_id,
+                    frame__frame_number__range=(min(frame_numbers), max(frame_numbers)),
+                )
+                .order_by("frame__frame_number")
+                .values_list("frame__frame_number", flat=True)
+            )
+            if stored.exists():
+                raise ValueError(
+                    f"log {log_id} already has symbols at frames {list(stored[:10])} "
+                    "within the uploaded frames"
+                )
+        # the rows of the upload form one chain, only its last row can be followed by stored rows
+        candidates = [
+            (log_id, max(frame_numbers)) for log_id, frame_numbers in by_log.items()
+        ]
+    else:
+        # rows at frames that are already stored are skipped on insert
+        stored = set(
+            XabslSymbolSparse.objects.filter(frame__in=frames).values_list(
+                "frame_id", flat=True
+            )
+        )
+        delta_logs = set(
+            XabslSymbolSparse.objects.filter(frame__log__in=by_log, keyframe=False)
+            .values_list("frame__log", flat=True)
+            .distinct()
+        )
+        candidates = [
+            (log_id, frame_number)
+            for frame_id, (log_id, frame_number) in frames.items()
+            if frame_id not in stored and log_id in delta_logs
+        ]
+    if not candidates:
+        return
+
+    logs, frame_numbers = zip(*candidates)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            NEXT_DELTA_QUERY, {"logs": list(logs), "frame_numbers": list(frame_numbers)}
+        )
+        conflicts = cursor.fetchall()
+    if conflicts:
+        log_id = conflicts[0][0]
+        frame_numbers = [n for log, n in conflicts if log == log_id][:10]
+        raise ValueError(
+            f"frames {frame_numbers} of log {log_id} are in between delta encoded symbols "
+            "that are already stored"
+        )
+
+
+def encode_upload(rows, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Delta encodes the rows of an upload ({"frame": id, "data": {...}}), which may contain frames
+    of several logs in any order. Raises ValueError for unknown frames and uploads that interleave
+    with the stored rows, see check_upload.
+    """
+    frames = upload_frames(rows)
+    missing = {row["frame"] for row in rows} - frames.keys()
+    if missing:
+        raise ValueError(f"unknown frames {sorted(missing)}")
+    check_upload(frames, delta=True)
+
+    by_log = {}
+    for row in sorted(rows, key=lambda row: frames[row["frame"]]):
+        by_log.setdefault(frames[row["frame"]][0], []).append(
+            (row["frame"], row["data"])
+        )
+    for snapshots in by_log.values():
+        yield from delta_encode(snapshots, keyframe_interval)
+
+
+def _replay(log_id, first_frame, last_frame, symbols):
+    """
+    Yields (id, frame_number, state) from the last keyframe at or before first_frame up to
+    last_frame. state is updated in place.
+    """
+    symbols = list(symbols) if symbols else None
+    with connection.cursor() as cursor:
+        cursor.execute(KEYFRAME_QUERY, {"log": log_id, "first": first_frame})
+        start = cursor.fetchone()[0]
+        cursor.execute(
+            REPLAY_QUERY,
+            {
+                "log": log_id,
+                "start": -(2**31) if start is None else start,
+                "last": last_frame,
+                "symbols": symbols,
+            },
+        )
+        state = {}
+        for row_id, frame_number, keyframe, removed, data in cursor:
+            # django leaves decoding jsonb to the fields, raw queries get the text
+            if keyframe:
+                state.clear()
+            if data is not None:
+                state.update(json.loads(data) or {})
+            if removed is not None:
+                for key in json.loads(removed) or []:
+                    state.pop(key, None)
+            yield row_id, frame_number, state
+
+
+def symbol_state(log_id, frame_number, symbols=None):
+    """
+    Returns the symbol values at frame_number (the last stored frame at or before it), restricted
+    to symbols if given.
+    """
+    state = {}
+    for _, _, state in _replay(log_id, frame_number, frame_number, symbols):
+        pass
+    return dict(state)
+
+
+def symbol_states(log_id, first_frame, last_frame, symbols=None):
+    """
+    Yields (frame_number, values) for every stored frame between first_frame and last_frame.
+    """
+    for _, frame_number, state in _replay(log_id, first_frame, last_frame, symbols):
+        if frame_number >= first_frame:
+            yield frame_number, dict(state)
+
+
+def full_snapshots(log_id, first_frame=-(2**31), last_frame=2**31 - 1):
+    """
+    Yields (id, data) with the full symbol state of every row of a log between first_frame and
+    last_frame.
+    """
+    for row_id, frame_number, state in _replay(log_id, first_frame, last_frame, None):
+        if frame_number >= first_frame:
+            yield row_id, dict(state)
+
+
+def is_delta_encoded(log_id):
+    return XabslSymbolSparse.objects.filter(frame__log=log_id, keyframe=False).exists()
+
+
+def matching_rows(log_id, conditions, first_frame=-(2**31), last_frame=2**31 - 1):
+    """
+    Returns (id, frame_number) of the rows of a log between first_frame and last_frame whose full
+    symbol state fulfills all conditions, see symbol_query.matches. Raises ValueError for
+    malformed conditions.
+    """
+    conditions = [parse_condition(condition) for condition in conditions]
+    return [
+        (row_id, frame_number)
+        for row_id, frame_number, state in _replay(
+            log_id, first_frame, last_frame, None
+        )
+        if frame_number >= first_frame and matches(state, conditions)
+    ]
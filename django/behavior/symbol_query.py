@@ -0,0 +1,129 @@
+"""
+Filters on the symbol values of XabslSymbolSparse that are executed in PostgreSQL.
+
+A condition is written as <symbol><operator><value>, e.g. ball.was_seen==true or robot_pose.x>1000.
+The symbol is the key in the data of a frame, dots are part of the xabsl symbol name. The value is
+parsed as JSON, anything that is not valid JSON is compared as a string.
+
+Equality compiles to a containment check (data @> '{"symbol": value}') which is answered by the
+GIN jsonb_path_ops index on data. Comparisons compile to (data -> 'symbol') > value and only
+match values of the same JSON type. They can use an expression index on data -> 'symbol', see the
+index_xabsl_symbols command for symbols that are filtered often.
+
+Between keyframes the rows of delta encoded logs only hold the symbols that changed (see
+behavior/symbol_deltas.py), so the conditions can not be checked on the stored rows. For these logs
+the symbol state of every frame is replayed and checked with matches, which follows the semantics
+of the sql conditions (strings are compared by code point instead of the database collation).
+"""
+
+import hashlib
+import json
+import operator
+import re
+
+from django.db.models import CharField, Func, Q
+from django.db.models.fields.json import KeyTransform
+
+# longer operators first so >= is not read as >
+CONDITION_PATTERN = re.compile(
+    r"^\s*(?P<symbol>.+?)\s*(?P<op>==|!=|>=|<=|>|<)\s*(?P<value>.*?)\s*$"
+)
+COMPARISON_LOOKUPS = {">": "gt", ">=": "gte", "<": "lt", "<=": "lte"}
+COMPARISON_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+JSON_TYPES = {
+    bool: "boolean",
+    int: "number",
+    float: "number",
+    str: "string",
+    type(None): "null",
+    list: "array",
+    dict: "object",
+}
+
+
+class JsonbTypeof(Func):
+    function = "jsonb_typeof"
+    output_field = CharField()
+
+
+def parse_condition(condition):
+    """
+    Splits a condition into (symbol, operator, value), raises ValueError if it is malformed.
+    """
+    match = CONDITION_PATTERN.match(condition)
+    if not match or not match["symbol"] or not match["value"]:
+        raise ValueError(
+            f"invalid condition {condition!r}, expected <symbol><op><value>"
+        )
+    try:
+        value = json.loads(match["value"])
+    except json.JSONDecodeError:
+        value = match["value"]
+    if isinstance(value, (list, dict)) or (
+        value is None and match["op"] in COMPARISON_LOOKUPS
+    ):
+        raise ValueError(f"can not compare {match['symbol']} with {match['value']}")
+    return match["symbol"], match["op"], value
+
+
+def filter_symbols(queryset, conditions):
+    """
+    Returns the queryset restricted to the rows whose data fulfills all conditions.
+    """
+    aliases = {}
+    filters = Q()
+    for i, condition in enumerate(conditions):
+        symbol, op, value = parse_condition(condition)
+        if op == "==":
+            filters &= Q(data__contains={symbol: value})
+        elif op == "!=":
+            filters &= Q(data__has_key=symbol) & ~Q(data__contains={symbol: value})
+        else:
+            aliases[f"symbol_{i}"] = KeyTransform(symbol, "data")
+            aliases[f"symbol_type_{i}"] = JsonbTypeof(KeyTransform(symbol, "data"))
+            filters &= Q(
+                **{
+                    f"symbol_{i}__{COMPARISON_LOOKUPS[op]}": value,
+                    f"symbol_type_{i}": JSON_TYPES[type(value)],
+                }
+            )
+    if aliases:
+        queryset = queryset.alias(**aliases)
+    return queryset.filter(filters)
+
+
+def _equal(a, b):
+    # 1 == True in python, but jsonb keeps them apart
+    return JSON_TYPES[type(a)] == JSON_TYPES[type(b)] and a == b
+
+
+def matches(data, conditions):
+    """
+    Returns whether the symbol values in data fulfill all conditions, given as returned by
+    parse_condition. The counterpart of filter_symbols for symbol states that are not stored as
+    rows.
+    """
+    for symbol, op, value in conditions:
+        if symbol not in data:
+            return False
+        current = data[symbol]
+        if op == "==":
+            matched = _equal(current, value)
+        elif op == "!=":
+            matched = not _equal(current, value)
+        else:
+            same_type = JSON_TYPES[type(current)] == JSON_TYPES[type(value)]
+            matched = same_type and COMPARISON_OPERATORS[op](current, value)
+        if not matched:
+            return False
+    return True
+
+
+def symbol_index_name(symbol):
+    digest = hashlib.sha1(symbol.encode()).hexdigest()[:12]
+    return f"xabsl_symbol_{digest}"
@@ -10,6 +10,16 @@ urlpatterns = [
         views.BehaviorFrameOptionAPIView.as_view(),
         name="behavior-filter",
     ),
+    path(
+        "behavior/intervals/",
+        views.BehaviorStateIntervalView.as_view(),
+        name="behavior-intervals",
+    ),
+    path(
+        "behavior/active-options/",
+        views.BehaviorActiveOptionsView.as_view(),
+        name="behavior-active-options",
+    ),
     path(
         "behavior/count/", views.BehaviorFrameCountView.as_view(), name="behavior-count"
     ),
@@ -26,5 +36,6 @@ router.register("behavior-option-state", views.BehaviorOptionStateViewSet)
 router.register("behavior-frame-option", views.BehaviorFrameOptionViewSet)
 router.register("behavior/symbol/complete", views.XabslSymbolCompleteViewSet)
 router.register("behavior/symbol/sparse", views.XabslSymbolSparseViewSet)
+router.register("behavior/game-state", views.GameStateTimelineViewSet)
 
 urlpatterns += router.urls
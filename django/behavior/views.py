@@ -2,43 +2,81 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 
 from django.db import transaction
-from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.db.models import Max, Min, Q
 from django.db import connection
 from psycopg2.extras import execute_values
+from core.bulk import copy_upsert, upsert_returning
+from common.counts import add_counts, get_count, reset_counts
 
 import json
 import time
 
 from . import serializers
 from . import models
+from .game_state import (
+    GAME_STATE_OPTION,
+    build_game_state_timeline,
+    get_game_state_timeline,
+)
+from .intervals import get_intervals, update_intervals
+from .symbol_deltas import (
+    check_upload,
+    encode_upload,
+    full_snapshots,
+    is_delta_encoded,
+    matching_rows,
+    symbol_state,
+    symbol_states,
+    upload_frames,
+)
+from .symbol_query import filter_symbols
+from common.models import Log
+from cognition.models import CognitionFrame
+
+# conflict keys of the catalog upserts, see the unique constraints of the models
+OPTION_KEY = ("log_id", "xabsl_internal_option_id", "option_name")
+STATE_KEY = ("option_id_id", "xabsl_internal_state_id", "name")
+
+
+def count_option_frames(log_id):
+    queryset = models.BehaviorFrameOption.objects.filter(frame__log=log_id)
+    return queryset.values("frame").distinct().count()
+
+
+def count_symbol_frames(log_id):
+    queryset = models.XabslSymbolSparse.objects.filter(frame__log=log_id)
+    return queryset.values("frame").distinct().count()
 
 
 class BehaviorFrameCountView(APIView):
+    queryset = models.BehaviorFrameOption.objects.all()
+
     def get(self, request):
         # Get filter parameters from query string
         log_id = request.query_params.get("log")
 
-        #
-        queryset = models.BehaviorFrameOption.objects.filter(frame__log=log_id)
-
-        # Get the count
-        unique_frame_count = queryset.values("frame").distinct().count()
+        # number of frames with options, served from the counts maintained on ingest
+        unique_frame_count = get_count(
+            log_id, "BehaviorFrameOption", count_option_frames
+        )
 
         return Response({"count": unique_frame_count}, status=status.HTTP_200_OK)
 
 
 class BehaviorSymbolCountView(APIView):
+    queryset = models.XabslSymbolSparse.objects.all()
+
     def get(self, request):
         # Get filter parameters from query string
         log_id = request.query_params.get("log")
 
-        #
-        queryset = models.XabslSymbolSparse.objects.filter(frame__log=log_id)
-
-        # Get the count
-        unique_frame_count = queryset.values("frame").distinct().count()
+        # number of frames with symbols, served from the counts maintained on ingest
+        unique_frame_count = get_count(log_id, "XabslSymbolSparse", count_symbol_frames)
 
         return Response({"count": unique_frame_count}, status=status.HTTP_200_OK)
 
@@ -87,52 +125,26 @@ class BehaviorOptionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status_code)
 
     def bulk_create(self, serializer):
-        validated_data = serializer.validated_data
-
-        with transaction.atomic():
-            # Get all existing games
-            existing_combinations = set(
-                models.BehaviorOption.objects.values_list(
-                    "log", "option_name", "xabsl_internal_option_id"
-                )
-            )
-
-            # Separate new and existing events
-            new_data = []
-            existing_data = []
-            for item in validated_data:
-                combo = (
-                    item["log_id"].id,
-                    item["option_name"],
-                    item["xabsl_internal_option_id"],
-                )
-                if combo not in existing_combinations:
-                    new_data.append(models.BehaviorOption(**item))
-                    existing_combinations.add(
-                        combo
-                    )  # Add to set to catch duplicates within the input
-                else:
-                    # Fetch the existing event
-                    existing_event = models.BehaviorOption.objects.get(
-                        log_id=item["log_id"],
-                        option_name=item["option_name"],
-                        xabsl_internal_option_id=item["xabsl_internal_option_id"],
-                    )
-                    existing_data.append(existing_event)
-
-            # Bulk create new events
-            created_data = models.BehaviorOption.objects.bulk_create(new_data)
-
-        # Combine created and existing events
-        all_data = created_data + existing_data
+        # the items can belong to different logs
+        rows = [
+            {
+                "log_id": item["log"].id,
+                "xabsl_internal_option_id": item.get("xabsl_internal_option_id"),
+                "option_name": item.get("option_name"),
+            }
+            for item in serializer.validated_data
+        ]
+        ids, created = upsert_returning(models.BehaviorOption, rows, OPTION_KEY)
 
-        # Serialize the results
-        result_serializer = self.get_serializer(all_data, many=True)
+        options = models.BehaviorOption.objects.in_bulk(ids.values())
+        result_serializer = self.get_serializer(
+            [options[pk] for pk in ids.values()], many=True
+        )
 
         return Response(
             {
-                "created": len(created_data),
-                "existing": len(existing_data),
+                "created": created,
+                "existing": len(ids) - created,
                 "events": result_serializer.data,
             },
             status=status.HTTP_200_OK,
@@ -184,40 +196,25 @@ class BehaviorOptionStateViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status_code)
 
     def bulk_create(self, serializer):
-        """
-        asssumes all data send is from the same log
-        """
-        validated_data = serializer.validated_data
-
-        with transaction.atomic():
-            batch_log_id = validated_data[0]["log"].id
-            # Get all existing combinations given the log id
-            existing_combinations = set(
-                models.BehaviorOptionState.objects.filter(
-                    log_id=batch_log_id
-                ).values_list("option_id", "xabsl_internal_state_id", "name")
-            )
-
-            # filter out duplicates
-            new_data = []
-            for item in validated_data:
-                combo = (
-                    item["option_id"],
-                    item["xabsl_internal_state_id"],
-                    item["name"],
-                )
-                if combo not in existing_combinations:
-                    new_data.append(models.BehaviorOptionState(**item))
-                    existing_combinations.add(
-                        combo
-                    )  # Add to set to catch duplicates within the input
-
-            # Bulk create new events
-            created_data = models.BehaviorOptionState.objects.bulk_create(new_data)
+        # the items can belong to different logs
+        rows = [
+            {
+                "log_id": item["log"].id,
+                "option_id_id": item["option_id"].id,
+                "xabsl_internal_state_id": item.get("xabsl_internal_state_id"),
+                "name": item.get("name"),
+                "target": item.get("target"),
+            }
+            for item in serializer.validated_data
+        ]
+        ids, created = upsert_returning(models.BehaviorOptionState, rows, STATE_KEY)
 
         return Response(
             {
-                "created": len(created_data),
+                "created": created,
+                "existing": len(ids) - created,
+                # [option id, xabsl_internal_state_id, name, id] per state of the batch
+                "states": [[*key, pk] for key, pk in ids.items()],
             },
             status=status.HTTP_200_OK,
         )
@@ -239,6 +236,11 @@ class BehaviorFrameOptionViewSet(viewsets.ModelViewSet):
         # FIXME built in pagination here, otherwise it could crash something if someone tries to get all representations without filtering
         return queryset.filter(filters)
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        reset_counts([instance.frame.log_id], "BehaviorFrameOption")
+        update_intervals(instance.frame.log_id)
+
     def create(self, request, *args, **kwargs):
         # Check if the data is a list (bulk create) or dict (single create)
         is_many = isinstance(request.data, list)
@@ -248,22 +250,68 @@ class BehaviorFrameOptionViewSet(viewsets.ModelViewSet):
 
         starttime = time.time()
 
-        rows_tuples = [
+        rows_tuples = (
             (row["frame"], row["options_id"], row["active_state"])
             for row in request.data
-        ]
-        with connection.cursor() as cursor:
-            query = """
-            INSERT INTO behavior_behaviorframeoption (frame_id, options_id_id, active_state_id)
-            VALUES %s
-            ON CONFLICT (frame_id, options_id_id, active_state_id) DO NOTHING;
-            """
-            # rows is a list of tuples containing the data
-            execute_values(cursor, query, rows_tuples, page_size=500)
+        )
+        with transaction.atomic():
+            new_frames = copy_upsert(
+                "behavior_behaviorframeoption",
+                ["frame_id", "options_id_id", "active_state_id"],
+                rows_tuples,
+                conflict_columns=["frame_id", "options_id_id", "active_state_id"],
+                frame_table="cognition_cognitionframe",
+            )
+            add_counts("BehaviorFrameOption", new_frames, count_option_frames)
+
+            # extend the state intervals by the frame range of the batch in each log
+            frame_ranges = (
+                CognitionFrame.objects.filter(
+                    id__in={row["frame"] for row in request.data}
+                )
+                .values("log")
+                .annotate(first=Min("frame_number"), last=Max("frame_number"))
+            )
+            for frame_range in frame_ranges:
+                update_intervals(
+                    frame_range["log"], frame_range["first"], frame_range["last"]
+                )
+
+        # rebuild the game state timeline of logs where this batch contained game state changes
+        game_state_logs = (
+            models.BehaviorOption.objects.filter(
+                id__in={row["options_id"] for row in request.data},
+                option_name=GAME_STATE_OPTION,
+            )
+            .values_list("log", flat=True)
+            .distinct()
+        )
+        for log_id in game_state_logs:
+            build_game_state_timeline(log_id)
         print(time.time() - starttime)
         return Response({}, status=status.HTTP_200_OK)
 
 
+class GameStateTimelineViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Game state transitions of a log, retrieve with the log id: /api/behavior/game-state/<log_id>/
+    """
+
+    serializer_class = serializers.GameStateTimelineSerializer
+    queryset = models.GameStateTimeline.objects.all()
+
+    def get_queryset(self):
+        queryset = models.GameStateTimeline.objects.all()
+        log_id = self.request.query_params.get("log")
+        if log_id:
+            queryset = queryset.filter(log=log_id)
+        return queryset
+
+    def get_object(self):
+        log = get_object_or_404(Log, id=self.kwargs["pk"])
+        return get_game_state_timeline(log.id)
+
+
 class BehaviorFrameOptionAPIView(APIView):
     queryset = models.BehaviorFrameOption.objects.all()
     def get(self, request, *args, **kwargs):
@@ -311,6 +359,74 @@ class BehaviorFrameOptionAPIView(APIView):
             )
 
 
+class BehaviorStateIntervalView(APIView):
+    """
+    Intervals of consecutive frames in which an option was in a state:
+    /api/behavior/intervals/?log=<log_id>&option_name=<name>&state_name=<name>
+    The state is optional. Replaces listing every matching frame via behavior/filter/.
+    """
+
+    queryset = models.BehaviorStateInterval.objects.all()
+
+    def get(self, request):
+        log_id = request.query_params.get("log")
+        option_name = request.query_params.get("option_name")
+        state_name = request.query_params.get("state_name")
+        if not log_id or not option_name:
+            return Response(
+                {"error": "you need to provide log and option_name"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not log_id.isdigit():
+            return Response(
+                {"error": "log must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        intervals = get_intervals(int(log_id)).filter(option__option_name=option_name)
+        if state_name:
+            intervals = intervals.filter(state__name=state_name)
+        intervals = intervals.select_related("option", "state").order_by("first_frame")
+        serializer = serializers.BehaviorStateIntervalSerializer(intervals, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class BehaviorActiveOptionsView(APIView):
+    """
+    Options that were active in a frame together with their state:
+    /api/behavior/active-options/?log=<log_id>&frame_number=<frame_number>
+    """
+
+    queryset = models.BehaviorStateInterval.objects.all()
+
+    def get(self, request):
+        log_id = request.query_params.get("log")
+        frame_number = request.query_params.get("frame_number")
+        if not log_id or not frame_number:
+            return Response(
+                {"error": "you need to provide log and frame_number"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            log_id = int(log_id)
+            frame_number = int(frame_number)
+        except ValueError:
+            return Response(
+                {"error": "log and frame_number must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        intervals = (
+            get_intervals(log_id)
+            .filter(first_frame__lte=frame_number, last_frame__gte=frame_number)
+            .select_related("option", "state")
+            .order_by("option__xabsl_internal_option_id", "option")
+        )
+        serializer = serializers.BehaviorStateIntervalSerializer(intervals, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class XabslSymbolSparseViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.XabslSymbolSparseSerializer
     queryset = models.XabslSymbolSparse.objects.all()
@@ -320,14 +436,144 @@ class XabslSymbolSparseViewSet(viewsets.ModelViewSet):
         query_params = self.request.query_params
 
         # FIXME combine with behaviorfull
-        # FIXME filter does not seem to work because we now store json
         filters = Q()
         for field in models.XabslSymbolSparse._meta.fields:
             param_value = query_params.get(field.name)
             if param_value:
                 filters &= Q(**{field.name: param_value})
+        log_id = query_params.get("log")
+        if log_id:
+            if not log_id.isdigit():
+                raise ValidationError({"error": "log must be an integer"})
+            filters &= Q(frame__log=log_id)
+        for param, lookup in [
+            ("first_frame", "frame__frame_number__gte"),
+            ("last_frame", "frame__frame_number__lte"),
+        ]:
+            value = query_params.get(param)
+            if value:
+                if not value.lstrip("-").isdigit():
+                    raise ValidationError({"error": f"{param} must be an integer"})
+                filters &= Q(**{lookup: value})
         # FIXME built in pagination here, otherwise it could crash something if someone tries to get all representations without filtering
-        return queryset.filter(filters)
+        queryset = queryset.filter(filters)
+
+        conditions = query_params.getlist("where")
+        if conditions:
+            if not log_id:
+                raise ValidationError({"error": "you need to provide log to use where"})
+            try:
+                if is_delta_encoded(int(log_id)):
+                    # rows between keyframes only hold the changed symbols, the conditions
+                    # are checked on the symbol states replayed from the keyframe before
+                    # the requested frames
+                    bounds = queryset.aggregate(
+                        first=Min("frame__frame_number"),
+                        last=Max("frame__frame_number"),
+                    )
+                    if bounds["first"] is None:
+                        return queryset
+                    rows = matching_rows(
+                        int(log_id), conditions, bounds["first"], bounds["last"]
+                    )
+                    queryset = queryset.filter(id__in=[row_id for row_id, _ in rows])
+                else:
+                    # filtered in the database, see behavior/symbol_query.py
+                    queryset = filter_symbols(queryset, conditions)
+            except ValueError as e:
+                raise ValidationError({"error": str(e)})
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        log_id = request.query_params.get("log")
+        if log_id and response.data and is_delta_encoded(int(log_id)):
+            # return the full symbol state of every frame instead of the stored changes,
+            # replayed from the keyframe before the first returned frame
+            bounds = CognitionFrame.objects.filter(
+                id__in=[row["frame"] for row in response.data]
+            ).aggregate(first=Min("frame_number"), last=Max("frame_number"))
+            states = dict(full_snapshots(int(log_id), bounds["first"], bounds["last"]))
+            for row in response.data:
+                row["data"] = states.get(row["id"], row["data"])
+        return response
+
+    @action(detail=False, methods=["get"], url_path="frames")
+    def frames(self, request, *args, **kwargs):
+        """
+        Returns the frame numbers of a log whose symbols fulfill all where conditions, optionally
+        only between first_frame and last_frame.
+        Accessible at /api/behavior/symbol/sparse/frames/?log=<log_id>&where=<symbol><op><value>
+        """
+        if not request.query_params.get("log"):
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        frame_numbers = (
+            self.get_queryset()
+            .order_by("frame__frame_number")
+            .values_list("frame__frame_number", flat=True)
+        )
+        return Response(
+            {"frame_numbers": list(frame_numbers)}, status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=["get"], url_path="state")
+    def state(self, request, *args, **kwargs):
+        """
+        Returns the symbol values at a frame or for every frame of a range, delta encoded rows
+        are replayed from the preceding keyframe. symbols can be given multiple times to only
+        return these symbols.
+        Accessible at /api/behavior/symbol/sparse/state/?log=<log_id>&frame_number=<frame>
+        or /api/behavior/symbol/sparse/state/?log=<log_id>&first_frame=<frame>&last_frame=<frame>
+        """
+        log_id = request.query_params.get("log")
+        if not log_id:
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        symbols = request.query_params.getlist("symbols")
+        frame_number = request.query_params.get("frame_number")
+        first_frame = request.query_params.get("first_frame")
+        last_frame = request.query_params.get("last_frame")
+        if frame_number is None and (first_frame is None or last_frame is None):
+            return Response(
+                {
+                    "error": "you need to provide frame_number "
+                    "or first_frame and last_frame"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            log_id = int(log_id)
+            if frame_number is not None:
+                frame_number = int(frame_number)
+            else:
+                first_frame, last_frame = int(first_frame), int(last_frame)
+        except ValueError:
+            return Response(
+                {"error": "log and the frame numbers must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if frame_number is not None:
+            values = symbol_state(log_id, frame_number, symbols)
+            return Response(
+                {"frame_number": frame_number, "data": values},
+                status=status.HTTP_200_OK,
+            )
+
+        states = symbol_states(log_id, first_frame, last_frame, symbols)
+        return Response(
+            [{"frame_number": number, "data": values} for number, values in states],
+            status=status.HTTP_200_OK,
+        )
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        reset_counts([instance.frame.log_id], "XabslSymbolSparse")
 
     def create(self, request, *args, **kwargs):
         starttime = time.time()
@@ -335,22 +581,43 @@ class XabslSymbolSparseViewSet(viewsets.ModelViewSet):
         data = self.request.data
         # rows_tuples = [( data['log_id'], data['frame'], json.dumps( data['data']) )]
 
-        rows_tuples = [
-            (
-                row["frame"],
-                json.dumps(row["data"]),
+        with transaction.atomic():
+            # rows may not be stored in between a stored row and the delta row replayed on
+            # top of it, see behavior/symbol_deltas.py
+            try:
+                if request.query_params.get("encoding") == "delta":
+                    # only changed symbols are stored
+                    encoded = list(encode_upload(data))
+                    rows_tuples = (
+                        (
+                            frame_id,
+                            json.dumps(values),
+                            keyframe,
+                            json.dumps(removed) if removed else None,
+                        )
+                        for frame_id, values, keyframe, removed in encoded
+                    )
+                else:
+                    check_upload(upload_frames(data), delta=False)
+                    rows_tuples = (
+                        (
+                            row["frame"],
+                            json.dumps(row["data"]),
+                            True,
+                            None,
+                        )
+                        for row in data
+                    )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            new_frames = copy_upsert(
+                "behavior_xabslsymbolsparse",
+                ["frame_id", "data", "keyframe", "removed"],
+                rows_tuples,
+                conflict_columns=["frame_id"],
+                frame_table="cognition_cognitionframe",
             )
-            for row in data
-        ]
-
-        with connection.cursor() as cursor:
-            query = """
-            INSERT INTO behavior_xabslsymbolsparse(frame_id, data)
-            VALUES %s
-            ON CONFLICT (frame_id) DO NOTHING;
-            """
-            # rows is a list of tuples containing the data
-            execute_values(cursor, query, rows_tuples, page_size=1000)
+            add_counts("XabslSymbolSparse", new_frames, count_symbol_frames)
         print(time.time() - starttime)
         return Response({}, status=status.HTTP_200_OK)
 
@@ -0,0 +1,121 @@
+"""
+Per log columnar storage for cognition representations.
+
+pack_representation copies the per frame rows of a representation into RepresentationChunk rows,
+read_representation returns a frame range of it as columns without touching the per frame tables.
+The chunks are json since representation_data has no fixed schema and is returned as json anyway.
+
+Everything that inserts, changes or deletes representation rows or the frame numbers and times
+of a log must call delete_chunks, the log has to be packed again afterwards.
+"""
+
+import bisect
+import json
+import zlib
+
+from django.db import transaction
+
+from .models import RepresentationChunk
+
+# number of frames per chunk, 1000 frames are roughly 30 seconds of a game
+CHUNK_SIZE = 1000
+
+COLUMNS = ("frame_number", "frame_time", "representation_data")
+
+
+def _encode(columns):
+    return zlib.compress(json.dumps(columns).encode())
+
+
+def _decode(data):
+    return json.loads(zlib.decompress(data))
+
+
+def pack_representation(model, log_id, chunk_size=CHUNK_SIZE):
+    """
+    (Re)builds the chunks of a representation model for a log and returns the number of frames packed.
+    """
+    rows = (
+        model.objects.filter(frame__log=log_id, frame__frame_number__isnull=False)
+        .order_by("frame__frame_number")
+        .values_list("frame__frame_number", "frame__frame_time", "representation_data")
+    )
+
+    chunks = []
+    columns = {name: [] for name in COLUMNS}
+    num_frames = 0
+
+    def flush():
+        chunks.append(
+            RepresentationChunk(
+                log_id=log_id,
+                representation=model.__name__,
+                first_frame=columns["frame_number"][0],
+                last_frame=columns["frame_number"][-1],
+                num_frames=len(columns["frame_number"]),
+                data=_encode(columns),
+            )
+        )
+
+    for row in rows.iterator(chunk_size=chunk_size):
+        for name, value in zip(COLUMNS, row):
+            columns[name].append(value)
+        num_frames += 1
+
+        if len(columns["frame_number"]) == chunk_size:
+            flush()
+            columns = {name: [] for name in COLUMNS}
+
+    if columns["frame_number"]:
+        flush()
+
+    with transaction.atomic():
+        RepresentationChunk.objects.filter(
+            log=log_id, representation=model.__name__
+        ).delete()
+        RepresentationChunk.objects.bulk_create(chunks)
+
+    return num_frames
+
+
+def delete_chunks(log_ids, representation=None):
+    """
+    Deletes the chunks of the given logs, of all representations if representation is None.
+    """
+    qs = RepresentationChunk.objects.filter(log__in=log_ids)
+    if representation is not None:
+        qs = qs.filter(representation=representation)
+    qs.delete()
+
+
+def read_representation(representation, log_id, start=None, end=None):
+    """
+    Returns the frames between start and end (inclusive) of a packed representation as a dict of
+    columns, None if the representation is not packed for the log.
+    """
+    qs = RepresentationChunk.objects.filter(
+        log=log_id, representation=representation
+    ).order_by("first_frame")
+    if not qs.exists():
+        return None
+    if start is not None:
+        qs = qs.filter(last_frame__gte=start)
+    if end is not None:
+        qs = qs.filter(first_frame__lte=end)
+
+    result = {name: [] for name in COLUMNS}
+    for data in qs.values_list("data", flat=True).iterator():
+        columns = _decode(data)
+        frame_numbers = columns["frame_number"]
+
+        # only the first and last chunk can be partially outside the requested range
+        lo = 0 if start is None else bisect.bisect_left(frame_numbers, start)
+        hi = (
+            len(frame_numbers)
+            if end is None
+            else bisect.bisect_right(frame_numbers, end)
+        )
+        for name in COLUMNS:
+            result[name].extend(columns[name][lo:hi])
+
+    return result
@@ -0,0 +1,114 @@
+"""
+On demand decoding of representation payloads from the raw cognition log.
+
+Representations can be ingested with start_pos and size only. Their representation_data is then
+decoded from the protobuf message in the log file when they are requested and the result is kept
+in the cache (redis in production, evicted by its LRU policy and the timeout below).
+
+The message definitions come from the naoth python package. Rows whose payload can not be read or
+decoded (missing or truncated log file, broken message) are returned with representation_data
+set to None.
+"""
+
+import functools
+import importlib
+import pkgutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.range_reader import read_ranges
+
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.message import DecodeError
+from naoth import pb
+
+from .models import CognitionFrame
+
+DECODED_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(representation, instance):
+    # a new upload with other offsets must not hit the old entry
+    return (
+        f"cognition:decoded:{representation}:{instance.id}:"
+        f"{instance.start_pos}:{instance.size}"
+    )
+
+
+@functools.cache
+def message_class(representation):
+    """
+    Returns the protobuf message class of a representation, top camera variants use the same
+    message as the bottom camera ones.
+    """
+    name = representation.removesuffix("Top")
+    for module_info in pkgutil.iter_modules(pb.__path__):
+        module = importlib.import_module(f"{pb.__name__}.{module_info.name}")
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise LookupError(f"no message definition for {representation}")
+
+
+def decode_payload(representation, data):
+    message = message_class(representation)()
+    message.ParseFromString(bytes(data))
+    return MessageToDict(message)
+
+
+def decode_missing(representation, instances):
+    """
+    Fills representation_data of the given instances that have none from the cache or the log file.
+    The instances are only changed in memory.
+    """
+    missing = [
+        instance
+        for instance in instances
+        if instance.representation_data is None
+        and instance.start_pos is not None
+        and instance.size is not None
+    ]
+    if not missing:
+        return
+
+    keys = {_cache_key(representation, instance): instance for instance in missing}
+    cached = cache.get_many(keys.keys())
+    for key, data in cached.items():
+        keys[key].representation_data = data
+
+    to_decode = [instance for key, instance in keys.items() if key not in cached]
+    if not to_decode:
+        return
+
+    log_paths = dict(
+        CognitionFrame.objects.filter(
+            id__in={instance.frame_id for instance in to_decode}
+        ).values_list("id", "log__log_path")
+    )
+    by_file = {}
+    for instance in to_decode:
+        log_path = log_paths.get(instance.frame_id)
+        if log_path:
+            by_file.setdefault(log_path, []).append(instance)
+
+    decoded = {}
+    for log_path, file_instances in by_file.items():
+        try:
+            payloads = read_ranges(
+                Path(settings.LOG_ROOT) / log_path,
+                [(instance.start_pos, instance.size) for instance in file_instances],
+            )
+        except (OSError, EOFError) as e:
+            print(f"Error reading {log_path}: {e}")
+            continue
+        for instance, payload in zip(file_instances, payloads):
+            try:
+                data = decode_payload(representation, payload)
+            except (DecodeError, LookupError) as e:
+                print(f"Error decoding {representation} {instance.id}: {e}")
+                continue
+            instance.representation_data = data
+            decoded[_cache_key(representation, instance)] = data
+
+    cache.set_many(decoded, DECODED_CACHE_TIMEOUT)
@@ -0,0 +1,145 @@
+"""
+Compressed bitmap format of FrameFilter.bitmap.
+
+The layout follows roaring bitmaps: frame numbers are split by their upper 16 bits into
+containers and every container stores the lower 16 bits in whichever form is smallest, a sorted
+array, a list of runs (start, length - 1) or a 65536 bit bitmap. Filters over consecutive frames
+become a few runs instead of one json number per frame.
+
+A bitmap starts with a header entry per container (key, kind, cardinality, payload size in
+16 bit words) followed by the payloads, so the cardinality is known without decoding the frames.
+Set operations decode to sorted numpy arrays, the frames of a log fit into memory easily.
+"""
+
+import struct
+from functools import reduce
+
+import numpy as np
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import BooleanField, F, Func, IntegerField, Value
+from django.db.models.functions import Cast
+
+VERSION = 1
+ARRAY, RUNS, BITMAP = 0, 1, 2
+BITMAP_WORDS = 65536 // 16
+
+HEADER = struct.Struct("<BI")
+CONTAINER = np.dtype(
+    [("key", "<u2"), ("kind", "u1"), ("cardinality", "<u4"), ("words", "<u4")]
+)
+
+OPERATIONS = {
+    "union": np.union1d,
+    "intersection": np.intersect1d,
+    "difference": np.setdiff1d,
+}
+
+
+def _encode_container(low):
+    breaks = np.flatnonzero(np.diff(low) != 1) + 1
+    starts = low[np.r_[0, breaks]]
+    ends = low[np.r_[breaks - 1, len(low) - 1]]
+
+    sizes = {ARRAY: len(low), RUNS: 2 * len(starts), BITMAP: BITMAP_WORDS}
+    kind = min(sizes, key=sizes.get)
+    if kind == ARRAY:
+        payload = low.astype("<u2")
+    elif kind == RUNS:
+        payload = np.column_stack([starts, ends - starts]).astype("<u2").ravel()
+    else:
+        bits = np.zeros(65536, dtype=bool)
+        bits[low] = True
+        payload = np.packbits(bits, bitorder="little")
+    return kind, sizes[kind], payload.tobytes()
+
+
+def encode(frame_numbers):
+    """
+    Returns the bitmap of frame numbers as bytes, duplicates are dropped. Raises ValueError for
+    frame numbers outside of 0 to 2**32 - 1.
+    """
+    values = np.unique(np.asarray(list(frame_numbers), dtype=np.int64))
+    if len(values) and (values[0] < 0 or values[-1] >= 2**32):
+        raise ValueError("frame numbers must be between 0 and 2**32 - 1")
+
+    keys = values >> 16
+    boundaries = np.flatnonzero(np.diff(keys)) + 1
+    chunks = np.split((values & 0xFFFF).astype(np.uint16), boundaries)
+    container_keys = keys[np.r_[0, boundaries]] if len(values) else []
+
+    headers = np.zeros(len(container_keys), dtype=CONTAINER)
+    payloads = []
+    for i, (key, low) in enumerate(zip(container_keys, chunks)):
+        kind, words, payload = _encode_container(low)
+        headers[i] = (key, kind, len(low), words)
+        payloads.append(payload)
+    return HEADER.pack(VERSION, len(headers)) + headers.tobytes() + b"".join(payloads)
+
+
+def _headers(data):
+    version, num_containers = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unknown frame bitmap version {version}")
+    return np.frombuffer(
+        data, dtype=CONTAINER, count=num_containers, offset=HEADER.size
+    )
+
+
+def decode(data):
+    """
+    Returns the sorted frame numbers of a bitmap as an int64 numpy array.
+    """
+    data = bytes(data)
+    headers = _headers(data)
+    offset = HEADER.size + headers.nbytes
+    chunks = [np.empty(0, dtype=np.int64)]
+    for key, kind, _, words in headers.tolist():
+        payload = np.frombuffer(data, dtype="<u2", count=words, offset=offset)
+        offset += words * 2
+        if kind == ARRAY:
+            low = payload.astype(np.int64)
+        elif kind == RUNS:
+            starts = payload[::2].astype(np.int64)
+            lengths = payload[1::2].astype(np.int64) + 1
+            # position of every value inside its run added to the start of the run
+            low = np.repeat(starts, lengths) + (
+                np.arange(lengths.sum())
+                - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            )
+        else:
+            low = np.flatnonzero(
+                np.unpackbits(payload.view(np.uint8), bitorder="little")
+            )
+        chunks.append((key << 16) | low)
+    return np.concatenate(chunks)
+
+
+def cardinality(data):
+    """
+    Returns the number of frames in a bitmap, only the header is read.
+    """
+    return int(_headers(bytes(data))["cardinality"].sum())
+
+
+def combine(operation, frame_lists):
+    """
+    Applies union, intersection or difference from left to right to sorted frame number arrays,
+    e.g. decoded bitmaps, and returns the sorted frame numbers of the result.
+    """
+    return reduce(OPERATIONS[operation], frame_lists)
+
+
+def frame_number_in(frame_numbers, field="frame_number"):
+    """
+    Returns a condition for filter(frame_number_in(...)). The frame numbers are sent as one
+    integer array literal compared with = ANY instead of one IN parameter per frame, which keeps
+    the query small for long filters.
+    """
+    literal = "{" + ",".join(str(int(n)) for n in frame_numbers) + "}"
+    return Func(
+        F(field),
+        Cast(Value(literal), ArrayField(IntegerField())),
+        template="(%(expressions)s))",
+        arg_joiner=" = ANY(",
+        output_field=BooleanField(),
+    )
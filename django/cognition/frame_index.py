@@ -0,0 +1,98 @@
+"""
+Cached per log frame number index used to navigate between the frames of a log.
+
+The sorted distinct frame numbers of a log, optionally restricted to the frames of a FrameFilter,
+are loaded once, cached as a numpy array and then searched with binary search. Everything that
+inserts, deletes or renumbers cognition frames must call invalidate_frame_index, everything that
+changes a FrameFilter must call invalidate_filter_index.
+"""
+
+import numpy as np
+from django.core.cache import cache
+
+from . import frame_bitmap
+from .models import CognitionFrame, FrameFilter
+
+# invalidation happens in the api, the timeout only protects against changes made outside of it
+FRAME_INDEX_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(log_id, filter_id=None):
+    return f"cognition:frame-index:{log_id}:{filter_id or 'all'}"
+
+
+def _load_frame_numbers(log_id):
+    rows = (
+        CognitionFrame.objects.filter(log=log_id, frame_number__isnull=False)
+        .order_by("frame_number")
+        .values_list("frame_number", flat=True)
+        .distinct()
+    )
+    return np.fromiter(rows, dtype=np.int64)
+
+
+def frame_index(log_id, filter_id=None):
+    """
+    Returns the sorted distinct frame numbers of a log as a numpy array. If filter_id names a
+    FrameFilter with a bitmap only the frame numbers in the bitmap are returned.
+    """
+    key = _cache_key(log_id, filter_id)
+    index = cache.get(key)
+    if index is not None:
+        return index
+
+    if filter_id is None:
+        index = _load_frame_numbers(log_id)
+    else:
+        index = frame_index(log_id)
+        frame_filter = FrameFilter.objects.filter(id=filter_id).first()
+        if frame_filter and frame_filter.bitmap is not None:
+            frame_list = frame_bitmap.decode(frame_filter.bitmap)
+            index = np.intersect1d(index, frame_list, assume_unique=True)
+    cache.set(key, index, FRAME_INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def invalidate_frame_index(*log_ids):
+    filter_ids = FrameFilter.objects.filter(log__in=log_ids).values_list("log", "id")
+    keys = [_cache_key(log_id) for log_id in log_ids]
+    keys += [_cache_key(log_id, filter_id) for log_id, filter_id in filter_ids]
+    cache.delete_many(keys)
+
+
+def invalidate_filter_index(frame_filter):
+    cache.delete(_cache_key(frame_filter.log_id, frame_filter.id))
+
+
+def frame_neighbours(log_id, frame_number, filter_id=None):
+    """
+    Returns (index, prev_frame, next_frame, num_frames) for a frame number. index is the position
+    of the frame in the index, for a frame that is not part of it the position it would have.
+    prev_frame and next_frame are None at the ends of the index.
+    """
+    index = frame_index(log_id, filter_id)
+    position = int(np.searchsorted(index, frame_number))
+    found = position < len(index) and index[position] == frame_number
+    prev_frame = int(index[position - 1]) if position > 0 else None
+    next_position = position + 1 if found else position
+    next_frame = int(index[next_position]) if next_position < len(index) else None
+    return position, prev_frame, next_frame, len(index)
+
+
+def frame_window(log_id, frame_number, before, after, filter_id=None):
+    """
+    Returns a list of (index, frame_number, prev_frame, next_frame) for up to before frames before
+    and after frames after frame_number, including frame_number itself if it is part of the index.
+    """
+    index = frame_index(log_id, filter_id)
+    start = int(np.searchsorted(index, frame_number))
+    end = int(np.searchsorted(index, frame_number, side="right")) + after
+    start = max(start - before, 0)
+    end = min(end, len(index))
+
+    window = []
+    for position in range(start, end):
+        prev_frame = int(index[position - 1]) if position > 0 else None
+        next_frame = int(index[position + 1]) if position + 1 < len(index) else None
+        window.append((position, int(index[position]), prev_frame, next_frame))
+    return window
@@ -0,0 +1,69 @@
+"""
+Links cognition and motion frames of a log to the closest frame of the other thread by frame time.
+
+Each direction is a single UPDATE statement. For every frame the previous and next frame of the
+other thread are looked up with index scans on (log, frame_time) and the closer one wins,
+on a tie the earlier frame is used.
+"""
+
+from django.db import connection, transaction
+
+LINK_QUERY = """
+UPDATE {source} AS source
+SET {link_column} = nearest.target_id
+FROM (
+    SELECT
+        s.id AS source_id,
+        CASE
+            WHEN before.id IS NULL THEN after.id
+            WHEN after.id IS NULL THEN before.id
+            WHEN s.frame_time - before.frame_time <= after.frame_time - s.frame_time THEN before.id
+            ELSE after.id
+        END AS target_id
+    FROM {source} s
+    LEFT JOIN LATERAL (
+        SELECT t.id, t.frame_time FROM {target} t
+        WHERE t.log_id = s.log_id AND t.frame_time <= s.frame_time
+        ORDER BY t.frame_time DESC
+        LIMIT 1
+    ) before ON true
+    LEFT JOIN LATERAL (
+        SELECT t.id, t.frame_time FROM {target} t
+        WHERE t.log_id = s.log_id AND t.frame_time >= s.frame_time
+        ORDER BY t.frame_time ASC
+        LIMIT 1
+    ) after ON true
+    WHERE s.log_id = %s AND s.frame_time IS NOT NULL
+) nearest
+WHERE source.id = nearest.source_id
+    AND source.{link_column} IS DISTINCT FROM nearest.target_id;
+"""
+
+
+def link_closest_frames(log_id):
+    """
+    Sets CognitionFrame.closest_motion_frame and MotionFrame.closest_cognition_frame for a whole log.
+    Returns the number of changed cognition and motion frames.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            LINK_QUERY.format(
+                source="cognition_cognitionframe",
+                target="motion_motionframe",
+                link_column="closest_motion_frame_id",
+            ),
+            [log_id],
+        )
+        cognition_updated = cursor.rowcount
+
+        cursor.execute(
+            LINK_QUERY.format(
+                source="motion_motionframe",
+                target="cognition_cognitionframe",
+                link_column="closest_cognition_frame_id",
+            ),
+            [log_id],
+        )
+        motion_updated = cursor.rowcount
+
+    return cognition_updated, motion_updated
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cognition", "0009_robotpose"),
+        ("common", "0032_experiment_experiment_folder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RepresentationChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("representation", models.CharField(max_length=40)),
+                ("first_frame", models.IntegerField()),
+                ("last_frame", models.IntegerField()),
+                ("num_frames", models.IntegerField()),
+                ("data", models.BinaryField()),
+                (
+                    "log",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="representation_chunks",
+                        to="common.log",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Representation Chunks",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("log", "representation", "first_frame"),
+                        name="unique_representation_chunk",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cognition", "0010_representationchunk"),
+        ("common", "0032_experiment_experiment_folder"),
+        ("motion", "0005_accelerometerdata_size_accelerometerdata_start_pos_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cognitionframe",
+            index=models.Index(
+                fields=["log", "frame_time"], name="cognition_c_log_id_129cb4_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,143 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+import struct
+
+import numpy as np
+from django.db import migrations, models
+
+# copy of the version 1 format of cognition/frame_bitmap.py, so this migration keeps working
+# when the module changes
+VERSION = 1
+ARRAY, RUNS, BITMAP = 0, 1, 2
+BITMAP_WORDS = 65536 // 16
+HEADER = struct.Struct("<BI")
+CONTAINER = np.dtype(
+    [("key", "<u2"), ("kind", "u1"), ("cardinality", "<u4"), ("words", "<u4")]
+)
+
+
+def _encode_container(low):
+    breaks = np.flatnonzero(np.diff(low) != 1) + 1
+    starts = low[np.r_[0, breaks]]
+    ends = low[np.r_[breaks - 1, len(low) - 1]]
+
+    sizes = {ARRAY: len(low), RUNS: 2 * len(starts), BITMAP: BITMAP_WORDS}
+    kind = min(sizes, key=sizes.get)
+    if kind == ARRAY:
+        payload = low.astype("<u2")
+    elif kind == RUNS:
+        payload = np.column_stack([starts, ends - starts]).astype("<u2").ravel()
+    else:
+        bits = np.zeros(65536, dtype=bool)
+        bits[low] = True
+        payload = np.packbits(bits, bitorder="little")
+    return kind, sizes[kind], payload.tobytes()
+
+
+def encode(frame_numbers):
+    values = np.unique(np.asarray(list(frame_numbers), dtype=np.int64))
+    if len(values) and (values[0] < 0 or values[-1] >= 2**32):
+        raise ValueError("frame numbers must be between 0 and 2**32 - 1")
+
+    keys = values >> 16
+    boundaries = np.flatnonzero(np.diff(keys)) + 1
+    chunks = np.split((values & 0xFFFF).astype(np.uint16), boundaries)
+    container_keys = keys[np.r_[0, boundaries]] if len(values) else []
+
+    headers = np.zeros(len(container_keys), dtype=CONTAINER)
+    payloads = []
+    for i, (key, low) in enumerate(zip(container_keys, chunks)):
+        kind, words, payload = _encode_container(low)
+        headers[i] = (key, kind, len(low), words)
+        payloads.append(payload)
+    return HEADER.pack(VERSION, len(headers)) + headers.tobytes() + b"".join(payloads)
+
+
+def decode(data):
+    data = bytes(data)
+    version, num_containers = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unknown frame bitmap version {version}")
+    headers = np.frombuffer(
+        data, dtype=CONTAINER, count=num_containers, offset=HEADER.size
+    )
+    offset = HEADER.size + headers.nbytes
+    chunks = [np.empty(0, dtype=np.int64)]
+    for key, kind, _, words in headers.tolist():
+        payload = np.frombuffer(data, dtype="<u2", count=words, offset=offset)
+        offset += words * 2
+        if kind == ARRAY:
+            low = payload.astype(np.int64)
+        elif kind == RUNS:
+            starts = payload[::2].astype(np.int64)
+            lengths = payload[1::2].astype(np.int64) + 1
+            low = np.repeat(starts, lengths) + (
+                np.arange(lengths.sum())
+                - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            )
+        else:
+            low = np.flatnonzero(
+                np.unpackbits(payload.view(np.uint8), bitorder="little")
+            )
+        chunks.append((key << 16) | low)
+    return np.concatenate(chunks)
+
+
+def _frame_number(value):
+    # frame numbers may have been stored as numeric strings or integral floats
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{value!r} is not a frame number")
+    return int(value)
+
+
+def encode_frame_lists(apps, schema_editor):
+    FrameFilter = apps.get_model("cognition", "FrameFilter")
+    errors = []
+    for frame_filter in FrameFilter.objects.all().iterator():
+        frames = frame_filter.frames
+        # the frontend treated filters without a frame list as not filtering
+        if not frames:
+            continue
+        try:
+            if not isinstance(frames, dict) or frames.keys() != {"frame_list"}:
+                raise ValueError('expected {"frame_list": [...]}')
+            if not isinstance(frames["frame_list"], list):
+                raise ValueError("frame_list is not a list")
+            frame_filter.bitmap = encode(_frame_number(n) for n in frames["frame_list"])
+        except (TypeError, ValueError) as e:
+            errors.append(f"FrameFilter {frame_filter.id}: {e}")
+            continue
+        frame_filter.save(update_fields=["bitmap"])
+    if errors:
+        # frames is removed by this migration, nothing may be dropped silently
+        raise ValueError(
+            "frame filters that can not be converted, fix or delete them first:\n"
+            + "\n".join(errors)
+        )
+
+
+def decode_bitmaps(apps, schema_editor):
+    FrameFilter = apps.get_model("cognition", "FrameFilter")
+    for frame_filter in FrameFilter.objects.filter(bitmap__isnull=False).iterator():
+        frame_list = decode(frame_filter.bitmap).tolist()
+        frame_filter.frames = {"frame_list": frame_list}
+        frame_filter.save(update_fields=["frames"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cognition", "0011_cognitionframe_cognition_c_log_id_129cb4_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="framefilter",
+            name="bitmap",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(encode_frame_lists, decode_bitmaps),
+        migrations.RemoveField(
+            model_name="framefilter",
+            name="frames",
+        ),
+    ]
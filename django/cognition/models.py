@@ -21,6 +21,8 @@ class CognitionFrame(models.Model):
         verbose_name_plural = "Cognition Frames"
         indexes = [
             models.Index(fields=["log", "frame_number"]),
+            # used for finding the closest frame of the other thread by time
+            models.Index(fields=["log", "frame_time"]),
         ]
         unique_together = ("log", "frame_number")
 
@@ -31,11 +33,41 @@ class FrameFilter(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="frame_filter"
     )
     name = models.CharField(max_length=100)
-    frames = models.JSONField(blank=True, null=True)
+    # compressed frame numbers, see cognition/frame_bitmap.py. Without a bitmap nothing is filtered
+    bitmap = models.BinaryField(blank=True, null=True)
 
     unique_together = ("log", "user", "name")
 
 
+class RepresentationChunk(models.Model):
+    """
+    Columnar copy of a representation of one log. Each chunk holds a run of consecutive frames
+    as zlib compressed json with one list per column (frame_number, frame_time, representation_data),
+    so reading a frame range only touches a few rows instead of one row per frame.
+    """
+
+    log = models.ForeignKey(
+        Log, on_delete=models.CASCADE, related_name="representation_chunks"
+    )
+    representation = models.CharField(max_length=40)
+    first_frame = models.IntegerField()
+    last_frame = models.IntegerField()
+    num_frames = models.IntegerField()
+    data = models.BinaryField()
+
+    def __str__(self):
+        return f"{self.log}-{self.representation}-{self.first_frame}"
+
+    class Meta:
+        verbose_name_plural = "Representation Chunks"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["log", "representation", "first_frame"],
+                name="unique_representation_chunk",
+            )
+        ]
+
+
 class AudioData(models.Model):
     frame = models.ForeignKey(
         CognitionFrame, on_delete=models.CASCADE, related_name="audiodata"
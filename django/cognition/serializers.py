@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from . import frame_bitmap
 from .models import (
     CognitionFrame,
     FrameFilter,
@@ -34,9 +35,47 @@ class CognitionFrameSerializer(serializers.ModelSerializer):
 
 
 class FrameFilterSerializer(serializers.ModelSerializer):
+    # the api keeps {"frame_list": [...]}, the frames are stored as a bitmap
+    frames = serializers.JSONField(write_only=True)
+    cardinality = serializers.SerializerMethodField()
+
     class Meta:
         model = FrameFilter
-        fields = ["log", "frames", "name"]
+        fields = ["id", "log", "frames", "name", "cardinality"]
+
+    def validate_frames(self, value):
+        if not isinstance(value, dict) or not isinstance(value.get("frame_list"), list):
+            raise serializers.ValidationError('expected {"frame_list": [...]}')
+        try:
+            return frame_bitmap.encode(
+                self._frame_number(n) for n in value["frame_list"]
+            )
+        except (TypeError, ValueError, OverflowError) as e:
+            raise serializers.ValidationError(str(e))
+
+    @staticmethod
+    def _frame_number(value):
+        # same rule as migration 0012, numpy would silently truncate floats and bools
+        # and flatten nested lists
+        if isinstance(value, bool) or (
+            isinstance(value, float) and not value.is_integer()
+        ):
+            raise ValueError(f"{value!r} is not a frame number")
+        return int(value)
+
+    def get_cardinality(self, instance):
+        if instance.bitmap is None:
+            return None
+        return frame_bitmap.cardinality(instance.bitmap)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.bitmap is not None:
+            frame_list = frame_bitmap.decode(instance.bitmap).tolist()
+            data["frames"] = {"frame_list": frame_list}
+        else:
+            data["frames"] = None
+        return data
 
     def create(self, validated_data):
         user = self.context["request"].user
@@ -46,10 +85,15 @@ class FrameFilterSerializer(serializers.ModelSerializer):
             log=validated_data["log"],
             name=validated_data["name"],
             user=user,
-            defaults={"frames": validated_data["frames"]},
+            defaults={"bitmap": validated_data["frames"]},
         )
         return instance
 
+    def update(self, instance, validated_data):
+        if "frames" in validated_data:
+            validated_data["bitmap"] = validated_data.pop("frames")
+        return super().update(instance, validated_data)
+
 
 class AudioDataSerializer(serializers.ModelSerializer):
     frame_number = serializers.ReadOnlyField()
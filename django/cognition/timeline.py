@@ -0,0 +1,61 @@
+"""
+Cached per log frame time index used to map timestamps to cognition frames.
+
+The sorted frame times of a log are loaded once, cached and then searched with binary search.
+Everything that inserts, deletes or changes cognition frames must call invalidate_timeline.
+"""
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import CognitionFrame
+
+# invalidation happens on ingest, the timeout only protects against changes made outside the api
+TIMELINE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(log_id):
+    return f"cognition:timeline:{log_id}"
+
+
+def frame_timeline(log_id):
+    """
+    Returns (frame_times, frame_numbers) of a log as numpy arrays sorted by frame time.
+    """
+    key = _cache_key(log_id)
+    timeline = cache.get(key)
+    if timeline is None:
+        rows = (
+            CognitionFrame.objects.filter(
+                log=log_id, frame_time__isnull=False, frame_number__isnull=False
+            )
+            .order_by("frame_time", "frame_number")
+            .values_list("frame_time", "frame_number")
+        )
+        data = np.array(list(rows), dtype=np.int64).reshape(-1, 2)
+        timeline = (data[:, 0].copy(), data[:, 1].copy())
+        cache.set(key, timeline, TIMELINE_CACHE_TIMEOUT)
+    return timeline
+
+
+def invalidate_timeline(*log_ids):
+    cache.delete_many([_cache_key(log_id) for log_id in log_ids])
+
+
+def closest_frame_numbers(log_id, times):
+    """
+    Returns the frame number with the closest frame time for each of the given times,
+    on a tie the earlier frame wins. Returns None if the log has no frames.
+    """
+    frame_times, frame_numbers = frame_timeline(log_id)
+    if len(frame_times) == 0:
+        return None
+
+    times = np.asarray(times, dtype=np.float64)
+    if len(frame_times) == 1:
+        return np.full(times.shape, frame_numbers[0])
+
+    right = np.searchsorted(frame_times, times).clip(1, len(frame_times) - 1)
+    left = right - 1
+    closer_left = times - frame_times[left] <= frame_times[right] - times
+    return frame_numbers[np.where(closer_left, left, right)]
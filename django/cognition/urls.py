@@ -15,6 +15,11 @@ urlpatterns = [
         views.CognitionFrameUpdate.as_view(),
         name="cognitionframe-update",
     ),
+    path(
+        "cognitionframe/link/",
+        views.FrameLinkView.as_view(),
+        name="cognitionframe-link",
+    ),
 ]
 
 router = routers.DefaultRouter()
@@ -2,15 +2,36 @@ from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from .models import CognitionFrame, FrameFilter
 from . import serializers
-
-from django.db import connection
-from django.db.models import Q
+from . import columnar
+from . import frame_bitmap
+from .timeline import invalidate_timeline
+from .frame_index import frame_index, invalidate_filter_index, invalidate_frame_index
+from .frame_linking import link_closest_frames
+from .decoding import decode_missing
+
+from django.db import connection, transaction
+from django.db.models import Q, F
+from django.http import StreamingHttpResponse
 from django.apps import apps
+from common.models import Log
 from psycopg2.extras import execute_values
+from core.bulk import bulk_update, copy_upsert
+from core.pagination import keyset_iterator
+from core.parsers import NDJSONParser, NDJSONStream
+from core.renderers import ColumnarListMixin
+from core.response_cache import CachedListMixin, bump_log_versions
+from common.counts import add_counts, get_count, reset_counts
+from collections import Counter
 import json
 
+# default and maximum number of rows fetched per query in the export endpoint
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_MAX_CHUNK_SIZE = 50000
+
 
 class DynamicModelMixin:
     def get_model(self):
@@ -27,7 +48,9 @@ class DynamicModelMixin:
         qs = model.objects.all()
         # if log_id was set filter for it
         if "log" in query_params.keys():
-            log_id = int(query_params.pop("log")[0])
+            log_id = query_params.pop("log")[0]
+            if not log_id.isdigit():
+                raise ValidationError({"error": "log must be an integer"})
             qs = qs.filter(frame__log=log_id)
 
         filters = Q()
@@ -38,7 +61,13 @@ class DynamicModelMixin:
         return qs.filter(filters)
 
 
-class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
+class DynamicModelViewSet(
+    ColumnarListMixin, CachedListMixin, DynamicModelMixin, viewsets.ModelViewSet
+):
+    # ndjson uploads are streamed row by row into the bulk insert instead of being parsed upfront
+    parser_classes = [JSONParser, NDJSONParser]
+    columnar_related_fields = ("frame__frame_number",)
+
     # No need to define queryset or serializer_class here; they will be set dynamically
     def get_serializer_class(self):
         # Dynamically set the serializer class based on the model
@@ -48,8 +77,8 @@ class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
         return getattr(serializers, serializer_class_name)
 
     def create(self, request, *args, **kwargs):
-        # Check if the data is a list (bulk create) or dict (single create)
-        is_many = isinstance(request.data, list)
+        # Check if the data is a list or a ndjson stream (bulk create) or dict (single create)
+        is_many = isinstance(request.data, (list, NDJSONStream))
         if not is_many:
             print("error: input not a list")
             return Response({}, status=status.HTTP_411_LENGTH_REQUIRED)
@@ -57,23 +86,55 @@ class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
         # Dynamically get the model
         model = self.get_model()
 
-        # Prepare the data for bulk insert
-        rows_tuples = [
-            (row["frame"], json.dumps(row["representation_data"]))
+        # rows are rendered lazily while postgres reads the COPY stream, rows can come without
+        # representation_data, it is then decoded from the log file when it is requested
+        rows_tuples = (
+            (
+                row["frame"],
+                row.get("start_pos"),
+                row.get("size"),
+                None
+                if row.get("representation_data") is None
+                else json.dumps(row["representation_data"]),
+            )
             for row in request.data
-        ]
-
-        with connection.cursor() as cursor:
-            query = f"""
-            INSERT INTO cognition_{model.__name__.lower()} (frame_id, representation_data)
-            VALUES %s
-            ON CONFLICT (frame_id) DO UPDATE SET representation_data = EXCLUDED.representation_data;
-            """
-            # rows is a list of tuples containing the data
-            execute_values(cursor, query, rows_tuples, page_size=500)
+        )
+        with transaction.atomic():
+            new_frames = copy_upsert(
+                model._meta.db_table,
+                ["frame_id", "start_pos", "size", "representation_data"],
+                rows_tuples,
+                conflict_columns=["frame_id"],
+                update_columns=["start_pos", "size", "representation_data"],
+                frame_table=CognitionFrame._meta.db_table,
+                # uploads with only offsets or only data complete each other
+                keep_existing=True,
+            )
+            add_counts(model.__name__, new_frames, self.count_rows)
+            columnar.delete_chunks(new_frames, model.__name__)
+        bump_log_versions(*new_frames)
 
         return Response({}, status=status.HTTP_200_OK)
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        reset_counts([instance.frame.log_id], self.get_model().__name__)
+        columnar.delete_chunks([instance.frame.log_id], self.get_model().__name__)
+
+    def get_serializer(self, *args, **kwargs):
+        # fill in representation_data of rows that were ingested with offsets only
+        if args and self.action in ("list", "retrieve"):
+            if kwargs.get("many"):
+                instances = list(args[0])
+                args = (instances, *args[1:])
+            else:
+                instances = [args[0]]
+            decode_missing(self.get_model().__name__, instances)
+        return super().get_serializer(*args, **kwargs)
+
+    def count_rows(self, log_id):
+        return self.get_model().objects.filter(frame__log=log_id).count()
+
     @action(detail=False, methods=["get"], url_path="count")
     def count_records(self, request, *args, **kwargs):
         """
@@ -83,29 +144,130 @@ class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
         # Get filter parameters from query string
         log_id = request.query_params.get("log")
 
-        model = self.get_model()
-        queryset = model.objects.filter(frame__log=log_id)
-
-        # You can add any additional filtering here if needed
-        count = queryset.count()
+        # served from the counts maintained by create
+        count = get_count(log_id, self.get_model().__name__, self.count_rows)
 
         return Response({"count": count})
 
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request, *args, **kwargs):
+        """
+        Streams all rows of a log as ndjson ordered by frame number.
+        Accessible at /api/cognition/<modelname>/export/?log=<log_id>&chunk_size=<rows per query>
+        """
+        log_id = request.query_params.get("log")
+        if not log_id:
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            log_id = int(log_id)
+            chunk_size = int(request.query_params.get("chunk_size", EXPORT_CHUNK_SIZE))
+        except ValueError:
+            return Response(
+                {"error": "log and chunk_size must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        chunk_size = max(1, min(chunk_size, EXPORT_MAX_CHUNK_SIZE))
+
+        # rows of frames without a frame number can not be ordered by it
+        queryset = (
+            self.get_model()
+            .objects.filter(frame__log=log_id, frame__frame_number__isnull=False)
+            .values(
+                "id",
+                "frame",
+                "start_pos",
+                "size",
+                "representation_data",
+                frame_number=F("frame__frame_number"),
+            )
+        )
+        rows = keyset_iterator(queryset, "frame_number", chunk_size)
+
+        return StreamingHttpResponse(
+            (json.dumps(row) + "\n" for row in rows),
+            content_type="application/x-ndjson",
+        )
+
+    @action(detail=False, methods=["post"], url_path="pack")
+    def pack_columnar(self, request, *args, **kwargs):
+        """
+        Builds the columnar copy of this representation for a log.
+        Accessible at /api/cognition/<modelname>/pack/?log=<log_id>
+        """
+        log_id = request.query_params.get("log")
+        if not log_id:
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            log_id = int(log_id)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "log must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        num_frames = columnar.pack_representation(self.get_model(), log_id)
+        return Response({"frames": num_frames}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="columnar")
+    def read_columnar(self, request, *args, **kwargs):
+        """
+        Returns a frame range of the packed representation as columns.
+        Accessible at /api/cognition/<modelname>/columnar/?log=<log_id>&start=<frame>&end=<frame>
+        """
+        log_id = request.query_params.get("log")
+        if not log_id:
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start = request.query_params.get("start")
+        end = request.query_params.get("end")
+        try:
+            log_id = int(log_id)
+            start = int(start) if start else None
+            end = int(end) if end else None
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "log, start and end must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = columnar.read_representation(
+            self.get_model().__name__, log_id, start=start, end=end
+        )
+        if data is None:
+            return Response(
+                {"error": "representation is not packed for this log"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def count_cognition_frames(log_id):
+    return CognitionFrame.objects.filter(log=log_id).count()
+
 
 class CognitionFrameCount(APIView):
+    queryset = CognitionFrame.objects.all()
+
     def get(self, request):
         # Get filter parameters from query string
         log_id = request.query_params.get("log")
 
-        # query the data
-        queryset = CognitionFrame.objects.filter(log=log_id)
-
-        # get the count
-        count = queryset.count()
+        # served from the counts maintained by CognitionFrameViewSet.create
+        count = get_count(log_id, "CognitionFrame", count_cognition_frames)
         return Response({"count": count}, status=status.HTTP_200_OK)
 
 
 class CognitionFrameUpdate(APIView):
+    queryset = CognitionFrame.objects.all()
+
     def patch(self, request):
         data = self.request.data
         try:
@@ -126,63 +288,71 @@ class CognitionFrameUpdate(APIView):
             )
 
     def bulk_update(self, data):
-        update_fields = set()
-
-        # since closest_motion_frame is a foreign key and therefore has not the same name in the db
-        # as it has in django we need to take care of the transformation manually here
-        transformed_data = []
-
-        for item in data:
-            new_item = {}
-            for key, value in item.items():
-                if key == "closest_motion_frame":
-                    new_item["closest_motion_frame_id"] = value
-                else:
-                    new_item[key] = value
-            transformed_data.append(new_item)
-
-        for item in transformed_data:
-            update_fields.update(key for key in item.keys() if key != "id")
-
-        # Build the case statements for each field
-        case_statements = []
-        for field in update_fields:
-            case_when_parts = []
-            for item in transformed_data:
-                print("item", item)
-                if field in item and item[field] is not None:
-                    case_when_parts.append(f"WHEN id = {item['id']} THEN %s")
-
-            if case_when_parts:
-                case_stmt = (
-                    f"""{field} = (CASE {" ".join(case_when_parts)} ELSE {field} END)"""
-                )
-                case_statements.append(case_stmt)
-
-        # Collect all values for the parameterized query
-        update_values = []
-        for field in update_fields:
-            for item in transformed_data:
-                if field in item and item[field] is not None:
-                    update_values.append(item[field])
-
-        # Build the complete SQL query
-        ids = [str(item["id"]) for item in transformed_data]
-        sql = f"""
-            UPDATE cognition_cognitionframe
-            SET {", ".join(case_statements)}
-            WHERE id IN ({",".join(ids)})
-        """
-        print(sql)
+        # closest_motion_frame can be given by field name, the engine maps it to its column
+        ids = bulk_update(CognitionFrame, data)
+
+        log_ids = (
+            CognitionFrame.objects.filter(id__in=ids)
+            .values_list("log", flat=True)
+            .distinct()
+        )
+        bump_log_versions(*log_ids)
+        if any(item.get("frame_time") is not None for item in data):
+            invalidate_timeline(*log_ids)
+        if any(item.get("frame_number") is not None for item in data):
+            invalidate_frame_index(*log_ids)
+        if any(
+            item.get("frame_time") is not None or item.get("frame_number") is not None
+            for item in data
+        ):
+            columnar.delete_chunks(log_ids)
+        return len(ids)
+
+
+class FrameLinkView(APIView):
+    """
+    Links all cognition and motion frames of a log to the closest frame of the other thread.
+    Replaces computing the links on the client and sending them back via the update endpoints.
+    """
+
+    queryset = CognitionFrame.objects.all()
 
-        with connection.cursor() as cursor:
-            cursor.execute(sql, update_values)
-            return cursor.rowcount
+    def post(self, request):
+        log_id = request.query_params.get("log")
+        if not log_id and isinstance(request.data, dict):
+            log_id = request.data.get("log")
+        if not log_id:
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            log_id = int(log_id)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "log must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not Log.objects.filter(id=log_id).exists():
+            return Response(
+                {"error": "log not found"}, status=status.HTTP_404_NOT_FOUND
+            )
 
+        cognition_updated, motion_updated = link_closest_frames(log_id)
+        bump_log_versions(log_id)
+        return Response(
+            {
+                "cognition_frames_updated": cognition_updated,
+                "motion_frames_updated": motion_updated,
+            },
+            status=status.HTTP_200_OK,
+        )
 
-class CognitionFrameViewSet(viewsets.ModelViewSet):
+
+class CognitionFrameViewSet(ColumnarListMixin, CachedListMixin, viewsets.ModelViewSet):
     serializer_class = serializers.CognitionFrameSerializer
     queryset = CognitionFrame.objects.all()
+    cache_log_path = "log"
 
     def get_queryset(self):
         queryset = CognitionFrame.objects.all()
@@ -207,27 +377,54 @@ class CognitionFrameViewSet(viewsets.ModelViewSet):
             (row["log"], row["frame_number"], row["frame_time"]) for row in request.data
         ]
 
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             query = """
             INSERT INTO cognition_cognitionframe (log_id, frame_number, frame_time)
             VALUES %s
-            ON CONFLICT (log_id, frame_number) DO NOTHING;
+            ON CONFLICT (log_id, frame_number) DO NOTHING
+            RETURNING log_id;
             """
             # rows is a list of tuples containing the data
-            execute_values(cursor, query, rows_tuples, page_size=500)
+            inserted = execute_values(
+                cursor, query, rows_tuples, page_size=500, fetch=True
+            )
+            add_counts(
+                "CognitionFrame",
+                Counter(log_id for (log_id,) in inserted),
+                count_cognition_frames,
+            )
 
+        log_ids = {row[0] for row in rows_tuples}
+        invalidate_timeline(*log_ids)
+        invalidate_frame_index(*log_ids)
+        bump_log_versions(*log_ids)
         return Response({}, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         # Override destroy method to handle both single and bulk delete
         if kwargs.get("pk") == "all":
-            deleted_count, _ = self.get_queryset().delete()
+            queryset = self.get_queryset()
+            log_ids = set(queryset.values_list("log", flat=True).distinct())
+            deleted_count, _ = queryset.delete()
+            invalidate_timeline(*log_ids)
+            invalidate_frame_index(*log_ids)
+            bump_log_versions(*log_ids)
+            # the representations of the deleted frames are gone as well
+            reset_counts(log_ids)
+            columnar.delete_chunks(log_ids)
             return Response(
                 {"message": f"Deleted {deleted_count} objects"},
                 status=status.HTTP_204_NO_CONTENT,
             )
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_timeline(instance.log_id)
+        invalidate_frame_index(instance.log_id)
+        reset_counts([instance.log_id])
+        columnar.delete_chunks([instance.log_id])
+
 
 class FrameFilterView(viewsets.ModelViewSet):
     serializer_class = serializers.FrameFilterSerializer
@@ -244,4 +441,85 @@ class FrameFilterView(viewsets.ModelViewSet):
         return context
 
     def perform_create(self, serializer):
-        serializer.save()
+        # create updates an existing filter with the same name
+        invalidate_filter_index(serializer.save())
+
+    def perform_update(self, serializer):
+        invalidate_filter_index(serializer.save())
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_filter_index(instance)
+
+    @action(detail=False, methods=["post"], url_path="combine")
+    def combine(self, request, *args, **kwargs):
+        """
+        Combines frame filters of one log with union, intersection or difference, applied from
+        left to right. A filter without frames stands for all frames of the log.
+        With a name the result is saved as a filter, with cardinality_only only the number of
+        frames is returned.
+        Accessible at /api/frame-filter/combine/ with
+        {"operation": "intersection", "filters": [<filter_id>, ...], "name": <name>}
+        """
+        operation = request.data.get("operation")
+        filter_ids = request.data.get("filters") or []
+        if operation not in frame_bitmap.OPERATIONS:
+            operations = ", ".join(frame_bitmap.OPERATIONS)
+            return Response(
+                {"error": f"operation must be one of {operations}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            if not isinstance(filter_ids, list):
+                raise TypeError
+            filter_ids = [int(filter_id) for filter_id in filter_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "filters must be a list of filter ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(filter_ids) < 2:
+            return Response(
+                {"error": "you need to provide at least two filters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        filters = self.get_queryset().in_bulk(filter_ids)
+        missing = set(filter_ids) - filters.keys()
+        if missing:
+            return Response(
+                {"error": f"unknown filters {sorted(missing)}"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        log_ids = {frame_filter.log_id for frame_filter in filters.values()}
+        if len(log_ids) > 1:
+            return Response(
+                {"error": "filters belong to different logs"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        log_id = log_ids.pop()
+
+        frame_lists = [
+            frame_index(log_id)
+            if filters[filter_id].bitmap is None
+            else frame_bitmap.decode(filters[filter_id].bitmap)
+            for filter_id in filter_ids
+        ]
+        frames = frame_bitmap.combine(operation, frame_lists)
+
+        name = request.data.get("name")
+        if name:
+            instance, _ = FrameFilter.objects.update_or_create(
+                log_id=log_id,
+                name=name,
+                user=request.user,
+                defaults={"bitmap": frame_bitmap.encode(frames)},
+            )
+            invalidate_filter_index(instance)
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        result = {"log": log_id, "cardinality": len(frames)}
+        if not request.data.get("cardinality_only"):
+            result["frames"] = {"frame_list": frames.tolist()}
+        return Response(result, status=status.HTTP_200_OK)
@@ -0,0 +1,75 @@
+"""
+Materialized per log row counts of the representation tables.
+
+The ingest tooling polls the count endpoints for every representation of a log, so instead of
+running COUNT(*) over the joins on each call the counts are kept in LogRepresentationCount.
+A count is computed once on first access and from then on increased by the bulk ingest endpoints
+in the same transaction that inserts the rows. Endpoints that delete rows reset the count, it is
+then computed again on the next access.
+"""
+
+from django.db import connection
+from django.db.models import F
+
+from .models import LogRepresentationCount
+
+# the select skips logs that do not exist, the count endpoints accept any log id
+STORE_QUERY = """
+INSERT INTO common_logrepresentationcount (log_id, representation, num_rows)
+SELECT id, %s, %s FROM common_log WHERE id = %s
+ON CONFLICT (log_id, representation) {on_conflict};
+"""
+
+
+def get_count(log_id, representation, count_rows):
+    """
+    Returns the stored count, count_rows(log_id) is used to compute it if there is none yet.
+    """
+    num_rows = (
+        LogRepresentationCount.objects.filter(log=log_id, representation=representation)
+        .values_list("num_rows", flat=True)
+        .first()
+    )
+    if num_rows is None:
+        num_rows = count_rows(log_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                STORE_QUERY.format(on_conflict="DO NOTHING"),
+                [representation, num_rows, log_id],
+            )
+    return num_rows
+
+
+def add_counts(representation, new_rows, count_rows):
+    """
+    Adds new_rows[log_id] rows to the counts of the given logs. Must be called inside the
+    transaction that inserted the rows. Logs without a stored count are counted completely
+    with count_rows(log_id), which already includes the new rows.
+    """
+    for log_id, num_new in new_rows.items():
+        if not num_new:
+            continue
+        updated = LogRepresentationCount.objects.filter(
+            log=log_id, representation=representation
+        ).update(num_rows=F("num_rows") + num_new)
+        if not updated:
+            # a concurrent first access may store its count in between, it can not contain our
+            # uncommitted rows so they are added on top
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    STORE_QUERY.format(
+                        on_conflict="DO UPDATE SET num_rows = "
+                        "common_logrepresentationcount.num_rows + %s"
+                    ),
+                    [representation, count_rows(log_id), log_id, num_new],
+                )
+
+
+def reset_counts(log_ids, representation=None):
+    """
+    Drops the stored counts of the given logs (all representations if none is given).
+    """
+    qs = LogRepresentationCount.objects.filter(log__in=log_ids)
+    if representation is not None:
+        qs = qs.filter(representation=representation)
+    qs.delete()
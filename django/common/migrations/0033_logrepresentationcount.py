@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("common", "0032_experiment_experiment_folder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LogRepresentationCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("representation", models.CharField(max_length=100)),
+                ("num_rows", models.IntegerField()),
+                (
+                    "log",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="representation_counts",
+                        to="common.log",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("log", "representation")},
+            },
+        ),
+    ]
@@ -201,3 +201,19 @@ class LogStatus(models.Model):
 
     class Meta:
         verbose_name_plural = "Log status"
+
+
+class LogRepresentationCount(models.Model):
+    """
+    Number of rows of a representation that are in the db for a log, maintained by the ingest
+    endpoints so that the count endpoints do not need to run COUNT(*) (see common/counts.py).
+    """
+
+    log = models.ForeignKey(
+        Log, on_delete=models.CASCADE, related_name="representation_counts"
+    )
+    representation = models.CharField(max_length=100)
+    num_rows = models.IntegerField()
+
+    class Meta:
+        unique_together = ("log", "representation")
@@ -0,0 +1,265 @@
+"""
+Bulk ingest helpers shared by the representation, motion, behavior and image endpoints.
+
+Instead of sending many multi-row INSERT statements we stream the rows into a temporary
+staging table with COPY FROM STDIN and merge them into the target table with a single
+INSERT ... SELECT ... ON CONFLICT statement.
+Bulk updates join the target table against a VALUES list instead of building a CASE branch
+per row and field.
+Catalog upserts that need the ids of new and existing rows use a single
+INSERT ... VALUES ... ON CONFLICT ... RETURNING statement.
+"""
+
+import csv
+import io
+
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+
+# number of rows per UPDATE ... FROM (VALUES ...) statement
+BULK_UPDATE_BATCH_SIZE = 5000
+
+
+class CopyStream(io.TextIOBase):
+    """
+    File like object that lazily renders an iterable of row tuples as CSV for COPY FROM STDIN.
+
+    psycopg2 pulls the data in chunks via read(size), so only a small part of the upload is
+    rendered at any time. None values are written unquoted which COPY interprets as NULL.
+    Exceptions raised by the row iterable are kept in error since psycopg2 replaces them with
+    a generic COPY failure.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.error = None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(
+            self._buffer, quoting=csv.QUOTE_NOTNULL, lineterminator="\n"
+        )
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or self._buffer.tell() < size:
+            try:
+                row = next(self._rows, None)
+            except Exception as exc:
+                self.error = exc
+                raise
+            if row is None:
+                break
+            self._writer.writerow(row)
+
+        data = self._buffer.getvalue()
+        rest = ""
+        if size is not None and size >= 0:
+            data, rest = data[:size], data[size:]
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._buffer.write(rest)
+        return data
+
+
+def copy_upsert(
+    table,
+    columns,
+    rows,
+    conflict_columns,
+    update_columns=None,
+    frame_table=None,
+    keep_existing=False,
+):
+    """
+    Inserts rows into table via a COPY staging table and returns the number of affected rows.
+
+    If update_columns is empty conflicting rows are ignored (ON CONFLICT DO NOTHING),
+    otherwise the given columns are overwritten with the new values. With keep_existing new
+    NULL values do not overwrite the current value of a column.
+    Duplicates of the conflict columns inside one upload are collapsed to a single row since
+    postgres can not update the same row twice in one statement, the last row of the upload wins.
+
+    If frame_table is given (the table frame_id refers to) a dict of log id to the number of
+    frames that had no rows in table before is returned instead, used to maintain the counts.
+    It contains every log with inserted or updated rows, also those without new frames.
+    """
+    stage = f"{table}_stage"
+    column_list = ", ".join(columns)
+    conflict_list = ", ".join(conflict_columns)
+
+    if update_columns:
+        value = "COALESCE(EXCLUDED.{0}, {1}.{0})" if keep_existing else "EXCLUDED.{0}"
+        on_conflict = "DO UPDATE SET " + ", ".join(
+            f"{column} = {value.format(column, table)}" for column in update_columns
+        )
+    else:
+        on_conflict = "DO NOTHING"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE {stage} ON COMMIT DROP AS
+            SELECT {column_list} FROM {table} WITH NO DATA;
+            ALTER TABLE {stage} ADD COLUMN stage_seq bigint GENERATED ALWAYS AS IDENTITY;
+            """
+        )
+        stream = CopyStream(rows)
+        try:
+            cursor.copy_expert(
+                f"COPY {stage} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                stream,
+            )
+        except Exception:
+            # surface the original error, e.g. a malformed row in a streamed upload
+            if stream.error is not None:
+                raise stream.error
+            raise
+        insert = f"""
+            INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({conflict_list}) {column_list} FROM {stage}
+            ORDER BY {conflict_list}, stage_seq DESC
+            ON CONFLICT ({conflict_list}) {on_conflict}
+        """
+        if frame_table is None:
+            cursor.execute(insert)
+            result = cursor.rowcount
+        else:
+            # all parts of the statement see the table as it was before the insert
+            cursor.execute(
+                f"""
+                WITH upserted AS ({insert} RETURNING frame_id)
+                SELECT f.log_id, count(DISTINCT u.frame_id) FILTER (
+                    WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.frame_id = u.frame_id)
+                )
+                FROM upserted u JOIN {frame_table} f ON f.id = u.frame_id
+                GROUP BY f.log_id;
+                """
+            )
+            result = dict(cursor.fetchall())
+        cursor.execute(f"DROP TABLE {stage};")
+
+    return result
+
+
+def bulk_update(model, rows, batch_size=BULK_UPDATE_BATCH_SIZE):
+    """
+    Updates rows of model identified by their primary key and returns the ids of the updated rows.
+
+    Each row is a dict with the primary key under "id" and field names (or attnames like
+    closest_motion_frame_id) as keys. Fields that are missing in a row or set to None keep
+    their current value. Values are converted like the ORM does and cast to the column type,
+    so NULL entries in the VALUES list stay typed. All batches run in one transaction.
+    """
+    opts = model._meta
+    pk = opts.pk
+
+    fields = {}
+    for row in rows:
+        for name in row:
+            if name != "id" and name not in fields:
+                # raises FieldDoesNotExist for unknown names, they never reach the sql
+                fields[name] = opts.get_field(name)
+    if not fields:
+        return []
+
+    columns = [field.column for field in fields.values()]
+    set_list = ", ".join(
+        f"{column} = COALESCE(v.{column}, t.{column})" for column in columns
+    )
+    template = (
+        "("
+        + ", ".join(
+            f"%s::{field.db_type(connection)}" for field in [pk, *fields.values()]
+        )
+        + ")"
+    )
+    sql = f"""
+        UPDATE {opts.db_table} AS t
+        SET {set_list}
+        FROM (VALUES %s) AS v ({pk.column}, {", ".join(columns)})
+        WHERE t.{pk.column} = v.{pk.column}
+        RETURNING t.{pk.column}
+    """
+
+    values = [
+        (
+            row["id"],
+            *(
+                None
+                if row.get(name) is None
+                else field.get_db_prep_save(row[name], connection)
+                for name, field in fields.items()
+            ),
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        result = execute_values(
+            cursor, sql, values, template=template, page_size=batch_size, fetch=True
+        )
+    return [row[0] for row in result]
+
+
+def upsert_returning(model, rows, conflict_fields, batch_size=BULK_UPDATE_BATCH_SIZE):
+    """
+    Inserts rows of model unless a row with the same conflict_fields exists and returns
+    (ids, created): a dict of conflict key tuple to the id of the new or existing row and the
+    number of inserted rows.
+
+    Each row is a dict of field names (or attnames like log_id) to values, conflict_fields must be
+    covered by a unique constraint. Existing rows are left unchanged, the ON CONFLICT DO UPDATE
+    only touches them so RETURNING yields their id as well. Rows with the same conflict key are
+    sent once, the first one wins. Only the rows of the batch are looked at, the cost does not
+    depend on the size of the table.
+    """
+    opts = model._meta
+    fields = {}
+    for name in conflict_fields:
+        fields[name] = opts.get_field(name)
+    for row in rows:
+        for name in row:
+            if name not in fields:
+                fields[name] = opts.get_field(name)
+
+    unique_rows = {}
+    for row in rows:
+        values = tuple(
+            None
+            if row.get(name) is None
+            else field.get_db_prep_save(row[name], connection)
+            for name, field in fields.items()
+        )
+        unique_rows.setdefault(values[: len(conflict_fields)], values)
+    if not unique_rows:
+        return {}, 0
+
+    columns = [field.column for field in fields.values()]
+    conflict_columns = columns[: len(conflict_fields)]
+    template = (
+        "("
+        + ", ".join(f"%s::{field.db_type(connection)}" for field in fields.values())
+        + ")"
+    )
+    sql = f"""
+        INSERT INTO {opts.db_table} ({", ".join(columns)})
+        VALUES %s
+        ON CONFLICT ({", ".join(conflict_columns)})
+        DO UPDATE SET {conflict_columns[0]} = EXCLUDED.{conflict_columns[0]}
+        RETURNING {opts.pk.column}, xmax = 0, {", ".join(conflict_columns)}
+    """
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        result = execute_values(
+            cursor,
+            sql,
+            list(unique_rows.values()),
+            template=template,
+            page_size=batch_size,
+            fetch=True,
+        )
+    ids = {tuple(key): pk for pk, _, *key in result}
+    created = sum(1 for _, inserted, *_ in result if inserted)
+    return ids, created
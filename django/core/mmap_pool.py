@@ -0,0 +1,115 @@
+"""
+Process wide pool of read-only mmaps of log files.
+
+Opening and mapping a multi GB log file for every request is expensive on the network mounted
+log volume, so the mappings are kept open and shared between the threads of a worker.
+The pool holds at most max_size files and evicts the least recently used one. A file whose size,
+mtime or inode changed is mapped again. Mappings are reference counted and only closed once the
+last user released them, eviction never invalidates a mapping that is still in use.
+
+The pool serves the paginated motion representation list, which reads a few small slices per
+request. Exports that read a whole log go through core/range_reader.py instead.
+"""
+
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# number of log files kept open per worker process
+MMAP_POOL_SIZE = 16
+
+
+class _Mapping:
+    def __init__(self, path, stat):
+        self.key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        self.refs = 0
+        self.evicted = False
+        if stat.st_size == 0:
+            # empty files can not be mapped
+            self.data = b""
+            return
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class MmapPool:
+    def __init__(self, max_size=MMAP_POOL_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._mappings = OrderedDict()
+
+    @contextmanager
+    def open(self, path):
+        """
+        Yields a read-only mmap (or b"" for an empty file) of the file at path.
+        Views into the mapping must not be used after the block.
+        """
+        mapping = self._acquire(os.fspath(path))
+        try:
+            yield mapping.data
+        finally:
+            self._release(mapping)
+
+    def clear(self):
+        with self._lock:
+            mappings = list(self._mappings.values())
+            self._mappings.clear()
+            for mapping in mappings:
+                self._evict(mapping)
+
+    def _acquire(self, path):
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        with self._lock:
+            mapping = self._mappings.get(path)
+            if mapping is not None and mapping.key == key:
+                self._mappings.move_to_end(path)
+                mapping.refs += 1
+                return mapping
+            if mapping is not None:
+                # the file was changed or replaced
+                del self._mappings[path]
+                self._evict(mapping)
+
+        # mapping happens outside of the lock, at worst two threads map the same file at once
+        mapping = _Mapping(path, stat)
+        mapping.refs = 1
+
+        with self._lock:
+            current = self._mappings.get(path)
+            if current is not None and current.key == key:
+                # another thread was faster, use its mapping
+                current.refs += 1
+                self._mappings.move_to_end(path)
+                mapping.close()
+                return current
+            if current is not None:
+                del self._mappings[path]
+                self._evict(current)
+            self._mappings[path] = mapping
+            while len(self._mappings) > self.max_size:
+                _, oldest = self._mappings.popitem(last=False)
+                self._evict(oldest)
+        return mapping
+
+    def _release(self, mapping):
+        with self._lock:
+            mapping.refs -= 1
+            if mapping.evicted and mapping.refs == 0:
+                mapping.close()
+
+    def _evict(self, mapping):
+        # called with the lock held
+        mapping.evicted = True
+        if mapping.refs == 0:
+            mapping.close()
+
+
+mmap_pool = MmapPool()
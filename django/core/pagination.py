@@ -4,3 +4,27 @@ from rest_framework.pagination import LimitOffsetPagination
 class LargeResultsSetPagination(LimitOffsetPagination):
     default_limit = 100
     page_size_query_param = "page_size"
+
+
+def keyset_iterator(queryset, key, chunk_size):
+    """
+    Yields all rows of a values() queryset ordered by key, fetching chunk_size rows per query.
+
+    Every query continues after the last key that was seen instead of using OFFSET, so each chunk
+    costs the same no matter how deep into the result we are. key must be unique and not null
+    within the queryset, iteration stops at the first null key.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    last_key = None
+    while True:
+        page = queryset.order_by(key)
+        if last_key is not None:
+            page = page.filter(**{f"{key}__gt": last_key})
+
+        rows = list(page[:chunk_size])
+        yield from rows
+
+        if len(rows) < chunk_size or rows[-1][key] is None:
+            return
+        last_key = rows[-1][key]
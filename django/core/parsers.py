@@ -0,0 +1,45 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONStream:
+    """
+    Iterator over the rows of a newline delimited json request body.
+
+    Rows are decoded one line at a time while the consumer reads them, so the upload is never
+    materialized in memory. The stream can only be consumed once.
+    """
+
+    def __init__(self, stream, encoding):
+        self._lines = iter(stream.readline, b"")
+        self.encoding = encoding
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for line in self._lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                return json.loads(line.decode(self.encoding))
+            except ValueError as exc:
+                raise ParseError(f"NDJSON parse error - {exc}")
+        raise StopIteration
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses application/x-ndjson bodies lazily, request.data will be a NDJSONStream.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        return NDJSONStream(stream, encoding)
@@ -0,0 +1,78 @@
+"""
+Batched reads of (start_pos, size) slices from log files.
+
+Representation rows point into the original log files with start_pos and size. Reading them one by
+one results in thousands of small random reads which are slow on the network mounted log volume.
+read_ranges sorts the requested slices, merges slices that are adjacent or close to each other into
+blocks of up to MAX_READ_SIZE bytes, reads every block with a single pread into a preallocated
+buffer and returns the slices as memoryviews into those buffers.
+"""
+
+import os
+
+# slices closer than this are read together, the bytes in between are read and thrown away
+MAX_GAP = 64 * 1024
+# upper bound for a single read, a single slice larger than this is still read in one go
+MAX_READ_SIZE = 16 * 1024 * 1024
+
+
+def coalesce_ranges(ranges, max_gap=MAX_GAP, max_read_size=MAX_READ_SIZE):
+    """
+    Groups (start_pos, size) ranges into blocks.
+    Returns a list of (block_start, block_end, [index into ranges, ...]) ordered by position.
+    """
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+    blocks = []
+    for i in order:
+        start, size = ranges[i]
+        end = start + size
+        if blocks:
+            block_start, block_end, members = blocks[-1]
+            if (
+                start <= block_end + max_gap
+                and max(end, block_end) - block_start <= max_read_size
+            ):
+                blocks[-1] = (block_start, max(end, block_end), members)
+                members.append(i)
+                continue
+        blocks.append((start, end, [i]))
+    return blocks
+
+
+def _read_block(fd, buffer, offset):
+    view = memoryview(buffer)
+    read = 0
+    while read < len(buffer):
+        if hasattr(os, "preadv"):
+            n = os.preadv(fd, [view[read:]], offset + read)
+        else:
+            data = os.pread(fd, len(buffer) - read, offset + read)
+            n = len(data)
+            view[read : read + n] = data
+        if n == 0:
+            raise EOFError(
+                f"range {offset}-{offset + len(buffer)} is beyond the end of the file"
+            )
+        read += n
+
+
+def read_ranges(path, ranges, max_gap=MAX_GAP, max_read_size=MAX_READ_SIZE):
+    """
+    Reads the (start_pos, size) ranges from the file at path.
+    Returns one memoryview per range in the order of ranges.
+    """
+    result = [None] * len(ranges)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        for block_start, block_end, members in coalesce_ranges(
+            ranges, max_gap, max_read_size
+        ):
+            buffer = bytearray(block_end - block_start)
+            _read_block(fd, buffer, block_start)
+            block = memoryview(buffer)
+            for i in members:
+                start, size = ranges[i]
+                result[i] = block[start - block_start : start - block_start + size]
+    finally:
+        os.close(fd)
+    return result
@@ -0,0 +1,189 @@
+"""
+Arrow IPC stream and Parquet output for list endpoints.
+
+Record batches are built from the db cursor and written to the response one at a time, so the
+table of a long log is never held in memory completely.
+"""
+
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.db.models import F, TextField
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+# number of rows fetched from the db cursor per record batch
+BATCH_SIZE = 10000
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    Write only file object for the pyarrow writers, drain returns what was written since the last
+    call so it can be passed on to a streaming response.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+    charset = None
+    render_style = "binary"
+
+    def stream(self, schema, batches):
+        sink = ChunkSink()
+        writer = pa.ipc.new_stream(sink, schema)
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b"".join(self.stream(data.schema, data.to_batches()))
+
+
+class ParquetRenderer(ArrowStreamRenderer):
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+
+    def stream(self, schema, batches):
+        # every record batch becomes a row group, the footer is written on close
+        sink = ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+
+COLUMNAR_RENDERERS = (ArrowStreamRenderer, ParquetRenderer)
+
+
+def _arrow_type(field):
+    if field.is_relation:
+        field = field.target_field
+
+    internal_type = field.get_internal_type()
+    if internal_type in ("AutoField", "IntegerField"):
+        return pa.int32()
+    if internal_type in ("BigAutoField", "BigIntegerField"):
+        return pa.int64()
+    if internal_type == "FloatField":
+        return pa.float64()
+    if internal_type == "BooleanField":
+        return pa.bool_()
+    if internal_type == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    if internal_type == "DateField":
+        return pa.date32()
+    # json is passed through as text, everything else is rendered as string as well
+    return pa.string()
+
+
+def _resolve_field(model, path):
+    *relations, name = path.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def columnar_batches(queryset, related_fields=()):
+    """
+    Returns the pyarrow schema and a generator of record batches of all concrete fields of the
+    queryset model plus the given related field paths (e.g. frame__frame_number, exposed as
+    frame_number). Rows are read from the db cursor in batches and never turned into model
+    instances.
+    """
+    model = queryset.model
+    expressions = {}
+    types = []
+
+    for field in model._meta.concrete_fields:
+        if field.get_internal_type() == "JSONField":
+            # take the json text as it comes from the db instead of decoding it
+            expressions[field.name] = Cast(field.name, output_field=TextField())
+        else:
+            expressions[field.name] = F(field.name)
+        types.append(_arrow_type(field))
+
+    for path in related_fields:
+        expressions[path.split("__")[-1]] = F(path)
+        types.append(_arrow_type(_resolve_field(model, path)))
+
+    schema = pa.schema(list(zip(expressions.keys(), types)))
+    rows = queryset.values_list(*expressions.values())
+
+    def batches():
+        batch = []
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                yield pa.RecordBatch.from_arrays(list(zip(*batch)), schema=schema)
+                batch = []
+        if batch:
+            yield pa.RecordBatch.from_arrays(list(zip(*batch)), schema=schema)
+
+    return schema, batches()
+
+
+class ColumnarListMixin:
+    """
+    Lets the list action of a viewset answer with Arrow IPC streams or Parquet files, selected via
+    the Accept header or ?format=arrow / ?format=parquet. Those responses bypass the serializer.
+    The other actions do not offer the columnar formats.
+    """
+
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *COLUMNAR_RENDERERS]
+    # related field paths that are added as extra columns
+    columnar_related_fields = ()
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action == "list":
+            return renderers
+        return [r for r in renderers if not isinstance(r, COLUMNAR_RENDERERS)]
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, COLUMNAR_RENDERERS):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        schema, batches = columnar_batches(queryset, self.columnar_related_fields)
+        return StreamingHttpResponse(
+            renderer.stream(schema, batches), content_type=renderer.media_type
+        )
+
+    def handle_exception(self, exc):
+        # the columnar formats can only carry tables, errors are reported with the default renderer
+        if isinstance(
+            getattr(self.request, "accepted_renderer", None), COLUMNAR_RENDERERS
+        ):
+            renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+            self.request.accepted_renderer = renderer
+            self.request.accepted_media_type = renderer.media_type
+        return super().handle_exception(exc)
@@ -0,0 +1,96 @@
+"""
+Response cache for list endpoints that are filtered by log.
+
+Cached responses are keyed by the request path, the normalized query parameters and a per log
+version. Everything that changes data of a log calls bump_log_versions, which makes all cached
+responses of that log unreachable at once, the stale entries then expire with their timeout.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(log_id):
+    return f"log-version:{int(log_id)}"
+
+
+def log_version(log_id):
+    key = _version_key(log_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # another process may have created the version in between
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_log_versions(*log_ids):
+    # a new timestamp instead of incrementing, so an evicted version is never reused
+    version = time.time_ns()
+    cache.set_many({_version_key(log_id): version for log_id in log_ids}, None)
+
+
+def response_cache_key(request, log_id):
+    """
+    Returns the cache key of a request to an endpoint filtered by log_id.
+    """
+    params = sorted(
+        (name, sorted(values)) for name, values in request.query_params.lists()
+    )
+    digest = hashlib.md5(repr((request.path, params)).encode()).hexdigest()
+    return f"response:{int(log_id)}:{log_version(log_id)}:{digest}"
+
+
+def instance_log_id(instance, log_path):
+    """
+    Follows a lookup path like frame__log from instance and returns the log id.
+    """
+    *relations, name = log_path.split("__")
+    for relation in relations:
+        instance = getattr(instance, relation)
+    return getattr(instance, f"{name}_id")
+
+
+class CachedListMixin:
+    """
+    Caches list responses that are filtered with ?log=<id> and invalidates them when rows are
+    created, changed or deleted through the viewset. Bulk endpoints that bypass perform_create and
+    friends have to call bump_log_versions themselves.
+    """
+
+    # lookup path from the model to the log, used to invalidate on single object changes
+    cache_log_path = "frame__log"
+
+    def list(self, request, *args, **kwargs):
+        log_id = request.query_params.get("log")
+        if not log_id or not log_id.isdigit():
+            return super().list(request, *args, **kwargs)
+
+        key = response_cache_key(request, log_id)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        bump_log_versions(instance_log_id(serializer.instance, self.cache_log_path))
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        bump_log_versions(instance_log_id(serializer.instance, self.cache_log_path))
+
+    def perform_destroy(self, instance):
+        log_id = instance_log_id(instance, self.cache_log_path)
+        super().perform_destroy(instance)
+        bump_log_versions(log_id)
@@ -243,6 +243,15 @@ AUTH_USER_MODEL = "user.VATUser"
 # maximum fields allowed in one post request
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 30240
 
+# folder containing the raw log files, sensor_log_path and log_path of a log are relative to it
+LOG_ROOT = os.getenv("VAT_LOG_ROOT", "/mnt/e/logs")
+
+# image_url of an image is relative to IMAGE_ROOT, downscaled variants are cached in THUMBNAIL_ROOT
+IMAGE_ROOT = os.getenv("VAT_IMAGE_ROOT", LOG_ROOT)
+THUMBNAIL_ROOT = os.getenv("VAT_THUMBNAIL_ROOT", os.path.join(BASE_DIR, "thumbnails"))
+# upper bound for the thumbnail cache in bytes, the least recently used files are removed first
+THUMBNAIL_CACHE_SIZE = int(os.getenv("VAT_THUMBNAIL_CACHE_SIZE", 2 * 1024**3))
+
 CORS_ALLOW_METHODS = ["OPTIONS", "POST", "PUT", "DELETE"]
 
 # If you need to allow specific headers
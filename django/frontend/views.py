@@ -9,6 +9,8 @@ from common.models import Event, Game, Log, Experiment
 from image.models import NaoImage
 from annotation.models import Annotation
 from cognition.models import CognitionFrame, FrameFilter
+from cognition import frame_bitmap
+from cognition.frame_index import frame_neighbours
 from django.http import JsonResponse
 
 
@@ -99,11 +101,13 @@ class LogDetailView(DetailView):
         if filter_name and filter_name != "None":
             filtered_frames = FrameFilter.objects.filter(id=filter_name).first()
 
-            if filtered_frames:
+            if filtered_frames and filtered_frames.bitmap is not None:
                 first_image = (
                     CognitionFrame.objects.filter(
+                        frame_bitmap.frame_number_in(
+                            frame_bitmap.decode(filtered_frames.bitmap)
+                        ),
                         log=self.object,
-                        frame_number__in=filtered_frames.frames["frame_list"],
                     )
                     .order_by("frame_number")
                     .first()
@@ -123,56 +127,25 @@ class LogDetailView(DetailView):
 
 @method_decorator(login_required(login_url="mylogin"), name="dispatch")
 class ImageDetailView(View):
-    def _get_frame_numbers(self, log_id, user, current_filter_name):
-        """Gets the distinct list of frame numbers, potentially filtered."""
-        frame_numbers_qs = (
-            CognitionFrame.objects.filter(log=log_id)
-            .order_by("frame_number")
-            .values_list("frame_number", flat=True)
-            .distinct()
-        )
-
-        # Apply specific frame filter if provided and valid
-        if current_filter_name and current_filter_name != "None":
-            frame_filter = FrameFilter.objects.filter(id=current_filter_name).first()
-            if frame_filter and "frame_list" in frame_filter.frames:
-                # Filter the base query by the list from the FrameFilter
-                frame_numbers_qs = frame_numbers_qs.filter(
-                    frame_number__in=frame_filter.frames["frame_list"]
-                )
-
-        return list(frame_numbers_qs)  # Return the QuerySet initially
-
     def get(self, request, **kwargs):
         context = {}
         log_id = context["log_id"] = self.kwargs.get("pk")
         # Default to "None" if not present
         current_filter = self.request.GET.get("filter", "None")
-        print("current_filter", current_filter)
-        context["frame_numbers"] = self._get_frame_numbers(
-            log_id, request.user, current_filter
-        )
         # load combobox with all available framefilter
         context["filters"] = FrameFilter.objects.filter(log=log_id)
 
         context["current_frame"] = current_frame = self.kwargs.get("img")
 
-        # set information for timeline
-        current_index = list(context["frame_numbers"]).index(current_frame)
-        context["prev_frame"] = (
-            list(context["frame_numbers"])[current_index - 1]
-            if current_index > 0
-            else None
-        )
-        context["next_frame"] = (
-            list(context["frame_numbers"])[current_index + 1]
-            if current_index < len(context["frame_numbers"]) - 1
-            else None
-        )
-        context["current_index"] = (
-            current_index  # Frame number from 0 to len(frames), not equal to the actual recorded framenumber
-        )
-        context["num_frames"] = len(context["frame_numbers"])
+        # set information for timeline, the frame numbers come from the cached frame index
+        # current_index is the position of the frame, not the recorded frame number
+        filter_id = int(current_filter) if current_filter.isdigit() else None
+        (
+            context["current_index"],
+            context["prev_frame"],
+            context["next_frame"],
+            context["num_frames"],
+        ) = frame_neighbours(log_id, current_frame, filter_id)
         context["selected_filter_name"] = current_filter
         return render(request, "frontend/image_detail.html", context)
 
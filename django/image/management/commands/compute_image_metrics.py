@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from common.models import Log
+from image import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes blurredness_value, brightness_value and phash of the images of logs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("log_ids", nargs="*", type=int)
+        parser.add_argument(
+            "--all", action="store_true", help="process the images of all logs"
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="recompute images that already have all values",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=None, help="number of worker processes"
+        )
+
+    def handle(self, *args, **options):
+        log_ids = options["log_ids"]
+        if options["all"]:
+            log_ids = list(Log.objects.order_by("id").values_list("id", flat=True))
+        if not log_ids:
+            self.stderr.write("you need to provide log ids or --all")
+            return
+
+        for log_id in log_ids:
+            updated = metrics.update_log_metrics(
+                log_id, overwrite=options["overwrite"], workers=options["workers"]
+            )
+            self.stdout.write(f"log {log_id}: updated {updated} images")
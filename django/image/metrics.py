@@ -0,0 +1,125 @@
+"""
+Image quality metrics computed next to the image storage.
+
+blurredness_value is the variance of the Laplacian of the luminance (low values mean blurry
+images) and brightness_value the mean luminance, both rounded to integers. phash is the difference
+hash used for near duplicate detection (image/similarity.py). The metrics of a log are
+computed in a process pool and written back with the bulk updater in batches while the pool is
+still working.
+
+Raw images are read as YUV422 directly with numpy, other formats with Pillow.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from PIL import Image
+
+from core.bulk import bulk_update
+from core.response_cache import bump_log_versions
+
+from .models import NaoImage
+from .similarity import dhash
+
+# resolution of the raw camera images
+RAW_WIDTH = 640
+RAW_HEIGHT = 480
+# images handed to a worker at once
+CHUNK_SIZE = 64
+# computed metrics written to the db at once
+UPDATE_BATCH_SIZE = 1000
+
+
+def load_luminance(path, image_type=None):
+    """
+    Returns the luminance of the image at path as a 2d float32 array.
+    """
+    if image_type == NaoImage.Type.raw:
+        # YUYV, every second byte is the luminance of a pixel
+        data = np.fromfile(path, dtype=np.uint8)
+        return data[::2].reshape(RAW_HEIGHT, RAW_WIDTH).astype(np.float32)
+    with Image.open(path) as image:
+        return np.asarray(image.convert("L"), dtype=np.float32)
+
+
+def laplacian_variance(luminance):
+    laplacian = (
+        luminance[:-2, 1:-1]
+        + luminance[2:, 1:-1]
+        + luminance[1:-1, :-2]
+        + luminance[1:-1, 2:]
+        - 4 * luminance[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def compute_metrics(path, image_type=None):
+    """
+    Returns (blurredness_value, brightness_value, phash) of the image at path.
+    """
+    luminance = load_luminance(path, image_type)
+    return (
+        round(laplacian_variance(luminance)),
+        round(float(luminance.mean())),
+        dhash(luminance),
+    )
+
+
+def _compute_chunk(chunk):
+    # runs in the worker processes, unreadable images are skipped
+    results = []
+    for image_id, path, image_type in chunk:
+        try:
+            blurredness, brightness, phash = compute_metrics(path, image_type)
+        except (OSError, ValueError, RuntimeError):
+            continue
+        results.append(
+            {
+                "id": image_id,
+                "blurredness_value": blurredness,
+                "brightness_value": brightness,
+                "phash": phash,
+            }
+        )
+    return results
+
+
+def update_log_metrics(log_id, overwrite=False, workers=None):
+    """
+    Computes the metrics of the images of a log and stores them.
+    Without overwrite only images that miss a value are processed. Returns the number of updated
+    images.
+    """
+    queryset = NaoImage.objects.filter(frame__log=log_id, image_url__isnull=False)
+    if not overwrite:
+        queryset = queryset.filter(
+            Q(blurredness_value__isnull=True)
+            | Q(brightness_value__isnull=True)
+            | Q(phash__isnull=True)
+        )
+    image_root = Path(settings.IMAGE_ROOT)
+    images = [
+        (image_id, str(image_root / image_url.lstrip("/")), image_type)
+        for image_id, image_url, image_type in queryset.order_by("id").values_list(
+            "id", "image_url", "type"
+        )
+    ]
+    chunks = [images[i : i + CHUNK_SIZE] for i in range(0, len(images), CHUNK_SIZE)]
+
+    updated = 0
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(_compute_chunk, chunks):
+            batch.extend(results)
+            if len(batch) >= UPDATE_BATCH_SIZE:
+                updated += len(bulk_update(NaoImage, batch))
+                batch = []
+    if batch:
+        updated += len(bulk_update(NaoImage, batch))
+
+    if updated:
+        bump_log_versions(log_id)
+    return updated
@@ -0,0 +1,71 @@
+# Generated by Django 6.0 on 2026-10-18 17:25
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cognition", "0011_cognitionframe_cognition_c_log_id_129cb4_idx"),
+        ("image", "0009_naoimage_validated"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="naoimage",
+            name="phash",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="naoimage",
+            index=models.Index(
+                django.db.models.expressions.CombinedExpression(
+                    django.db.models.expressions.CombinedExpression(
+                        models.F("phash"), ">>", models.Value(0)
+                    ),
+                    "&",
+                    models.Value(65535),
+                ),
+                name="naoimage_phash_band0",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="naoimage",
+            index=models.Index(
+                django.db.models.expressions.CombinedExpression(
+                    django.db.models.expressions.CombinedExpression(
+                        models.F("phash"), ">>", models.Value(16)
+                    ),
+                    "&",
+                    models.Value(65535),
+                ),
+                name="naoimage_phash_band1",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="naoimage",
+            index=models.Index(
+                django.db.models.expressions.CombinedExpression(
+                    django.db.models.expressions.CombinedExpression(
+                        models.F("phash"), ">>", models.Value(32)
+                    ),
+                    "&",
+                    models.Value(65535),
+                ),
+                name="naoimage_phash_band2",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="naoimage",
+            index=models.Index(
+                django.db.models.expressions.CombinedExpression(
+                    django.db.models.expressions.CombinedExpression(
+                        models.F("phash"), ">>", models.Value(48)
+                    ),
+                    "&",
+                    models.Value(65535),
+                ),
+                name="naoimage_phash_band3",
+            ),
+        ),
+    ]
@@ -1,7 +1,14 @@
 from django.db import models
+from django.db.models import F
 from cognition.models import CognitionFrame
 from django.utils.translation import gettext_lazy as _
 
+PHASH_BAND_SHIFTS = (0, 16, 32, 48)
+
+
+def phash_band(shift):
+    return F("phash").bitrightshift(shift).bitand(0xFFFF)
+
 
 class NaoImage(models.Model):
     class Camera(models.TextChoices):
@@ -22,6 +29,16 @@ class NaoImage(models.Model):
     brightness_value = models.IntegerField(blank=True, null=True)
     labelstudio_url = models.CharField(max_length=200, blank=True, null=True)
     validated = models.BooleanField(blank=True, null=True)
+    # 64 bit difference hash of the luminance, see image/similarity.py
+    phash = models.BigIntegerField(blank=True, null=True)
+
+    class Meta:
+        # one index per 16 bit band of phash, an image within hamming distance 3 of another one
+        # shares at least one band with it
+        indexes = [
+            models.Index(phash_band(shift), name=f"naoimage_phash_band{band}")
+            for band, shift in enumerate(PHASH_BAND_SHIFTS)
+        ]
 
     def __str__(self):
         return f"{self.frame}-{self.camera}-{self.type}"
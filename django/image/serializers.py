@@ -1,5 +1,7 @@
+from django.urls import reverse
 from rest_framework import serializers
 from .models import NaoImage
+from . import thumbnails
 from cognition.serializers import CognitionFrameSerializer
 
 
@@ -16,7 +18,15 @@ class ImageWriteSerializer(serializers.ModelSerializer):
 class ImageReadSerializer(serializers.ModelSerializer):
     # This overrides the default field and uses your nested serializer for output
     frame = CognitionFrameSerializer(read_only=True)
+    # size name -> url of the downscaled variant, empty for images without a file
+    thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = NaoImage
         fields = "__all__"
+
+    def get_thumbnails(self, obj):
+        if not obj.image_url:
+            return {}
+        url = reverse("image:naoimage-thumbnail", kwargs={"pk": obj.pk})
+        return {size: f"{url}?size={size}" for size in thumbnails.THUMBNAIL_SIZES}
@@ -0,0 +1,106 @@
+"""
+Near duplicate detection with a perceptual hash of the images.
+
+phash is a 64 bit difference hash: the luminance is averaged down to 9x8 cells and every bit says
+whether a cell is brighter than its left neighbour. Consecutive camera frames that look the same
+have hashes within a small hamming distance.
+
+Lookups for distances up to MAX_INDEXED_DISTANCE use the per band indexes of NaoImage (multi index
+hashing), larger distances scan the hashes of a single log.
+"""
+
+import numpy as np
+from django.db.models import F, Func, IntegerField, Q, Value
+
+from .models import PHASH_BAND_SHIFTS, NaoImage, phash_band
+
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+# two hashes within this distance share at least one of the four 16 bit bands
+MAX_INDEXED_DISTANCE = len(PHASH_BAND_SHIFTS) - 1
+# the default lookup can always use the indexes
+DEFAULT_DISTANCE = MAX_INDEXED_DISTANCE
+
+
+def _cell_means(luminance, rows, columns):
+    row_edges = np.linspace(0, luminance.shape[0], rows + 1).astype(int)
+    column_edges = np.linspace(0, luminance.shape[1], columns + 1).astype(int)
+    sums = np.add.reduceat(
+        np.add.reduceat(luminance, row_edges[:-1], axis=0), column_edges[:-1], axis=1
+    )
+    counts = np.outer(np.diff(row_edges), np.diff(column_edges))
+    return sums / counts
+
+
+def dhash(luminance):
+    """
+    Returns the difference hash of a 2d luminance array as a signed 64 bit integer, the way it is
+    stored in the bigint column.
+    """
+    cells = _cell_means(luminance, HASH_HEIGHT, HASH_WIDTH)
+    bits = (cells[:, 1:] > cells[:, :-1]).ravel()
+    value = int(np.packbits(bits).view(">u8")[0])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming_distance(a, b):
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+class HammingDistance(Func):
+    template = "bit_count((%(expressions)s)::bit(64))"
+    output_field = IntegerField()
+
+
+def similar_images(phash, max_distance=DEFAULT_DISTANCE, log_id=None):
+    """
+    Returns a queryset of the images within max_distance of phash annotated with their distance,
+    closest first. Distances above MAX_INDEXED_DISTANCE need a log_id.
+    """
+    queryset = NaoImage.objects.filter(phash__isnull=False)
+    if log_id is not None:
+        queryset = queryset.filter(frame__log=log_id)
+    if max_distance <= MAX_INDEXED_DISTANCE:
+        bands = Q()
+        for shift in PHASH_BAND_SHIFTS:
+            bands |= Q(**{f"band_{shift}": (phash >> shift) & 0xFFFF})
+        queryset = queryset.alias(
+            **{f"band_{shift}": phash_band(shift) for shift in PHASH_BAND_SHIFTS}
+        ).filter(bands)
+    elif log_id is None:
+        raise ValueError(
+            f"distances above {MAX_INDEXED_DISTANCE} can only be searched within a log"
+        )
+    return (
+        queryset.annotate(distance=HammingDistance(F("phash").bitxor(Value(phash))))
+        .filter(distance__lte=max_distance)
+        .order_by("distance", "id")
+    )
+
+
+def deduplicate(log_id, max_distance=DEFAULT_DISTANCE, camera=None):
+    """
+    Returns the ids of a subsample of the images of a log in frame order. An image is skipped if
+    it is within max_distance of the last kept image of the same camera. Images without hash are
+    always kept.
+    """
+    queryset = NaoImage.objects.filter(frame__log=log_id)
+    if camera:
+        queryset = queryset.filter(camera=camera)
+    rows = queryset.order_by("frame__frame_number", "id").values_list(
+        "id", "camera", "phash"
+    )
+
+    kept = []
+    last_hash = {}
+    for image_id, image_camera, phash in rows.iterator(chunk_size=10000):
+        if phash is not None:
+            previous = last_hash.get(image_camera)
+            if (
+                previous is not None
+                and hamming_distance(previous, phash) <= max_distance
+            ):
+                continue
+            last_hash[image_camera] = phash
+        kept.append(image_id)
+    return kept
@@ -0,0 +1,187 @@
+"""
+Downscaled variants of the camera images for overviews like grids and timeline strips.
+
+Variants are rendered with Pillow in a process pool on first request and written to a disk cache
+in THUMBNAIL_ROOT. The file name of a variant is the hash of the source path, its size and mtime
+and the requested variant, so a changed source image gets a new entry instead of a stale one.
+Every hit refreshes the mtime of the cached file and once the cache grows beyond
+THUMBNAIL_CACHE_SIZE the least recently used files are removed by a background thread, requests
+never wait for the scan. A variant that is evicted between the lookup and the open is rendered
+again.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image
+
+# name -> longest edge in pixels, the camera images are 640x480
+THUMBNAIL_SIZES = {"small": 160, "medium": 320}
+# name -> (pillow format, content type, file extension)
+THUMBNAIL_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+}
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_WORKERS = 4
+# the cache is scanned for eviction after this share of its size was written
+EVICTION_INTERVAL = 0.05
+# eviction removes files until the cache is below this share of its size
+EVICTION_TARGET = 0.9
+
+_executor = None
+_lock = threading.Lock()
+_written_since_eviction = 0
+_eviction_running = False
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # forking a multithreaded server process can copy locks held by other threads
+            _executor = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _executor
+
+
+def source_path(image_url):
+    return Path(settings.IMAGE_ROOT) / image_url.lstrip("/")
+
+
+def thumbnail_path(source, size, fmt):
+    """
+    Returns the cache path of a variant of the image file at source.
+    """
+    stat = os.stat(source)
+    key = f"{os.fspath(source)}:{stat.st_size}:{stat.st_mtime_ns}:{size}:{fmt}"
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    extension = THUMBNAIL_FORMATS[fmt][2]
+    return Path(settings.THUMBNAIL_ROOT) / digest[:2] / f"{digest}.{extension}"
+
+
+def render_thumbnail(source, destination, size, fmt):
+    """
+    Writes a variant of source whose longest edge is at most size pixels to destination.
+    Runs in the worker processes, the file is written under a temporary name and then moved into
+    place so readers never see a partial file. Returns the size of the written file.
+    """
+    with Image.open(source) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=destination.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, THUMBNAIL_FORMATS[fmt][0], quality=THUMBNAIL_QUALITY)
+            os.replace(tmp_path, destination)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return destination.stat().st_size
+
+
+def get_thumbnail(image_url, size="small", fmt="webp"):
+    """
+    Returns the path of a cached variant of the image at image_url, rendering it if needed.
+    Raises FileNotFoundError if the source image does not exist.
+    """
+    source = source_path(image_url)
+    destination = thumbnail_path(source, THUMBNAIL_SIZES[size], fmt)
+    try:
+        # mark the entry as recently used
+        os.utime(destination)
+        return destination
+    except FileNotFoundError:
+        pass
+
+    written = (
+        _get_executor()
+        .submit(
+            render_thumbnail,
+            os.fspath(source),
+            os.fspath(destination),
+            THUMBNAIL_SIZES[size],
+            fmt,
+        )
+        .result()
+    )
+    _track_written(written)
+    return destination
+
+
+def open_thumbnail(image_url, size="small", fmt="webp"):
+    """
+    Returns the opened cache file of a variant, see get_thumbnail. The open file stays readable
+    even if the entry is evicted afterwards.
+    """
+    try:
+        return open(get_thumbnail(image_url, size, fmt), "rb")
+    except FileNotFoundError:
+        # evicted right after the lookup
+        return open(get_thumbnail(image_url, size, fmt), "rb")
+
+
+def _track_written(num_bytes):
+    global _written_since_eviction, _eviction_running
+    with _lock:
+        _written_since_eviction += num_bytes
+        if (
+            _eviction_running
+            or _written_since_eviction
+            < settings.THUMBNAIL_CACHE_SIZE * EVICTION_INTERVAL
+        ):
+            return
+        _written_since_eviction = 0
+        _eviction_running = True
+    threading.Thread(
+        target=_evict_in_background, args=(settings.THUMBNAIL_CACHE_SIZE,), daemon=True
+    ).start()
+
+
+def _evict_in_background(max_size):
+    global _eviction_running
+    try:
+        evict(max_size)
+    finally:
+        with _lock:
+            _eviction_running = False
+
+
+def evict(max_size):
+    """
+    Removes the least recently used variants until the cache is below EVICTION_TARGET * max_size.
+    Returns the number of removed files.
+    """
+    entries = []
+    total = 0
+    for path in Path(settings.THUMBNAIL_ROOT).glob("*/*"):
+        if path.suffix == ".tmp":
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total += stat.st_size
+    if total <= max_size:
+        return 0
+
+    removed = 0
+    for _, file_size, path in sorted(entries):
+        if total <= max_size * EVICTION_TARGET:
+            break
+        path.unlink(missing_ok=True)
+        total -= file_size
+        removed += 1
+    return removed
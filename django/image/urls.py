@@ -8,6 +8,12 @@ urlpatterns = [
     path("image-count/", views.ImageCountView.as_view(), name="image-count"),
     path("image/update/", views.ImageUpdateView.as_view(), name="image-update"),
     path("image-sync/", views.SynchronizedImage.as_view(), name="image-sync"),
+    path(
+        "image-sync/batch/",
+        views.SynchronizedImageBatch.as_view(),
+        name="image-sync-batch",
+    ),
+    path("image-window/", views.ImageWindowView.as_view(), name="image-window"),
     path("image/validate", views.ImageValidateView.as_view(), name="image-validate"),
     
 ]
@@ -1,34 +1,70 @@
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.core.cache import cache
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets
-from django.db.models import Q
-from django.db import connection
+from rest_framework.decorators import action
+from django.db.models import F, Q
+from django.http import FileResponse
+from django.db import connection, transaction
 from django_filters.rest_framework import DjangoFilterBackend
 from psycopg2.extras import execute_values
 from . import serializers
 from . import models
+from . import similarity
+from . import thumbnails
+from core.bulk import bulk_update
 from core.pagination import LargeResultsSetPagination
-from behavior.models import BehaviorFrameOption
-from cognition.models import CognitionFrame
-from django.forms.models import model_to_dict
+from core.response_cache import (
+    RESPONSE_CACHE_TIMEOUT,
+    CachedListMixin,
+    bump_log_versions,
+    response_cache_key,
+)
+from common.counts import add_counts, get_count, reset_counts
+from behavior.game_state import get_game_state_timeline
+from cognition.timeline import closest_frame_numbers
+from cognition.frame_index import frame_window
+from cognition.models import CognitionFrame, FrameFilter
+from annotation.models import Annotation
+from annotation.serializers import AnnotationSerializer
 from .image_filter import NaoImageFilter
-import numpy as np
+from collections import Counter
 import time
 
+# upper bound for before and after of the image window
+MAX_WINDOW_SIZE = 50
+
+
+def count_images(log_id):
+    return models.NaoImage.objects.filter(frame__log=log_id).count()
+
 
 class ImageCountView(APIView):
-    @method_decorator(cache_page(60 * 60 * 2))
+    queryset = models.NaoImage.objects.all()
+
     def get(self, request):
         # Get filter parameters from query string
         query_params = request.query_params.copy()
         if "log" in query_params.keys():
             log_id = int(query_params.pop("log")[0])
 
+            # without further filters the count maintained by the bulk create is used
+            if not any(
+                field.name in query_params for field in models.NaoImage._meta.fields
+            ):
+                count = get_count(log_id, "NaoImage", count_images)
+                return Response({"count": count}, status=status.HTTP_200_OK)
+
+            # filtered counts are cached until the images of the log change
+            key = response_cache_key(request, log_id)
+            count = cache.get(key)
+            if count is not None:
+                return Response({"count": count}, status=status.HTTP_200_OK)
+
             qs = models.NaoImage.objects.filter(frame__log=log_id)
         else:
+            key = None
             qs = models.NaoImage.objects.all()
 
         filters = Q()
@@ -46,23 +82,26 @@ class ImageCountView(APIView):
 
         # get the count
         count = qs.count()
+        if key is not None:
+            cache.set(key, count, RESPONSE_CACHE_TIMEOUT)
 
         return Response({"count": count}, status=status.HTTP_200_OK)
 
+
 class ImageValidateView(APIView):
     def post(self, request):
-
-        for k,v in request.data.items():
+        for k, v in request.data.items():
             print(k, v)
             print()
         return JsonResponse({"status": "validated"})
 
 
 class SynchronizedImage(APIView):
+    queryset = models.NaoImage.objects.all()
+
     def get(self, request):
         # Get filter parameters from query string
         query_params = request.query_params.copy()
-        print(query_params)
         if "log" in query_params.keys():
             log_id = int(query_params.pop("log")[0])
         else:
@@ -78,53 +117,199 @@ class SynchronizedImage(APIView):
         else:
             return Response({"g": "Error World"}, status=status.HTTP_200_OK)
 
-        behavior_data_combined = BehaviorFrameOption.objects.select_related(
-            "options_id",  # Joins BehaviorOption
-            "active_state",  # Joins BehaviorOptionState
-            "active_state__option_id",  # Joins BehaviorOption via BehaviorOptionState
-        )
-        behavior_frame_options = behavior_data_combined.filter(
-            frame__log=log_id,
-            options_id__option_name="decide_game_state",
-            active_state__name="standby",
-        )
-        # FIXME we have robots where the behavior logging is broken this breaks this whole thing here
-        # TODO can we always use first here? - we want the instance with the lowest frame number, but we get only ids.
-        # ids work probably as well - but almost impossible to debug if not, also breaks if data is not entered sequentially,
-        print("first value", model_to_dict(behavior_frame_options.first()))
-
-        first_standby_frame_id = behavior_frame_options.values_list(
-            "frame", flat=True
-        ).first()
-        print("first_standby_frame_id", first_standby_frame_id)
-        first_standby_frame = CognitionFrame.objects.get(id=first_standby_frame_id)
-        print("standby frame", model_to_dict(first_standby_frame))
-
-        cognition_frames = CognitionFrame.objects.filter(log=log_id).order_by(
-            "frame_number"
-        )
-        cognition_frames = list(cognition_frames)
-        print()
-        print(cognition_frames[0].frame_time)
-        frame_time_diffs = [
-            frame.frame_time - (first_standby_frame.frame_time + time)
-            for frame in cognition_frames
-        ]
-        frame_time_diffs = np.array(frame_time_diffs)
-
-        target_frame_index = np.argmin(np.abs(frame_time_diffs))
-        print("target: ", cognition_frames[target_frame_index].frame_number)
+        anchor_time = get_game_state_timeline(log_id).first_standby_time
+        if anchor_time is None:
+            return Response(
+                {"error": "log has no standby frame to synchronize with"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        # binary search in the cached frame times of the log instead of scanning all frames
+        frame_numbers = closest_frame_numbers(log_id, [anchor_time + time])
+        if frame_numbers is None:
+            return Response(
+                {"error": "log has no frames"}, status=status.HTTP_404_NOT_FOUND
+            )
 
         # TODO lets return the image path here
         target_image = models.NaoImage.objects.filter(
             frame__log=log_id,
-            frame__frame_number=cognition_frames[target_frame_index].frame_number,
+            frame__frame_number=frame_numbers[0],
             camera=camera,
         ).first()
+        if target_image is None:
+            return Response(
+                {"error": "no image at this time"}, status=status.HTTP_404_NOT_FOUND
+            )
         return Response({"url": target_image.image_url}, status=status.HTTP_200_OK)
 
 
+class SynchronizedImageBatch(APIView):
+    """
+    Maps many video timestamps (in seconds) to images at once:
+    /api/image-sync/batch/?log=<log_id>&camera=<camera>&time=<t1>&time=<t2>...
+    """
+
+    queryset = models.NaoImage.objects.all()
+
+    def get(self, request):
+        log_id = request.query_params.get("log")
+        camera = request.query_params.get("camera")
+        times = request.query_params.getlist("time")
+        if not log_id or not camera or not times:
+            return Response(
+                {"error": "you need to provide log, camera and at least one time"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        log_id = int(log_id)
+
+        anchor_time = get_game_state_timeline(log_id).first_standby_time
+        if anchor_time is None:
+            return Response(
+                {"error": "log has no standby frame to synchronize with"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        times = [float(t) for t in times]
+        frame_numbers = closest_frame_numbers(
+            log_id, [anchor_time + t * 1000 for t in times]
+        )
+        if frame_numbers is None:
+            return Response(
+                {"error": "log has no frames"}, status=status.HTTP_404_NOT_FOUND
+            )
+        frame_numbers = frame_numbers.tolist()
+
+        image_urls = dict(
+            models.NaoImage.objects.filter(
+                frame__log=log_id,
+                frame__frame_number__in=set(frame_numbers),
+                camera=camera,
+            ).values_list("frame__frame_number", "image_url")
+        )
+        results = [
+            {
+                "time": t,
+                "frame_number": frame_number,
+                "url": image_urls.get(frame_number),
+            }
+            for t, frame_number in zip(times, frame_numbers)
+        ]
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class ImageWindowView(APIView):
+    """
+    Returns the frames around a frame of a log together with their images and annotations, so the
+    image viewer needs one request per window instead of two requests per camera and frame step:
+    /api/image-window/?log=<log_id>&frame_number=<frame_number>&before=<n>&after=<n>&filter=<id>
+    """
+
+    queryset = models.NaoImage.objects.all()
+
+    def get(self, request):
+        log_id = request.query_params.get("log")
+        frame_number = request.query_params.get("frame_number")
+        if not log_id or not frame_number:
+            return Response(
+                {"error": "you need to provide log and frame_number"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            log_id = int(log_id)
+            frame_number = int(frame_number)
+            before = int(request.query_params.get("before", 10))
+            after = int(request.query_params.get("after", 10))
+        except ValueError:
+            return Response(
+                {"error": "log, frame_number, before and after must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        before = max(0, min(before, MAX_WINDOW_SIZE))
+        after = max(0, min(after, MAX_WINDOW_SIZE))
+        filter_id = request.query_params.get("filter")
+        if filter_id:
+            if not filter_id.isdigit():
+                return Response(
+                    {"error": "filter must be an integer"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            # same scoping as the frame filter api, only own filters of this log
+            if not FrameFilter.objects.filter(
+                id=filter_id, log=log_id, user=request.user
+            ).exists():
+                return Response(
+                    {"error": "frame filter not found"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            filter_id = int(filter_id)
+        else:
+            filter_id = None
+
+        window = frame_window(log_id, frame_number, before, after, filter_id)
+        frame_numbers = [number for _, number, _, _ in window]
+
+        frame_times = dict(
+            CognitionFrame.objects.filter(
+                log=log_id, frame_number__in=frame_numbers
+            ).values_list("frame_number", "frame_time")
+        )
+        images = {}
+        for image in (
+            models.NaoImage.objects.filter(
+                frame__log=log_id, frame__frame_number__in=frame_numbers
+            )
+            .order_by("id")
+            .values(
+                "id",
+                "frame__frame_number",
+                "camera",
+                "type",
+                "image_url",
+                "validated",
+            )
+        ):
+            frame_images = images.setdefault(image.pop("frame__frame_number"), {})
+            # same as the viewer did before, the first image of a camera is shown
+            if image["camera"] not in frame_images:
+                image["annotations"] = []
+                frame_images[image["camera"]] = image
+
+        by_image = {
+            image["id"]: image
+            for frame_images in images.values()
+            for image in frame_images.values()
+        }
+        annotations = (
+            Annotation.objects.filter(image__in=by_image.keys())
+            .annotate(
+                frame_number=F("image__frame__frame_number"),
+                image_url=F("image__image_url"),
+            )
+            .order_by("id")
+        )
+        for annotation in AnnotationSerializer(annotations, many=True).data:
+            by_image[annotation["image"]]["annotations"].append(annotation)
+
+        frames = [
+            {
+                "index": index,
+                "frame_number": number,
+                "frame_time": frame_times.get(number),
+                "prev_frame": prev_frame,
+                "next_frame": next_frame,
+                "images": images.get(number, {}),
+            }
+            for index, number, prev_frame, next_frame in window
+        ]
+        return Response(
+            {"log": log_id, "filter": filter_id, "frames": frames},
+            status=status.HTTP_200_OK,
+        )
+
+
 class ImageUpdateView(APIView):
+    queryset = models.NaoImage.objects.all()
+
     def patch(self, request):
         data = self.request.data
         try:
@@ -145,49 +330,16 @@ class ImageUpdateView(APIView):
             )
 
     def bulk_update(self, data):
-        update_fields = set()
-
-        for item in data:
-            update_fields.update(key for key in item.keys() if key != "id")
-
-        starttime = time.time()
-        # Build the case statements for each field
-        case_statements = []
-        for field in update_fields:
-            case_when_parts = []
-            for item in data:
-                if field in item and item[field] is not None:
-                    case_when_parts.append(f"WHEN id = {item['id']} THEN %s")
-
-            if case_when_parts:
-                case_stmt = (
-                    f"""{field} = (CASE {" ".join(case_when_parts)} ELSE {field} END)"""
-                )
-                case_statements.append(case_stmt)
-
-        # Collect all values for the parameterized query
-        update_values = []
-        for field in update_fields:
-            for item in data:
-                if field in item and item[field] is not None:
-                    update_values.append(item[field])
-
-        # Build the complete SQL query
-        ids = [str(item["id"]) for item in data]
-        sql = f"""
-            UPDATE image_naoimage
-            SET {", ".join(case_statements)}
-            WHERE id IN ({",".join(ids)})
-        """
-        # print(sql)
-
-        with connection.cursor() as cursor:
-            cursor.execute(sql, update_values)
-            return cursor.rowcount
-        print(time.time() - starttime)
+        ids = bulk_update(models.NaoImage, data)
+        bump_log_versions(
+            *models.NaoImage.objects.filter(id__in=ids)
+            .values_list("frame__log", flat=True)
+            .distinct()
+        )
+        return len(ids)
 
 
-class ImageViewSet(viewsets.ModelViewSet):
+class ImageViewSet(CachedListMixin, viewsets.ModelViewSet):
     queryset = models.NaoImage.objects.all()
     pagination_class = LargeResultsSetPagination
     filter_backends = [DjangoFilterBackend]
@@ -207,6 +359,114 @@ class ImageViewSet(viewsets.ModelViewSet):
 
         return qs.order_by("frame")
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        reset_counts([instance.frame.log_id], "NaoImage")
+
+    @action(detail=True, methods=["get"], url_path="thumbnail")
+    def thumbnail(self, request, *args, **kwargs):
+        """
+        Returns a downscaled variant of the image, see image/thumbnails.py.
+        Accessible at /api/images/<id>/thumbnail/?size=<small|medium>&image_format=<webp|jpeg>
+        """
+        size = request.query_params.get("size", "small")
+        # format is taken by the renderer selection of drf
+        fmt = request.query_params.get("image_format", "webp")
+        if (
+            size not in thumbnails.THUMBNAIL_SIZES
+            or fmt not in thumbnails.THUMBNAIL_FORMATS
+        ):
+            return Response(
+                {
+                    "error": f"size must be one of {list(thumbnails.THUMBNAIL_SIZES)} "
+                    f"and image_format one of {list(thumbnails.THUMBNAIL_FORMATS)}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        image = self.get_object()
+        if not image.image_url:
+            return Response(
+                {"error": "image has no image_url"}, status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            thumbnail = thumbnails.open_thumbnail(image.image_url, size, fmt)
+        except FileNotFoundError:
+            return Response(
+                {"error": "image file not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        except OSError:
+            # pillow can not read raw images
+            return Response(
+                {"error": "image file can not be downscaled"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        response = FileResponse(
+            thumbnail, content_type=thumbnails.THUMBNAIL_FORMATS[fmt][1]
+        )
+        # the url stays valid as long as the image exists, the variant never changes for it
+        response["Cache-Control"] = "private, max-age=86400"
+        return response
+
+    @action(detail=True, methods=["get"], url_path="similar")
+    def similar(self, request, *args, **kwargs):
+        """
+        Lists the images within a hamming distance of the phash of this image, see
+        image/similarity.py. Distances above 3 need a log.
+        Accessible at /api/images/<id>/similar/?distance=<k>&log=<log_id>
+        """
+        image = self.get_object()
+        if image.phash is None:
+            return Response(
+                {"error": "image has no phash, run compute_image_metrics"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        log_id = request.query_params.get("log")
+        try:
+            max_distance = int(
+                request.query_params.get("distance", similarity.DEFAULT_DISTANCE)
+            )
+            queryset = similarity.similar_images(
+                image.phash, max_distance, int(log_id) if log_id else None
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = (
+            queryset.exclude(id=image.id)
+            .annotate(log=F("frame__log"), frame_number=F("frame__frame_number"))
+            .values("id", "log", "frame_number", "camera", "image_url", "distance")
+        )
+        return Response(list(results), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="deduplicated")
+    def deduplicated(self, request, *args, **kwargs):
+        """
+        Returns the ids of the images of a log without near duplicates of the previous image.
+        Accessible at /api/images/deduplicated/?log=<log_id>&distance=<k>&camera=<camera>
+        """
+        log_id = request.query_params.get("log")
+        if not log_id:
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            log_id = int(log_id)
+            max_distance = int(
+                request.query_params.get("distance", similarity.DEFAULT_DISTANCE)
+            )
+        except ValueError:
+            return Response(
+                {"error": "log and distance must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        ids = similarity.deduplicate(
+            log_id, max_distance, request.query_params.get("camera")
+        )
+        return Response({"count": len(ids), "ids": ids}, status=status.HTTP_200_OK)
+
     def create(self, request, *args, **kwargs):
         # Check if the data is a list (bulk create) or dict (single create)
 
@@ -232,12 +492,17 @@ class ImageViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
 
-        instance, created = models.NaoImage.objects.get_or_create(
-            frame=validated_data.get("frame"),
-            camera=validated_data.get("camera"),
-            type=validated_data.get("type"),
-            defaults=validated_data,
-        )
+        with transaction.atomic():
+            instance, created = models.NaoImage.objects.get_or_create(
+                frame=validated_data.get("frame"),
+                camera=validated_data.get("camera"),
+                type=validated_data.get("type"),
+                defaults=validated_data,
+            )
+            if created:
+                add_counts("NaoImage", {instance.frame.log_id: 1}, count_images)
+        if created:
+            bump_log_versions(instance.frame.log_id)
 
         status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
         serializer = serializers.ImageReadSerializer(instance)
@@ -257,14 +522,20 @@ class ImageViewSet(viewsets.ModelViewSet):
             )
             for row in data
         ]
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             query = """
             INSERT INTO image_naoimage (frame_id, camera, type, image_url, blurredness_value, brightness_value)
             VALUES %s
-            ON CONFLICT (frame_id, camera, type) DO NOTHING;
+            ON CONFLICT (frame_id, camera, type) DO NOTHING
+            RETURNING (SELECT log_id FROM cognition_cognitionframe WHERE id = frame_id);
             """
             # rows is a list of tuples containing the data
-            execute_values(cursor, query, rows_tuples, page_size=1000)
+            inserted = execute_values(
+                cursor, query, rows_tuples, page_size=1000, fetch=True
+            )
+            new_images = Counter(log_id for (log_id,) in inserted)
+            add_counts("NaoImage", new_images, count_images)
+        bump_log_versions(*new_images)
         print(time.time() - starttime)
         # TODO calculate some statistics similar to what we did before here
         return Response({}, status=status.HTTP_200_OK)
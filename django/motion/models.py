@@ -22,6 +22,8 @@ class MotionFrame(models.Model):
         verbose_name_plural = "Motion Frames"
         indexes = [
             models.Index(fields=["log", "frame_number"]),
+            # used for finding the closest frame of the other thread by time
+            models.Index(fields=["log", "frame_time"]),
         ]
         unique_together = ("log", "frame_number")
 
@@ -0,0 +1,103 @@
+"""
+Binary export of the raw motion payloads stored in the sensor log files.
+
+The rows of a motion representation only store start_pos and size of the payload inside the
+sensor log of the log. Instead of copying every payload into a JSON page, stream_payloads writes
+them into one binary response. The file is read with coalesced large reads (core/range_reader.py)
+since page faults on an mmap of the network mounted log volume result in many small reads.
+
+Layout (little endian):
+
+    magic        4 bytes   b"VATM"
+    count        uint32    number of records
+    index        count x (int32 frame number, uint64 offset of the record after the index)
+    records      count x (uint32 length, payload)
+
+The index is built from the db rows before the file is touched, so a client can seek to any frame
+without parsing the records before it.
+"""
+
+import struct
+
+from core.range_reader import read_ranges
+
+MAGIC = b"VATM"
+HEADER = struct.Struct("<4sI")
+INDEX_ENTRY = struct.Struct("<iQ")
+LENGTH = struct.Struct("<I")
+
+# payload bytes read from the file and handed to the server at once
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def encode_header(rows):
+    """
+    Returns the header and index for rows of (frame_number, start_pos, size).
+    """
+    header = bytearray(HEADER.pack(MAGIC, len(rows)))
+    offset = 0
+    for frame_number, _, size in rows:
+        header += INDEX_ENTRY.pack(frame_number, offset)
+        offset += LENGTH.size + size
+    return bytes(header)
+
+
+def export_size(rows):
+    """
+    Returns the number of bytes stream_payloads writes for rows.
+    """
+    return (
+        HEADER.size
+        + len(rows) * (INDEX_ENTRY.size + LENGTH.size)
+        + sum(size for _, _, size in rows)
+    )
+
+
+def stream_payloads(path, rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the binary export of rows of (frame_number, start_pos, size) read from the file at path.
+    The rows are read in batches of about chunk_size payload bytes, every batch is written as one
+    chunk built from memoryviews into the read buffers.
+    """
+    yield encode_header(rows)
+
+    batch = []
+    batch_size = 0
+    for row in rows:
+        batch.append(row)
+        batch_size += row[2]
+        if batch_size >= chunk_size:
+            yield _encode_records(path, batch)
+            batch = []
+            batch_size = 0
+    if batch:
+        yield _encode_records(path, batch)
+
+
+def _encode_records(path, rows):
+    payloads = read_ranges(path, [(start_pos, size) for _, start_pos, size in rows])
+    parts = []
+    for (_, _, size), payload in zip(rows, payloads):
+        parts.append(LENGTH.pack(size))
+        parts.append(payload)
+    return b"".join(parts)
+
+
+def decode_payloads(data):
+    """
+    Returns a list of (frame_number, payload) from a binary export, mainly for python clients.
+    """
+    magic, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a motion payload export")
+
+    records_start = HEADER.size + count * INDEX_ENTRY.size
+    result = []
+    for i in range(count):
+        frame_number, offset = INDEX_ENTRY.unpack_from(
+            data, HEADER.size + i * INDEX_ENTRY.size
+        )
+        (length,) = LENGTH.unpack_from(data, records_start + offset)
+        start = records_start + offset + LENGTH.size
+        result.append((frame_number, bytes(data[start : start + length])))
+    return result
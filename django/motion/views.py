@@ -2,15 +2,27 @@ from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from .models import MotionFrame
 from . import serializers
+from . import payloads
 from rest_framework.pagination import PageNumberPagination
-from django.db import connection
+from django.db import connection, transaction
 from django.db.models import Q
 from django.apps import apps
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from common.models import Log
 from psycopg2.extras import execute_values
+from core.bulk import bulk_update, copy_upsert
+from core.mmap_pool import mmap_pool
+from core.parsers import NDJSONParser, NDJSONStream
+from core.response_cache import CachedListMixin, bump_log_versions
+from common.counts import add_counts, get_count, reset_counts
+from collections import Counter
+from contextlib import ExitStack
 from pathlib import Path
-import mmap
 
 
 class CustomPagination(PageNumberPagination):
@@ -32,10 +44,13 @@ class DynamicModelMixin:
 
         query_params = self.request.query_params.copy()
 
+        queryset = model.objects.all()
         # if log was set filter for it
         if "log" in query_params.keys():
-            log_id = int(query_params.pop("log")[0])
-            queryset = model.objects.filter(frame__log=log_id)
+            log_id = query_params.pop("log")[0]
+            if not log_id.isdigit():
+                raise ValidationError({"error": "log must be an integer"})
+            queryset = queryset.filter(frame__log=log_id)
 
         filters = Q()
         for field in model._meta.fields:
@@ -52,43 +67,38 @@ class DynamicModelMixin:
         # Let pagination do its work first
         page = self.paginate_queryset(queryset)
         if page is not None:
-            # Now process only the paginated results
-            file_cache = {}
-            try:
+            # Now process only the paginated results, the log files stay mapped in the pool
+            # between requests and are only held for the duration of this one
+            with ExitStack() as stack:
+                file_cache = {}
                 for item in page:
                     try:
                         log_path = str(
-                            Path("/mnt/e/logs") / item.frame.log.sensor_log_path
+                            Path(settings.LOG_ROOT) / item.frame.log.sensor_log_path
                         )
 
                         if log_path not in file_cache:
-                            file = open(log_path, "rb")
-                            file_mmap = mmap.mmap(
-                                file.fileno(), 0, access=mmap.ACCESS_READ
+                            file_cache[log_path] = stack.enter_context(
+                                mmap_pool.open(log_path)
                             )
-                            file_cache[log_path] = file_mmap
 
-                        print("item.start_pos", item.start_pos)
-                        print("item.size", item.size)
                         item.binary_data = file_cache[log_path][
                             item.start_pos : item.start_pos + item.size
                         ]
-                        print("item.binary_data", item.binary_data)
                     except Exception as e:
                         print(f"Error processing item {item.id}: {str(e)}")
                         item.binary_data = None
 
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-            finally:
-                for mmap_obj in file_cache.values():
-                    mmap_obj.close()
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
 
-class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
+class DynamicModelViewSet(CachedListMixin, DynamicModelMixin, viewsets.ModelViewSet):
+    # ndjson uploads are streamed row by row into the bulk insert instead of being parsed upfront
+    parser_classes = [JSONParser, NDJSONParser]
     pagination_class = CustomPagination
 
     # No need to define queryset or serializer_class here; they will be set dynamically
@@ -100,8 +110,8 @@ class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
         return getattr(serializers, serializer_class_name)
 
     def create(self, request, *args, **kwargs):
-        # Check if the data is a list (bulk create) or dict (single create)
-        is_many = isinstance(request.data, list)
+        # Check if the data is a list or a ndjson stream (bulk create) or dict (single create)
+        is_many = isinstance(request.data, (list, NDJSONStream))
         if not is_many:
             print("error: input not a list")
             return Response({}, status=status.HTTP_411_LENGTH_REQUIRED)
@@ -109,22 +119,31 @@ class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
         # Dynamically get the model
         model = self.get_model()
 
-        # Prepare the data for bulk insert
-        rows_tuples = [
+        # rows are rendered lazily while postgres reads the COPY stream
+        rows_tuples = (
             (row["frame"], row["start_pos"], row["size"]) for row in request.data
-        ]
-
-        with connection.cursor() as cursor:
-            query = f"""
-            INSERT INTO motion_{model.__name__.lower()} (frame_id, start_pos, size)
-            VALUES %s
-            ON CONFLICT (frame_id) DO UPDATE SET start_pos = EXCLUDED.start_pos, size = EXCLUDED.size;
-            """
-            # rows is a list of tuples containing the data
-            execute_values(cursor, query, rows_tuples, page_size=500)
+        )
+        with transaction.atomic():
+            new_frames = copy_upsert(
+                model._meta.db_table,
+                ["frame_id", "start_pos", "size"],
+                rows_tuples,
+                conflict_columns=["frame_id"],
+                update_columns=["start_pos", "size"],
+                frame_table=MotionFrame._meta.db_table,
+            )
+            add_counts(model.__name__, new_frames, self.count_rows)
+        bump_log_versions(*new_frames)
 
         return Response({}, status=status.HTTP_200_OK)
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        reset_counts([instance.frame.log_id], self.get_model().__name__)
+
+    def count_rows(self, log_id):
+        return self.get_model().objects.filter(frame__log=log_id).count()
+
     @action(detail=False, methods=["get"], url_path="count")
     def count_records(self, request, *args, **kwargs):
         """
@@ -134,32 +153,96 @@ class DynamicModelViewSet(DynamicModelMixin, viewsets.ModelViewSet):
         # Get filter parameters from query string
         log_id = request.query_params.get("log")
 
-        model = self.get_model()
-        queryset = model.objects.filter(frame__log=log_id)
-
-        # You can add any additional filtering here if needed
-        count = queryset.count()
+        # served from the counts maintained by create
+        count = get_count(log_id, self.get_model().__name__, self.count_rows)
 
         return Response({"count": count})
 
+    @action(detail=False, methods=["get"], url_path="binary")
+    def binary(self, request, *args, **kwargs):
+        """
+        Streams the raw payloads of a frame range as one binary response, see motion/payloads.py.
+        Accessible at /api/motion/<modelname>/binary/?log=<log_id>&start=<frame>&end=<frame>
+        """
+        log_id = request.query_params.get("log")
+        if not log_id:
+            return Response(
+                {"error": "you need to provide log"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start = request.query_params.get("start")
+        end = request.query_params.get("end")
+        try:
+            log_id = int(log_id)
+            start = int(start) if start else None
+            end = int(end) if end else None
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "log, start and end must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        log = Log.objects.filter(id=log_id).first()
+        if log is None or not log.sensor_log_path:
+            return Response(
+                {"error": "log has no sensor log"}, status=status.HTTP_404_NOT_FOUND
+            )
+        log_path = Path(settings.LOG_ROOT) / log.sensor_log_path
+        if not log_path.is_file():
+            return Response(
+                {"error": "sensor log not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        queryset = self.get_model().objects.filter(
+            frame__log=log.id,
+            frame__frame_number__isnull=False,
+            start_pos__isnull=False,
+            size__isnull=False,
+        )
+        if start is not None:
+            queryset = queryset.filter(frame__frame_number__gte=start)
+        if end is not None:
+            queryset = queryset.filter(frame__frame_number__lte=end)
+        rows = list(
+            queryset.order_by("frame__frame_number").values_list(
+                "frame__frame_number", "start_pos", "size"
+            )
+        )
+
+        # the header is sent before the file is read, so the positions are checked upfront
+        file_size = log_path.stat().st_size
+        if any(start_pos + size > file_size for _, start_pos, size in rows):
+            return Response(
+                {"error": "stored positions exceed the sensor log"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        response = StreamingHttpResponse(
+            payloads.stream_payloads(log_path, rows),
+            content_type="application/octet-stream",
+        )
+        response["Content-Length"] = payloads.export_size(rows)
+        return response
+
+
+def count_motion_frames(log_id):
+    return MotionFrame.objects.filter(log=log_id).count()
+
 
 class MotionFrameCount(APIView):
+    queryset = MotionFrame.objects.all()
+
     def get(self, request):
         # Get filter parameters from query string
         log_id = request.query_params.get("log")
 
-        # start with all images
-        queryset = MotionFrame.objects.all()
-
-        # apply filters if provided
-        queryset = queryset.filter(log=log_id)
-
-        # get the count
-        count = queryset.count()
+        # served from the counts maintained by MotionFrameViewSet.create
+        count = get_count(log_id, "MotionFrame", count_motion_frames)
         return Response({"count": count}, status=status.HTTP_200_OK)
 
 
 class MotionFrameUpdate(APIView):
+    queryset = MotionFrame.objects.all()
+
     def patch(self, request):
         data = self.request.data
         try:
@@ -180,58 +263,8 @@ class MotionFrameUpdate(APIView):
             )
 
     def bulk_update(self, data):
-        update_fields = set()
-
-        # since closest_cognition_frame is a foreign key and therefore has not the same name in the db
-        # as it has in django we need to take care of the transformation manually here
-        transformed_data = []
-
-        for item in data:
-            new_item = {}
-            for key, value in item.items():
-                if key == "closest_cognition_frame":
-                    new_item["closest_cognition_frame_id"] = value
-                else:
-                    new_item[key] = value
-            transformed_data.append(new_item)
-
-        for item in transformed_data:
-            update_fields.update(key for key in item.keys() if key != "id")
-
-        # Build the case statements for each field
-        case_statements = []
-        for field in update_fields:
-            case_when_parts = []
-            for item in transformed_data:
-                print("item", item)
-                if field in item and item[field] is not None:
-                    case_when_parts.append(f"WHEN id = {item['id']} THEN %s")
-
-            if case_when_parts:
-                case_stmt = (
-                    f"""{field} = (CASE {" ".join(case_when_parts)} ELSE {field} END)"""
-                )
-                case_statements.append(case_stmt)
-
-        # Collect all values for the parameterized query
-        update_values = []
-        for field in update_fields:
-            for item in transformed_data:
-                if field in item and item[field] is not None:
-                    update_values.append(item[field])
-
-        # Build the complete SQL query
-        ids = [str(item["id"]) for item in transformed_data]
-        sql = f"""
-            UPDATE motion_motionframe
-            SET {", ".join(case_statements)}
-            WHERE id IN ({",".join(ids)})
-        """
-        print(sql)
-
-        with connection.cursor() as cursor:
-            cursor.execute(sql, update_values)
-            return cursor.rowcount
+        # closest_cognition_frame can be given by field name, the engine maps it to its column
+        return len(bulk_update(MotionFrame, data))
 
 
 class MotionFrameViewSet(viewsets.ModelViewSet):
@@ -261,23 +294,41 @@ class MotionFrameViewSet(viewsets.ModelViewSet):
             (row["log"], row["frame_number"], row["frame_time"]) for row in request.data
         ]
 
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             query = """
             INSERT INTO motion_motionframe (log_id, frame_number, frame_time)
             VALUES %s
-            ON CONFLICT (log_id, frame_number) DO NOTHING;
+            ON CONFLICT (log_id, frame_number) DO NOTHING
+            RETURNING log_id;
             """
             # rows is a list of tuples containing the data
-            execute_values(cursor, query, rows_tuples, page_size=500)
+            inserted = execute_values(
+                cursor, query, rows_tuples, page_size=500, fetch=True
+            )
+            add_counts(
+                "MotionFrame",
+                Counter(log_id for (log_id,) in inserted),
+                count_motion_frames,
+            )
 
         return Response({}, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         # Override destroy method to handle both single and bulk delete
         if kwargs.get("pk") == "all":
-            deleted_count, _ = self.get_queryset().delete()
+            queryset = self.get_queryset()
+            log_ids = set(queryset.values_list("log", flat=True).distinct())
+            deleted_count, _ = queryset.delete()
+            # the representations of the deleted frames are gone as well
+            reset_counts(log_ids)
+            bump_log_versions(*log_ids)
             return Response(
                 {"message": f"Deleted {deleted_count} objects"},
                 status=status.HTTP_204_NO_CONTENT,
             )
         return super().destroy(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        reset_counts([instance.log_id])
+        bump_log_versions(instance.log_id)
@@ -30,101 +30,161 @@ function get_canvas_dims() {
     }
 }
 
-async function get_image_url(camera) {
-    try {
-        /* Fetches the image object from the API */
-        const pathParts = window.location.pathname.split('/').filter(Boolean);
-        const logId = pathParts[1];
-        const frame_number = pathParts[3];
-
-        const url = `${BASE_URL}/api/image/?camera=${camera}&log=${logId}&frame_number=${frame_number}`;
-
-        const response = await fetch(url, {
-            method: "GET",
-            headers: {
-                "Content-Type": "application/json",
-                "X-CSRFToken": csrfToken,
-            },
-        });
-        // FIXME how to handle dummy images correctly and make sure to not fetch annotations
-        const data = await response.json();
+function setup_secondary_image() {
+    const secondaryImageContainer = document.getElementById("secondaryImage");
+    const secondaryImage = secondaryImageContainer.querySelector('img');
 
-        if (data.length == 0) {
-            console.log("data is too short")
-            console.log(data)
-            return { image_url: "/static/images/dummy_image.jpg" }; // Fallback image
-        }
-        console.log("Success:", data);
-        return data[0];
+    secondaryImageContainer.addEventListener('click', switchImage);
 
-    } catch (error) {
-        console.error("Error:", error);
-        // FIXME return a json with image_url as member
-        return { image_url: "/static/images/dummy_image.jpg" }; // Fallback image
+    const paramsString = window.location.search;
+    const searchParams = new URLSearchParams(paramsString);
+    if (searchParams.get("camera") === "TOP") {
+        secondaryImage.src = bottom_image_url;
+    } else {
+        secondaryImage.src = top_image_url;
     }
+
 }
 
-async function get_annotations(image_id) {
-    try {
-        /* Fetches the annotation objects from the API */
-        const url = `${BASE_URL}/api/annotations/?image=${image_id}`;
-
-        const response = await fetch(url, {
-            method: "GET",
-            headers: {
-                "Content-Type": "application/json",
-                "X-CSRFToken": csrfToken,
-            },
-        });
+// frames fetched before and after the requested frame by get_frame_window
+const FRAME_WINDOW_SIZE = 10;
+// the next window is fetched once fewer than this many frames ahead or behind are known
+const FRAME_PREFETCH_MARGIN = 3;
+const IMAGE_BASE_URL = "https://logs.berlin-united.com";
 
-        const data = await response.json();
-        console.log("Annotation Success:", data);
-        // FIXME returning the list of rects
-        data.map((db_box, i) => {
-            console.log("cool db_box", db_box)
-            var rect = new Konva.Rect({
-                // coordinates
-                x: db_box.data.x * targetWidth,
-                y: db_box.data.y * targetHeight,
-                width: db_box.data.width * targetWidth,
-                height: db_box.data.height * targetHeight,
-                // color
-                fill: db_box.color,
-                stroke: "rgba(0, 255, 0, 1)",
-                strokeWidth: 2,
-                name: 'rect',
-                strokeScaleEnabled: false,
-                opacity: 0.5,
-                // for transformer
-                draggable: true,
-                // custom properties from the db annotation
-                class: db_box.class_name,
-                id: db_box.id,
-                //FIXME add type here
-            });
+function frame_window_key(logId, filter) {
+    return `frame_window:${logId}:${filter}`;
+}
 
-        });
-        // TODO map data to list of rect elements
-        return data;
+function load_frame_window(logId, filter) {
+    /* Returns the frames prefetched for this log and filter, keyed by frame number */
+    const stored = sessionStorage.getItem(frame_window_key(logId, filter));
+    return stored ? JSON.parse(stored) : {};
+}
+
+function store_frame_window(logId, filter, frames, current_frame) {
+    // only keep frames close to the current one so the storage does not grow while scrubbing
+    const kept = {};
+    Object.values(frames).forEach(frame => {
+        if (Math.abs(frame.index - current_frame.index) <= 2 * FRAME_WINDOW_SIZE) {
+            kept[frame.frame_number] = frame;
+        }
+    });
+    sessionStorage.setItem(frame_window_key(logId, filter), JSON.stringify(kept));
+}
 
-    } catch (error) {
-        console.error("Error:", error);
-        return {}; // Fallback image
+async function fetch_frame_window(logId, frame_number, filter) {
+    /* Fetches the frames around frame_number with their images and annotations in one request */
+    const params = new URLSearchParams({
+        log: logId,
+        frame_number: frame_number,
+        before: FRAME_WINDOW_SIZE,
+        after: FRAME_WINDOW_SIZE,
+    });
+    if (filter !== "None") {
+        params.set("filter", filter);
+    }
+    const response = await fetch(`${BASE_URL}/api/image-window/?${params}`, {
+        method: "GET",
+        headers: {
+            "Content-Type": "application/json",
+            "X-CSRFToken": csrfToken,
+        },
+    });
+    if (!response.ok) {
+        throw new Error(`image window request failed with ${response.status}`);
     }
+    const data = await response.json();
+    return data.frames;
 }
 
-function setup_secondary_image() {
-    const secondaryImageContainer = document.getElementById("secondaryImage");
-    const secondaryImage = secondaryImageContainer.querySelector('img');
+function preload_images(frames) {
+    // warm the browser cache so the next page shows its images right away
+    frames.forEach(frame => {
+        Object.values(frame.images).forEach(image => {
+            new Image().src = `${IMAGE_BASE_URL}/${image.image_url}`;
+        });
+    });
+}
 
-    secondaryImageContainer.addEventListener('click', switchImage);
+function missing_neighbour(frames, frame, direction) {
+    /* Returns the first frame number within the prefetch margin that is not known yet */
+    let current = frame;
+    for (let i = 0; i < FRAME_PREFETCH_MARGIN; i++) {
+        const neighbour = current[direction];
+        if (neighbour === null) {
+            return null;
+        }
+        if (!(neighbour in frames)) {
+            return neighbour;
+        }
+        current = frames[neighbour];
+    }
+    return null;
+}
 
-    const paramsString = window.location.search;
-    const searchParams = new URLSearchParams(paramsString);
-    if (searchParams.get("camera") === "TOP") {
-        secondaryImage.src = bottom_image_url;
-    } else {
-        secondaryImage.src = top_image_url;
+async function prefetch_frame_windows(logId, filter, frames, frame) {
+    for (const direction of ["next_frame", "prev_frame"]) {
+        const missing = missing_neighbour(frames, frame, direction);
+        if (missing === null) {
+            continue;
+        }
+        try {
+            const fetched = await fetch_frame_window(logId, missing, filter);
+            fetched.forEach(f => {
+                // the current frame can be edited on this page, it is never stored
+                if (f.frame_number !== frame.frame_number) {
+                    frames[f.frame_number] = f;
+                }
+            });
+            preload_images(fetched);
+        } catch (error) {
+            console.error("Error:", error);
+        }
+    }
+    store_frame_window(logId, filter, frames, frame);
+}
+
+async function get_frame_data() {
+    /*
+    Returns the current frame with its images and annotations. Frames prefetched on an earlier
+    page are used without a request and removed from the storage, since they can be edited here.
+    Afterwards the windows around the current frame are prefetched in the background.
+    */
+    const pathParts = window.location.pathname.split('/').filter(Boolean);
+    const logId = pathParts[1];
+    const frame_number = Number(pathParts[3]);
+    const filter = new URLSearchParams(window.location.search).get("filter") || "None";
+
+    const frames = load_frame_window(logId, filter);
+    let frame = frames[frame_number];
+    delete frames[frame_number];
+    if (frame === undefined) {
+        try {
+            const fetched = await fetch_frame_window(logId, frame_number, filter);
+            fetched.forEach(f => {
+                frames[f.frame_number] = f;
+            });
+            frame = frames[frame_number];
+            delete frames[frame_number];
+            preload_images(fetched);
+        } catch (error) {
+            console.error("Error:", error);
+        }
     }
+    if (frame === undefined) {
+        return { frame_number: frame_number, images: {} };
+    }
+    store_frame_window(logId, filter, frames, frame);
+    prefetch_frame_windows(logId, filter, frames, frame);
+    return frame;
+}
 
+function frame_image(frame, camera) {
+    /* Returns the image of a camera in the frame or the dummy image without annotations */
+    const image = frame.images[camera];
+    if (image === undefined) {
+        return { image_url: "/static/images/dummy_image.jpg", annotations: [] };
+    }
+    return image;
 }
@@ -0,0 +1,59 @@
+import pytest
+from behavior.game_state import build_game_state_timeline, get_game_state_timeline
+from behavior.models import (
+    BehaviorFrameOption,
+    BehaviorOption,
+    BehaviorOptionState,
+    GameStateTimeline,
+)
+from ..common.factories import LogFactory
+from ..cognition.factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestGameStateTimeline:
+    @pytest.mark.django_db
+    def test_build(self):
+        log = LogFactory.create()
+        option = BehaviorOption.objects.create(
+            log=log, option_name="decide_game_state", xabsl_internal_option_id=0
+        )
+        states = {
+            name: BehaviorOptionState.objects.create(
+                log=log, option_id=option, name=name, xabsl_internal_state_id=i
+            )
+            for i, name in enumerate(["initial", "standby", "ready", "playing"])
+        }
+        sequence = ["initial", "initial", "standby", "standby", "ready", "playing"]
+        for frame_number, state in enumerate(sequence):
+            frame = CognitionFrameFactory.create(
+                log=log, frame_number=frame_number, frame_time=frame_number * 100
+            )
+            BehaviorFrameOption.objects.create(
+                frame=frame, options_id=option, active_state=states[state]
+            )
+
+        timeline = build_game_state_timeline(log.id)
+
+        assert timeline.first_standby_time == 200
+        assert timeline.first_playing_time == 500
+        assert timeline.first_playing_frame.frame_number == 5
+        assert [t["state"] for t in timeline.transitions] == [
+            "initial",
+            "standby",
+            "ready",
+            "playing",
+        ]
+        assert [t["frame_number"] for t in timeline.transitions] == [0, 2, 4, 5]
+
+    @pytest.mark.django_db
+    def test_get_builds_missing_timeline(self):
+        log = LogFactory.create()
+        assert not GameStateTimeline.objects.filter(log=log).exists()
+
+        timeline = get_game_state_timeline(log.id)
+
+        assert timeline.first_standby_time is None
+        assert timeline.transitions == []
+        assert GameStateTimeline.objects.filter(log=log).exists()
@@ -0,0 +1,127 @@
+import pytest
+from behavior.intervals import update_intervals
+from behavior.models import (
+    BehaviorFrameOption,
+    BehaviorOption,
+    BehaviorOptionState,
+    BehaviorStateInterval,
+)
+from ..common.factories import LogFactory
+from ..cognition.factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def behavior_log():
+    """
+    frames 0-9, option walk is in state stand for 0-3 and in state go for 4-9,
+    option kick is only active in 2-5
+    """
+    log = LogFactory.create()
+    frames = [
+        CognitionFrameFactory.create(log=log, frame_number=n, frame_time=n * 30)
+        for n in range(10)
+    ]
+    walk = BehaviorOption.objects.create(log=log, option_name="walk")
+    kick = BehaviorOption.objects.create(log=log, option_name="kick")
+    states = {
+        name: BehaviorOptionState.objects.create(log=log, option_id=option, name=name)
+        for option, name in [(walk, "stand"), (walk, "go"), (kick, "swing")]
+    }
+    rows = [
+        (frame, walk, states["stand"] if frame.frame_number < 4 else states["go"])
+        for frame in frames
+    ]
+    rows += [(frame, kick, states["swing"]) for frame in frames[2:6]]
+    return log, rows
+
+
+def add_rows(rows):
+    for frame, option, state in rows:
+        BehaviorFrameOption.objects.create(
+            frame=frame, options_id=option, active_state=state
+        )
+
+
+def intervals(log):
+    return sorted(
+        BehaviorStateInterval.objects.filter(log=log).values_list(
+            "option__option_name",
+            "state__name",
+            "first_frame",
+            "last_frame",
+            "start_time",
+            "end_time",
+        )
+    )
+
+
+EXPECTED = [
+    ("kick", "swing", 2, 5, 60, 150),
+    ("walk", "go", 4, 9, 120, 270),
+    ("walk", "stand", 0, 3, 0, 90),
+]
+
+
+class TestIntervals:
+    @pytest.mark.django_db
+    def test_build(self, behavior_log):
+        log, rows = behavior_log
+        add_rows(rows)
+        assert update_intervals(log.id) == 3
+        assert intervals(log) == EXPECTED
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("batches", [[(0, 4), (5, 9)], [(7, 9), (0, 2), (3, 6)]])
+    def test_batches(self, behavior_log, batches):
+        log, rows = behavior_log
+        for first, last in batches:
+            add_rows(r for r in rows if first <= r[0].frame_number <= last)
+            update_intervals(log.id, first, last)
+        assert intervals(log) == EXPECTED
+
+    @pytest.mark.django_db
+    def test_backfill_on_update(self, behavior_log):
+        log, rows = behavior_log
+        # rows ingested before the intervals were maintained
+        add_rows(r for r in rows if r[0].frame_number <= 6)
+        add_rows(r for r in rows if r[0].frame_number > 6)
+        update_intervals(log.id, 7, 9)
+        assert intervals(log) == EXPECTED
+
+    @pytest.mark.django_db
+    def test_views(self, behavior_log, superuser_client):
+        log, rows = behavior_log
+
+        payload = [
+            {"frame": frame.id, "options_id": option.id, "active_state": state.id}
+            for frame, option, state in rows
+        ]
+        response = superuser_client.post(
+            "/api/behavior-frame-option/", payload, format="json"
+        )
+        assert response.status_code == 200
+        assert intervals(log) == EXPECTED
+
+        response = superuser_client.get(
+            f"/api/behavior/intervals/?log={log.id}&option_name=walk&state_name=go"
+        )
+        assert [
+            (i["state_name"], i["first_frame"], i["last_frame"])
+            for i in response.json()
+        ] == [("go", 4, 9)]
+
+        response = superuser_client.get(
+            f"/api/behavior/active-options/?log={log.id}&frame_number=3"
+        )
+        assert sorted((i["option_name"], i["state_name"]) for i in response.json()) == [
+            ("kick", "swing"),
+            ("walk", "stand"),
+        ]
+
+        for url in [
+            "/api/behavior/intervals/?log=x&option_name=walk",
+            f"/api/behavior/active-options/?log={log.id}&frame_number=x",
+        ]:
+            assert superuser_client.get(url).status_code == 400
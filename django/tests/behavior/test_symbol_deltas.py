@@ -0,0 +1,202 @@
+import pytest
+from django.core.management import call_command
+from behavior.models import XabslSymbolSparse
+from behavior.symbol_deltas import delta_encode, symbol_state, symbol_states
+from ..common.factories import LogFactory
+from ..cognition.factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+SNAPSHOTS = [
+    {"ball.was_seen": False, "robot_pose.x": 0, "role": "striker"},
+    {"ball.was_seen": False, "robot_pose.x": 10, "role": "striker"},
+    {"ball.was_seen": True, "robot_pose.x": 10},
+    {"ball.was_seen": 1, "robot_pose.x": 10},
+    {"ball.was_seen": 1, "robot_pose.x": 10, "role": "defender"},
+]
+
+
+@pytest.fixture
+def frames():
+    log = LogFactory.create()
+    return [
+        CognitionFrameFactory.create(log=log, frame_number=n * 2)
+        for n in range(len(SNAPSHOTS))
+    ]
+
+
+def upload(superuser_client, frames, encoding="delta"):
+    payload = [
+        {"frame": frame.id, "data": data} for frame, data in zip(frames, SNAPSHOTS)
+    ]
+    # order of the upload does not matter
+    return superuser_client.post(
+        f"/api/behavior/symbol/sparse/?encoding={encoding}",
+        payload[::-1],
+        format="json",
+    )
+
+
+class TestSymbolDeltas:
+    def test_delta_encode(self):
+        rows = list(delta_encode(enumerate(SNAPSHOTS), keyframe_interval=3))
+        assert rows == [
+            (0, SNAPSHOTS[0], True, None),
+            (1, {"robot_pose.x": 10}, False, None),
+            (2, {"ball.was_seen": True}, False, ["role"]),
+            (3, SNAPSHOTS[3], True, None),
+            (4, {"role": "defender"}, False, None),
+        ]
+
+    @pytest.mark.django_db
+    def test_ingest(self, superuser_client, frames):
+        response = upload(superuser_client, frames)
+        assert response.status_code == 200
+        rows = XabslSymbolSparse.objects.order_by("frame__frame_number")
+        assert [row.keyframe for row in rows] == [True, False, False, False, False]
+        assert rows[3].data == {"ball.was_seen": 1}
+
+        log_id = frames[0].log_id
+        for n, data in enumerate(SNAPSHOTS):
+            assert symbol_state(log_id, n * 2) == data
+            # frames without symbols have the state of the previous frame
+            assert symbol_state(log_id, n * 2 + 1) == data
+        assert symbol_state(log_id, 4, ["role", "robot_pose.x"]) == {"robot_pose.x": 10}
+        assert list(symbol_states(log_id, 3, 6, ["role"])) == [(4, {}), (6, {})]
+
+        response = superuser_client.post(
+            "/api/behavior/symbol/sparse/?encoding=delta",
+            [{"frame": 0, "data": {}}],
+            format="json",
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_command(self, superuser_client, frames):
+        upload(superuser_client, frames, encoding="snapshot")
+        assert not XabslSymbolSparse.objects.filter(keyframe=False).exists()
+
+        log_id = frames[0].log_id
+        call_command("delta_encode_xabsl_symbols", log_id, keyframe_interval=3)
+        rows = XabslSymbolSparse.objects.order_by("frame__frame_number")
+        assert [row.keyframe for row in rows] == [True, False, False, True, False]
+        assert [values for _, values in symbol_states(log_id, 0, 8)] == SNAPSHOTS
+
+    @pytest.mark.django_db
+    def test_state_view(self, superuser_client, frames):
+        upload(superuser_client, frames)
+        log_id = frames[0].log_id
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/state/",
+            {"log": log_id, "frame_number": 5, "symbols": "ball.was_seen"},
+        )
+        assert response.json() == {"frame_number": 5, "data": {"ball.was_seen": True}}
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/state/",
+            {"log": log_id, "first_frame": 6, "last_frame": 8},
+        )
+        assert response.json() == [
+            {"frame_number": 6, "data": SNAPSHOTS[3]},
+            {"frame_number": 8, "data": SNAPSHOTS[4]},
+        ]
+
+        for params in [
+            {"log": log_id},
+            {"log": log_id, "frame_number": "x"},
+            {"log": "x", "first_frame": 0, "last_frame": 8},
+        ]:
+            response = superuser_client.get(
+                "/api/behavior/symbol/sparse/state/", params
+            )
+            assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_query_delta_encoded(self, superuser_client, frames):
+        upload(superuser_client, frames)
+        log_id = frames[0].log_id
+
+        # the conditions are checked on the full state, not only the changed symbols
+        for where, expected in [
+            ("robot_pose.x==10", [2, 4, 6, 8]),
+            ("role!=striker", [8]),
+            ("ball.was_seen==true", [4]),
+            ("robot_pose.x<5", [0]),
+        ]:
+            response = superuser_client.get(
+                "/api/behavior/symbol/sparse/frames/", {"log": log_id, "where": where}
+            )
+            assert response.json() == {"frame_numbers": expected}
+
+        response = superuser_client.get("/api/behavior/symbol/sparse/", {"log": log_id})
+        rows = sorted(response.json(), key=lambda row: row["frame"])
+        assert [row["data"] for row in rows] == SNAPSHOTS
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/", {"log": log_id, "where": "role==defender"}
+        )
+        assert [row["data"] for row in response.json()] == [SNAPSHOTS[4]]
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/", {"where": "role==defender"}
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_upload_order(self, superuser_client, frames):
+        log_id = frames[0].log_id
+        # uploads of separate frame ranges can arrive in any order
+        assert upload(superuser_client, frames[2:]).status_code == 200
+        assert upload(superuser_client, frames[:2]).status_code == 200
+        assert symbol_state(log_id, 2) == SNAPSHOTS[1]
+        assert symbol_state(log_id, 8) == SNAPSHOTS[2]
+
+        odd = {
+            n: CognitionFrameFactory.create(log=frames[0].log, frame_number=n)
+            for n in [3, 5, 9]
+        }
+        for encoding, frame_numbers, status_code in [
+            # 4 is already stored
+            ("delta", [3, 5], 400),
+            # 6 is a delta row replayed on top of 4
+            ("delta", [5], 400),
+            ("snapshot", [5], 400),
+            # 4 is a keyframe, the first row of its upload
+            ("snapshot", [3], 200),
+            ("delta", [9], 200),
+        ]:
+            response = superuser_client.post(
+                f"/api/behavior/symbol/sparse/?encoding={encoding}",
+                [
+                    {"frame": odd[n].id, "data": {"role": "goalie"}}
+                    for n in frame_numbers
+                ],
+                format="json",
+            )
+            assert response.status_code == status_code
+        assert not XabslSymbolSparse.objects.filter(frame=odd[5]).exists()
+        assert symbol_state(log_id, 8) == SNAPSHOTS[2]
+
+    @pytest.mark.django_db
+    def test_query_frame_range(self, superuser_client, frames):
+        upload(superuser_client, frames)
+        log_id = frames[0].log_id
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/frames/",
+            {"log": log_id, "where": "robot_pose.x==10", "first_frame": 5},
+        )
+        assert response.json() == {"frame_numbers": [6, 8]}
+
+        # the state of the first returned row is replayed from the keyframe before it
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/",
+            {"log": log_id, "first_frame": 6, "last_frame": 6},
+        )
+        assert [row["data"] for row in response.json()] == [SNAPSHOTS[3]]
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/", {"log": log_id, "first_frame": "x"}
+        )
+        assert response.status_code == 400
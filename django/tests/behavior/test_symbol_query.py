@@ -0,0 +1,119 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from behavior.models import XabslSymbolSparse
+from behavior.symbol_query import (
+    filter_symbols,
+    matches,
+    parse_condition,
+    symbol_index_name,
+)
+from ..common.factories import LogFactory
+from ..cognition.factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+SYMBOLS = [
+    {"ball.was_seen": False, "robot_pose.x": 0, "role": "striker"},
+    {"ball.was_seen": True, "robot_pose.x": 500, "role": "striker"},
+    {"ball.was_seen": True, "robot_pose.x": 1500, "role": "defender"},
+    {"ball.was_seen": True, "robot_pose.x": "unknown"},
+]
+
+
+@pytest.fixture
+def symbol_log():
+    log = LogFactory.create()
+    for n, data in enumerate(SYMBOLS):
+        frame = CognitionFrameFactory.create(log=log, frame_number=n)
+        XabslSymbolSparse.objects.create(frame=frame, data=data)
+    # another log with matching symbols
+    frame = CognitionFrameFactory.create(log=LogFactory.create(), frame_number=9)
+    XabslSymbolSparse.objects.create(frame=frame, data=SYMBOLS[2])
+    return log
+
+
+def frame_numbers(log, *conditions):
+    queryset = filter_symbols(
+        XabslSymbolSparse.objects.filter(frame__log=log), conditions
+    )
+    return sorted(queryset.values_list("frame__frame_number", flat=True))
+
+
+class TestSymbolQuery:
+    def test_parse_condition(self):
+        assert parse_condition("ball.was_seen==true") == ("ball.was_seen", "==", True)
+        assert parse_condition("robot_pose.x >= 1e3") == ("robot_pose.x", ">=", 1000.0)
+        assert parse_condition("role!=striker") == ("role", "!=", "striker")
+        assert parse_condition('role=="a b"') == ("role", "==", "a b")
+        for condition in ["ball.was_seen", "==true", "x==", "x>[1]", "x<null"]:
+            with pytest.raises(ValueError):
+                parse_condition(condition)
+
+    @pytest.mark.django_db
+    def test_filter_symbols(self, symbol_log):
+        assert frame_numbers(symbol_log, "ball.was_seen==true") == [1, 2, 3]
+        assert frame_numbers(
+            symbol_log, "ball.was_seen==true", "robot_pose.x>1000"
+        ) == [2]
+        # only numbers are compared with numbers
+        assert frame_numbers(symbol_log, "robot_pose.x<=500") == [0, 1]
+        assert frame_numbers(symbol_log, "role!=striker") == [2]
+        assert frame_numbers(symbol_log, "role<e") == [2]
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        "conditions",
+        [
+            ["ball.was_seen==true"],
+            ["ball.was_seen==1"],
+            ["ball.was_seen==true", "robot_pose.x>1000"],
+            ["robot_pose.x<=500"],
+            ["role!=striker"],
+            ["role<e"],
+            ["robot_pose.x==unknown"],
+        ],
+    )
+    def test_matches(self, symbol_log, conditions):
+        # the python check of replayed states agrees with the sql conditions
+        parsed = [parse_condition(condition) for condition in conditions]
+        expected = [n for n, data in enumerate(SYMBOLS) if matches(data, parsed)]
+        assert frame_numbers(symbol_log, *conditions) == expected
+
+    # indexes are created concurrently, which is not possible inside a transaction
+    @pytest.mark.django_db(transaction=True)
+    def test_index_command(self):
+        name = symbol_index_name("robot_pose.x")
+
+        def index_names():
+            with connection.cursor() as cursor:
+                return connection.introspection.get_constraints(
+                    cursor, XabslSymbolSparse._meta.db_table
+                ).keys()
+
+        call_command("index_xabsl_symbols", "robot_pose.x")
+        assert name in index_names()
+        call_command("index_xabsl_symbols", "robot_pose.x", drop=True)
+        assert name not in index_names()
+
+    @pytest.mark.django_db
+    def test_views(self, symbol_log, superuser_client):
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/frames/",
+            {"log": symbol_log.id, "where": ["ball.was_seen==true", "robot_pose.x>1"]},
+        )
+        assert response.json() == {"frame_numbers": [1, 2]}
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/",
+            {"log": symbol_log.id, "where": "role==defender"},
+        )
+        assert [row["data"] for row in response.json()] == [SYMBOLS[2]]
+
+        response = superuser_client.get(
+            "/api/behavior/symbol/sparse/", {"log": symbol_log.id, "where": "role"}
+        )
+        assert response.status_code == 400
+
+        response = superuser_client.get("/api/behavior/symbol/sparse/frames/")
+        assert response.status_code == 400
@@ -0,0 +1,69 @@
+import pytest
+from behavior.models import BehaviorOption, BehaviorOptionState
+from ..common.factories import LogFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestBehaviorOptionViews:
+    @pytest.mark.django_db
+    def test_option_bulk_create(self, superuser_client):
+        logs = LogFactory.create_batch(2)
+        data = [
+            {"log": log.id, "xabsl_internal_option_id": i, "option_name": name}
+            for log in logs
+            for i, name in enumerate(["root", "walk"])
+        ]
+
+        response = superuser_client.post("/api/behavior-option/", data, format="json")
+        assert response.status_code == 200
+        assert response.json()["created"] == 4
+
+        response = superuser_client.post("/api/behavior-option/", data, format="json")
+        body = response.json()
+        assert (body["created"], body["existing"]) == (0, 4)
+        assert [(o["log"], o["option_name"]) for o in body["events"]] == [
+            (item["log"], item["option_name"]) for item in data
+        ]
+        assert BehaviorOption.objects.count() == 4
+
+    @pytest.mark.django_db
+    def test_state_bulk_create(self, superuser_client):
+        logs = LogFactory.create_batch(2)
+        options = [
+            BehaviorOption.objects.create(
+                log=log, xabsl_internal_option_id=0, option_name="root"
+            )
+            for log in logs
+        ]
+        data = [
+            {
+                "log": option.log_id,
+                "option_id": option.id,
+                "xabsl_internal_state_id": i,
+                "name": name,
+            }
+            for option in options
+            for i, name in enumerate(["initial", "playing"])
+        ]
+
+        response = superuser_client.post(
+            "/api/behavior-option-state/", data, format="json"
+        )
+        assert response.json()["created"] == 4
+
+        response = superuser_client.post(
+            "/api/behavior-option-state/", data[:3], format="json"
+        )
+        body = response.json()
+        assert (body["created"], body["existing"]) == (0, 3)
+        states = {
+            (s.option_id_id, s.xabsl_internal_state_id, s.name): s.id
+            for s in BehaviorOptionState.objects.all()
+        }
+        assert len(states) == 4
+        assert [state[:3] for state in body["states"]] == [
+            [item["option_id"], item["xabsl_internal_state_id"], item["name"]]
+            for item in data[:3]
+        ]
+        assert all(states[tuple(state[:3])] == state[3] for state in body["states"])
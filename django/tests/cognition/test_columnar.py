@@ -0,0 +1,64 @@
+import pytest
+from cognition.columnar import pack_representation, read_representation
+from cognition.models import RobotPose, RepresentationChunk
+from ..common.factories import LogFactory
+from .factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestColumnar:
+    @pytest.mark.django_db
+    def test_pack_and_read(self):
+        log = LogFactory.create()
+        frames = [
+            CognitionFrameFactory.create(log=log, frame_number=i, frame_time=i * 33)
+            for i in range(10)
+        ]
+        for frame in frames:
+            RobotPose.objects.create(
+                frame=frame, representation_data={"x": frame.frame_number}
+            )
+
+        assert pack_representation(RobotPose, log.id, chunk_size=4) == 10
+        assert RepresentationChunk.objects.filter(log=log).count() == 3
+
+        data = read_representation("RobotPose", log.id, start=3, end=8)
+        assert data["frame_number"] == [3, 4, 5, 6, 7, 8]
+        assert data["frame_time"] == [99, 132, 165, 198, 231, 264]
+        assert data["representation_data"] == [{"x": i} for i in range(3, 9)]
+
+        # packing again replaces the existing chunks
+        pack_representation(RobotPose, log.id)
+        assert RepresentationChunk.objects.filter(log=log).count() == 1
+        assert len(read_representation("RobotPose", log.id)["frame_number"]) == 10
+
+    @pytest.mark.django_db
+    def test_invalidation(self, superuser_client):
+        frame = CognitionFrameFactory.create()
+        RobotPose.objects.create(frame=frame, representation_data={"x": 0})
+        url = f"/api/cognition/RobotPose/columnar/?log={frame.log_id}"
+
+        assert superuser_client.get(url).status_code == 404
+        for query in [
+            "log=x",
+            f"log={frame.log_id}&start=x",
+            f"log={frame.log_id}&end=y",
+        ]:
+            response = superuser_client.get(
+                f"/api/cognition/RobotPose/columnar/?{query}"
+            )
+            assert response.status_code == 400
+        response = superuser_client.post("/api/cognition/RobotPose/pack/?log=x")
+        assert response.status_code == 400
+        superuser_client.post(f"/api/cognition/RobotPose/pack/?log={frame.log_id}")
+        assert superuser_client.get(url).json()["representation_data"] == [{"x": 0}]
+
+        # a new upload replaces the packed rows, they are packed again on request
+        response = superuser_client.post(
+            "/api/cognition/RobotPose/",
+            [{"frame": frame.id, "representation_data": {"x": 1}}],
+            format="json",
+        )
+        assert response.status_code == 200
+        assert superuser_client.get(url).status_code == 404
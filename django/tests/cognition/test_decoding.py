@@ -0,0 +1,75 @@
+import pytest
+from django.core.cache import cache
+from cognition import decoding
+from cognition.models import BallModel
+from ..common.factories import LogFactory
+from .factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestDecoding:
+    @pytest.fixture(autouse=True)
+    def fake_decoder(self, monkeypatch):
+        # the naoth message definitions are not needed to test reading and caching
+        calls = []
+
+        def decode_payload(representation, data):
+            calls.append(bytes(data))
+            return {"payload": bytes(data).decode()}
+
+        monkeypatch.setattr(decoding, "decode_payload", decode_payload)
+        cache.clear()
+        return calls
+
+    @pytest.mark.django_db
+    def test_decode_missing(self, fake_decoder, tmp_path, settings):
+        settings.LOG_ROOT = str(tmp_path)
+        (tmp_path / "game.log").write_bytes(b"xxballyy")
+        log = LogFactory.create(log_path="game.log")
+        ball = BallModel.objects.create(
+            frame=CognitionFrameFactory.create(log=log), start_pos=2, size=4
+        )
+        stored = BallModel.objects.create(
+            frame=CognitionFrameFactory.create(log=log),
+            representation_data={"stored": True},
+        )
+
+        decoding.decode_missing("BallModel", [ball, stored])
+        assert ball.representation_data == {"payload": "ball"}
+        assert stored.representation_data == {"stored": True}
+
+        # the second access is answered from the cache
+        ball = BallModel.objects.get(id=ball.id)
+        assert ball.representation_data is None
+        decoding.decode_missing("BallModel", [ball])
+        assert ball.representation_data == {"payload": "ball"}
+        assert fake_decoder == [b"ball"]
+
+
+class TestDecodingErrors:
+    @pytest.mark.django_db
+    def test_decode_payload(self, tmp_path, settings):
+        settings.LOG_ROOT = str(tmp_path)
+        # BallModel with valid = true, followed by a field number that does not exist
+        (tmp_path / "game.log").write_bytes(b"\x08\x01\xff")
+        log = LogFactory.create(log_path="game.log")
+        ball, broken, truncated = [
+            BallModel.objects.create(
+                frame=CognitionFrameFactory.create(log=log), start_pos=0, size=size
+            )
+            for size in [2, 3, 10]
+        ]
+
+        decoding.decode_missing("BallModel", [ball, broken])
+        assert ball.representation_data == {"valid": True}
+        assert broken.representation_data is None
+
+        # a range past the end of the file or a missing file leave the rows undecoded
+        decoding.decode_missing("BallModel", [truncated])
+        assert truncated.representation_data is None
+        (tmp_path / "game.log").unlink()
+        ball = BallModel.objects.get(id=ball.id)
+        cache.clear()
+        decoding.decode_missing("BallModel", [ball])
+        assert ball.representation_data is None
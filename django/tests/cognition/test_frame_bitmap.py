@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from cognition import frame_bitmap
+from cognition.models import CognitionFrame, FrameFilter
+from ..common.factories import LogFactory
+from .factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+def container_kinds(bitmap):
+    return frame_bitmap._headers(bitmap)["kind"].tolist()
+
+
+class TestFrameBitmap:
+    @pytest.mark.parametrize(
+        "frame_numbers, kinds",
+        [
+            ([], []),
+            ([7, 3, 3], [frame_bitmap.ARRAY]),
+            (range(100000), [frame_bitmap.RUNS, frame_bitmap.RUNS]),
+            (range(0, 65536, 2), [frame_bitmap.BITMAP]),
+            ([1, 70000, 2**32 - 1], [frame_bitmap.ARRAY] * 3),
+        ],
+    )
+    def test_roundtrip(self, frame_numbers, kinds):
+        bitmap = frame_bitmap.encode(frame_numbers)
+        expected = sorted(set(frame_numbers))
+        assert frame_bitmap.decode(bitmap).tolist() == expected
+        assert frame_bitmap.cardinality(bitmap) == len(expected)
+        assert container_kinds(bitmap) == kinds
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            frame_bitmap.encode([-1])
+        with pytest.raises(ValueError):
+            frame_bitmap.encode([2**32])
+
+    def test_combine(self):
+        a, b, c = np.array([1, 2, 3, 4]), np.array([3, 4, 5]), np.array([4])
+        assert frame_bitmap.combine("union", [a, b]).tolist() == [1, 2, 3, 4, 5]
+        assert frame_bitmap.combine("intersection", [a, b]).tolist() == [3, 4]
+        assert frame_bitmap.combine("difference", [a, b, c]).tolist() == [1, 2]
+
+    @pytest.mark.django_db
+    def test_frame_number_in(self):
+        log = LogFactory.create()
+        for frame_number in range(5):
+            CognitionFrameFactory.create(log=log, frame_number=frame_number)
+        queryset = CognitionFrame.objects.filter(log=log)
+
+        frames = queryset.filter(frame_bitmap.frame_number_in([1, 3, 9]))
+        assert sorted(frames.values_list("frame_number", flat=True)) == [1, 3]
+        assert not queryset.filter(frame_bitmap.frame_number_in([])).exists()
+
+    @pytest.mark.django_db
+    def test_views(self, superuser, superuser_client):
+        log = LogFactory.create()
+        for frame_number in range(6):
+            CognitionFrameFactory.create(log=log, frame_number=frame_number)
+
+        ids = {}
+        for name, frame_list in [("a", [0, 1, 2, 3]), ("b", [2, 3, 4])]:
+            response = superuser_client.post(
+                "/api/frame-filter/",
+                {"log": log.id, "name": name, "frames": {"frame_list": frame_list}},
+                format="json",
+            )
+            assert response.status_code == 201
+            assert response.json()["frames"] == {"frame_list": frame_list}
+            assert response.json()["cardinality"] == len(frame_list)
+            ids[name] = response.json()["id"]
+        everything = FrameFilter.objects.create(log=log, user=superuser, name="all")
+
+        response = superuser_client.post(
+            "/api/frame-filter/combine/",
+            {"operation": "intersection", "filters": [ids["a"], ids["b"]]},
+            format="json",
+        )
+        assert response.json() == {
+            "log": log.id,
+            "cardinality": 2,
+            "frames": {"frame_list": [2, 3]},
+        }
+
+        # a filter without frames stands for all frames of the log
+        response = superuser_client.post(
+            "/api/frame-filter/combine/",
+            {
+                "operation": "difference",
+                "filters": [everything.id, ids["a"]],
+                "cardinality_only": True,
+            },
+            format="json",
+        )
+        assert response.json() == {"log": log.id, "cardinality": 2}
+
+        response = superuser_client.post(
+            "/api/frame-filter/combine/",
+            {"operation": "union", "filters": [ids["a"], ids["b"]], "name": "a or b"},
+            format="json",
+        )
+        assert response.status_code == 201
+        saved = FrameFilter.objects.get(id=response.json()["id"])
+        assert frame_bitmap.decode(saved.bitmap).tolist() == [0, 1, 2, 3, 4]
+
+        other = FrameFilter.objects.create(
+            log=LogFactory.create(), user=superuser, name="other", bitmap=saved.bitmap
+        )
+        for payload, status_code in [
+            ({"operation": "xor", "filters": [ids["a"], ids["b"]]}, 400),
+            ({"operation": "union", "filters": [ids["a"]]}, 400),
+            ({"operation": "union", "filters": [ids["a"], other.id]}, 400),
+            ({"operation": "union", "filters": [ids["a"], 0]}, 404),
+            ({"operation": "union", "filters": ids["a"]}, 400),
+            ({"operation": "union", "filters": [ids["a"], "b"]}, 400),
+            ({"operation": "union", "filters": [str(ids["a"]), str(ids["b"])]}, 200),
+        ]:
+            response = superuser_client.post(
+                "/api/frame-filter/combine/", payload, format="json"
+            )
+            assert response.status_code == status_code
+
+        for frame_list in [[-1], [1.5], [True], [[1, 2]], [2**70], ["a"]]:
+            response = superuser_client.post(
+                "/api/frame-filter/",
+                {"log": log.id, "name": "bad", "frames": {"frame_list": frame_list}},
+                format="json",
+            )
+            assert response.status_code == 400
+        assert not FrameFilter.objects.filter(name="bad").exists()
@@ -0,0 +1,68 @@
+import pytest
+from cognition import frame_bitmap
+from cognition.frame_index import (
+    frame_index,
+    frame_neighbours,
+    invalidate_filter_index,
+    invalidate_frame_index,
+)
+from cognition.models import FrameFilter
+from ..common.factories import LogFactory
+from ..user.factories import UserFactory
+from .factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestFrameIndex:
+    @pytest.mark.django_db
+    def test_frame_neighbours(self):
+        log = LogFactory.create()
+        for frame_number in [30, 10, 20, 40]:
+            CognitionFrameFactory.create(log=log, frame_number=frame_number)
+        frame_filter = FrameFilter.objects.create(
+            log=log,
+            user=UserFactory.create(),
+            name="odd",
+            bitmap=frame_bitmap.encode([10, 30, 50]),
+        )
+
+        assert frame_index(log.id).tolist() == [10, 20, 30, 40]
+        assert frame_neighbours(log.id, 10) == (0, None, 20, 4)
+        assert frame_neighbours(log.id, 20) == (1, 10, 30, 4)
+        assert frame_neighbours(log.id, 40) == (3, 30, None, 4)
+        # a frame that is not part of the index gets the neighbours around its position
+        assert frame_neighbours(log.id, 25) == (2, 20, 30, 4)
+
+        assert frame_index(log.id, frame_filter.id).tolist() == [10, 30]
+        assert frame_neighbours(log.id, 30, frame_filter.id) == (1, 10, None, 2)
+        assert frame_neighbours(log.id, 20, frame_filter.id) == (1, 10, 30, 2)
+
+    @pytest.mark.django_db
+    def test_invalidate(self, django_assert_num_queries):
+        log = LogFactory.create()
+        CognitionFrameFactory.create(log=log, frame_number=1)
+        frame_filter = FrameFilter.objects.create(
+            log=log,
+            user=UserFactory.create(),
+            name="all",
+            bitmap=frame_bitmap.encode([1, 2]),
+        )
+        assert frame_index(log.id, frame_filter.id).tolist() == [1]
+
+        CognitionFrameFactory.create(log=log, frame_number=2)
+        with django_assert_num_queries(0):
+            assert frame_index(log.id).tolist() == [1]
+            assert frame_index(log.id, frame_filter.id).tolist() == [1]
+
+        invalidate_frame_index(log.id)
+        assert frame_index(log.id).tolist() == [1, 2]
+        assert frame_index(log.id, frame_filter.id).tolist() == [1, 2]
+
+        frame_filter.bitmap = frame_bitmap.encode([2])
+        frame_filter.save()
+        invalidate_filter_index(frame_filter)
+        assert frame_index(log.id, frame_filter.id).tolist() == [2]
+        # the unfiltered index is still cached
+        with django_assert_num_queries(0):
+            assert frame_index(log.id).tolist() == [1, 2]
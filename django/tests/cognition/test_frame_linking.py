@@ -0,0 +1,73 @@
+import pytest
+from cognition.frame_linking import link_closest_frames
+from motion.models import MotionFrame
+from ..common.factories import LogFactory
+from .factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestFrameLinking:
+    @pytest.mark.django_db
+    def test_link_closest_frames(self):
+        log = LogFactory.create()
+        other_log = LogFactory.create()
+        cognition = [
+            CognitionFrameFactory.create(log=log, frame_number=n, frame_time=t)
+            for n, t in [(1, 1000), (2, 1033), (3, 1066)]
+        ]
+        motion = [
+            MotionFrame.objects.create(log=log, frame_number=n, frame_time=t)
+            for n, t in [(1, 990), (2, 1002), (3, 1024), (4, 1042), (5, 1100)]
+        ]
+        # frames of other logs must never be linked
+        MotionFrame.objects.create(log=other_log, frame_number=1, frame_time=1066)
+
+        assert link_closest_frames(log.id) == (3, 5)
+
+        for frame in cognition:
+            frame.refresh_from_db()
+        # 1033 is 9 away from 1024 and from 1042, the earlier frame wins
+        assert [f.closest_motion_frame_id for f in cognition] == [
+            motion[1].id,
+            motion[2].id,
+            motion[3].id,
+        ]
+
+        for frame in motion:
+            frame.refresh_from_db()
+        assert [f.closest_cognition_frame_id for f in motion] == [
+            cognition[0].id,
+            cognition[0].id,
+            cognition[1].id,
+            cognition[1].id,
+            cognition[2].id,
+        ]
+
+        # running it again does not touch the already linked frames
+        assert link_closest_frames(log.id) == (0, 0)
+
+    @pytest.mark.django_db
+    def test_view(self, superuser_client):
+        log = LogFactory.create()
+        CognitionFrameFactory.create(log=log, frame_number=1, frame_time=1000)
+        MotionFrame.objects.create(log=log, frame_number=1, frame_time=990)
+
+        response = superuser_client.post(
+            "/api/cognitionframe/link/", {"log": log.id}, format="json"
+        )
+        assert response.json() == {
+            "cognition_frames_updated": 1,
+            "motion_frames_updated": 1,
+        }
+
+        for query, data, status_code in [
+            ("", [log.id], 400),
+            ("?log=x", {}, 400),
+            ("", {"log": [log.id]}, 400),
+            (f"?log={log.id + 1000}", {}, 404),
+        ]:
+            response = superuser_client.post(
+                f"/api/cognitionframe/link/{query}", data, format="json"
+            )
+            assert response.status_code == status_code
@@ -0,0 +1,32 @@
+import pytest
+from cognition.timeline import closest_frame_numbers, invalidate_timeline
+from ..common.factories import LogFactory
+from .factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestTimeline:
+    @pytest.mark.django_db
+    def test_closest_frame_numbers(self):
+        log = LogFactory.create()
+        for frame_number, frame_time in [(1, 1000), (2, 1033), (3, 1066), (4, 1100)]:
+            CognitionFrameFactory.create(
+                log=log, frame_number=frame_number, frame_time=frame_time
+            )
+
+        result = closest_frame_numbers(log.id, [0, 1020, 1049.5, 1070, 5000])
+        assert result.tolist() == [1, 2, 2, 3, 4]
+
+    @pytest.mark.django_db
+    def test_invalidate(self, django_assert_num_queries):
+        log = LogFactory.create()
+        assert closest_frame_numbers(log.id, [0]) is None
+
+        CognitionFrameFactory.create(log=log, frame_number=1, frame_time=1000)
+        # the empty timeline is still cached
+        with django_assert_num_queries(0):
+            assert closest_frame_numbers(log.id, [0]) is None
+
+        invalidate_timeline(log.id)
+        assert closest_frame_numbers(log.id, [0]).tolist() == [1]
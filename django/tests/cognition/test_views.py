@@ -0,0 +1,72 @@
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from cognition.models import BallModel
+from ..common.factories import LogFactory
+from .factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestColumnarFormats:
+    @pytest.mark.django_db
+    def test_cognitionframe_arrow(self, auth_client):
+        log = LogFactory.create()
+        CognitionFrameFactory.create_batch(3, log=log)
+
+        response = auth_client.get(
+            f"/api/cognitionframe/?log={log.id}",
+            HTTP_ACCEPT="application/vnd.apache.arrow.stream",
+        )
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/vnd.apache.arrow.stream"
+        table = pa.ipc.open_stream(b"".join(response.streaming_content)).read_all()
+        assert table.num_rows == 3
+        assert table.column_names == [
+            "id",
+            "log",
+            "frame_number",
+            "frame_time",
+            "closest_motion_frame",
+        ]
+
+    @pytest.mark.django_db
+    def test_representation_parquet(self, auth_client):
+        frame = CognitionFrameFactory.create()
+        BallModel.objects.create(frame=frame, representation_data={"seen": True})
+
+        response = auth_client.get(
+            f"/api/cognition/BallModel/?log={frame.log.id}&format=parquet"
+        )
+
+        assert response.status_code == 200
+        rows = pq.read_table(
+            io.BytesIO(b"".join(response.streaming_content))
+        ).to_pylist()
+        assert rows[0]["frame_number"] == frame.frame_number
+        assert rows[0]["representation_data"] == '{"seen": true}'
+
+    @pytest.mark.django_db
+    def test_columnar_batches(self, auth_client, monkeypatch):
+        monkeypatch.setattr("core.renderers.BATCH_SIZE", 2)
+        log = LogFactory.create()
+        CognitionFrameFactory.create_batch(5, log=log)
+
+        response = auth_client.get(f"/api/cognitionframe/?log={log.id}&format=arrow")
+
+        batches = list(pa.ipc.open_stream(b"".join(response.streaming_content)))
+        assert [batch.num_rows for batch in batches] == [2, 2, 1]
+
+    @pytest.mark.django_db
+    def test_columnar_list_only(self, auth_client):
+        frame = CognitionFrameFactory.create()
+
+        response = auth_client.get(f"/api/cognitionframe/{frame.id}/?format=arrow")
+        assert response.status_code == 404
+        response = auth_client.get(
+            f"/api/cognitionframe/{frame.id}/",
+            HTTP_ACCEPT="application/vnd.apache.parquet",
+        )
+        assert response.status_code == 406
@@ -38,7 +38,8 @@ class TeamFactory(DjangoModelFactory):
         # this should ensure that factory treats team_id as unique value
         django_get_or_create = ("team_id",)
 
-    team_id = factory.Sequence(lambda n: n + 1)
+    # start above the team ids that are inserted by the migrations
+    team_id = factory.Sequence(lambda n: n + 1000)
     name = factory.LazyAttribute(lambda obj: f"Team Name {obj.team_id}")
 
 
@@ -120,7 +121,6 @@ class LogFactory(DjangoModelFactory):
     log_path = factory.Faker("file_path", extension="log")
     combined_log_path = factory.Faker("file_path", extension="log")
     sensor_log_path = factory.Faker("file_path", extension="log")
-    is_favourite = factory.Faker("boolean")
 
 
 class LogStatusFactory(DjangoModelFactory):
@@ -0,0 +1,45 @@
+import pytest
+from cognition.models import BallModel
+from common.counts import add_counts, get_count, reset_counts
+from common.models import LogRepresentationCount
+from .factories import LogFactory
+from ..cognition.factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+def count_balls(log_id):
+    return BallModel.objects.filter(frame__log=log_id).count()
+
+
+class TestCounts:
+    @pytest.mark.django_db
+    def test_count_once_then_add(self, django_assert_num_queries):
+        log = LogFactory.create()
+        for frame in CognitionFrameFactory.create_batch(2, log=log):
+            BallModel.objects.create(frame=frame)
+
+        assert get_count(log.id, "BallModel", count_balls) == 2
+        # the stored count is used from now on
+        with django_assert_num_queries(1):
+            assert get_count(log.id, "BallModel", count_balls) == 2
+
+        add_counts("BallModel", {log.id: 3}, count_balls)
+        assert get_count(log.id, "BallModel", count_balls) == 5
+
+        reset_counts([log.id])
+        assert get_count(log.id, "BallModel", count_balls) == 2
+
+    @pytest.mark.django_db
+    def test_add_without_stored_count(self):
+        log = LogFactory.create()
+        BallModel.objects.create(frame=CognitionFrameFactory.create(log=log))
+
+        # the first batch of a log is counted completely, it already contains the new rows
+        add_counts("BallModel", {log.id: 1}, count_balls)
+        assert LogRepresentationCount.objects.get(log=log).num_rows == 1
+
+    @pytest.mark.django_db
+    def test_unknown_log(self):
+        assert get_count(-1, "BallModel", count_balls) == 0
+        assert not LogRepresentationCount.objects.exists()
@@ -1,10 +1,17 @@
 import pytest
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
 from .user.factories import UserFactory
 from user.models import Organization
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """counts, frame indexes, timelines and cached responses must not leak between tests"""
+    cache.clear()
+
+
 @pytest.fixture
 def admin_client():
     """client with create,modify and delete permissions"""
@@ -26,6 +33,20 @@ def auth_client():
     return client
 
 
+@pytest.fixture
+def superuser():
+    return UserFactory.create(is_superuser=True)
+
+
+@pytest.fixture
+def superuser_client(superuser):
+    """client that passes every model permission check"""
+    token = Token.objects.create(user=superuser)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+    return client
+
+
 @pytest.fixture
 def client():
     """client with no permissions"""
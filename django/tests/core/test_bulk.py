@@ -0,0 +1,188 @@
+import pytest
+from django.core.exceptions import FieldDoesNotExist
+from core.bulk import CopyStream, bulk_update, copy_upsert, upsert_returning
+from behavior.models import BehaviorOption
+from cognition.models import BallModel, CognitionFrame
+from ..cognition.factories import CognitionFrameFactory
+from ..common.factories import LogFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestCopyStream:
+    def test_render_rows(self):
+        stream = CopyStream([(1, '{"a": "b,c"}'), (2, None)])
+        assert stream.read() == '"1","{""a"": ""b,c""}"\n"2",\n'
+        assert stream.read() == ""
+
+    def test_read_in_chunks(self):
+        rows = [(i, "x" * 10) for i in range(100)]
+        expected = CopyStream(rows).read()
+
+        stream = CopyStream(rows)
+        chunks = []
+        while chunk := stream.read(64):
+            assert len(chunk) <= 64
+            chunks.append(chunk)
+        assert "".join(chunks) == expected
+
+
+class TestCopyUpsert:
+    @pytest.mark.django_db
+    def test_insert_and_update(self):
+        frames = CognitionFrameFactory.create_batch(3)
+        table = BallModel._meta.db_table
+        columns = ["frame_id", "representation_data"]
+
+        rows = [(frame.id, '{"seen": false}') for frame in frames]
+        assert (
+            copy_upsert(table, columns, rows, ["frame_id"], ["representation_data"])
+            == 3
+        )
+
+        # the last of several rows for the same frame wins
+        rows = [(frames[0].id, '{"seen": false}'), (frames[0].id, '{"seen": true}')]
+        assert (
+            copy_upsert(table, columns, rows, ["frame_id"], ["representation_data"])
+            == 1
+        )
+
+        assert BallModel.objects.count() == 3
+        assert BallModel.objects.get(frame=frames[0]).representation_data == {
+            "seen": True
+        }
+
+    @pytest.mark.django_db
+    def test_keep_existing(self):
+        frame = CognitionFrameFactory.create()
+        table = BallModel._meta.db_table
+        columns = ["frame_id", "start_pos", "representation_data"]
+        update = ["start_pos", "representation_data"]
+
+        copy_upsert(table, columns, [(frame.id, 10, None)], ["frame_id"], update)
+        copy_upsert(
+            table,
+            columns,
+            [(frame.id, None, '{"seen": true}')],
+            ["frame_id"],
+            update,
+            keep_existing=True,
+        )
+        ball = BallModel.objects.get(frame=frame)
+        assert (ball.start_pos, ball.representation_data) == (10, {"seen": True})
+
+    @pytest.mark.django_db
+    def test_do_nothing_on_conflict(self):
+        frame = CognitionFrameFactory.create()
+        table = BallModel._meta.db_table
+        columns = ["frame_id", "representation_data"]
+
+        copy_upsert(table, columns, [(frame.id, '{"seen": false}')], ["frame_id"])
+        assert (
+            copy_upsert(table, columns, [(frame.id, '{"seen": true}')], ["frame_id"])
+            == 0
+        )
+        assert BallModel.objects.get(frame=frame).representation_data == {"seen": False}
+
+    @pytest.mark.django_db
+    def test_new_frames_per_log(self):
+        frames = CognitionFrameFactory.create_batch(3)
+        table = BallModel._meta.db_table
+        columns = ["frame_id", "representation_data"]
+        frame_table = CognitionFrame._meta.db_table
+
+        rows = [(frame.id, "{}") for frame in frames[:2]]
+        assert copy_upsert(
+            table, columns, rows, ["frame_id"], frame_table=frame_table
+        ) == {
+            frames[0].log_id: 1,
+            frames[1].log_id: 1,
+        }
+
+        # frames that already have a row are not counted again, their log is still reported
+        rows = [(frame.id, "{}") for frame in frames]
+        assert copy_upsert(
+            table,
+            columns,
+            rows,
+            ["frame_id"],
+            ["representation_data"],
+            frame_table=frame_table,
+        ) == {frames[0].log_id: 0, frames[1].log_id: 0, frames[2].log_id: 1}
+
+
+class TestBulkUpdate:
+    @pytest.mark.django_db
+    def test_update(self):
+        frames = CognitionFrameFactory.create_batch(3, frame_time=100)
+        rows = [
+            {"id": frames[0].id, "frame_time": 200, "closest_motion_frame": None},
+            # fields given as None or missing keep their value
+            {"id": frames[1].id, "frame_time": None},
+            {"id": frames[2].id, "frame_number": 7},
+        ]
+
+        ids = bulk_update(CognitionFrame, rows, batch_size=2)
+        assert sorted(ids) == sorted(frame.id for frame in frames)
+
+        for frame in frames:
+            frame.refresh_from_db()
+        assert [frame.frame_time for frame in frames] == [200, 100, 100]
+        assert frames[2].frame_number == 7
+
+    @pytest.mark.django_db
+    def test_unknown_field(self):
+        frame = CognitionFrameFactory.create()
+        with pytest.raises(FieldDoesNotExist):
+            bulk_update(CognitionFrame, [{"id": frame.id, "frame_time = 0; --": 1}])
+
+
+class TestUpsertReturning:
+    @pytest.mark.django_db
+    def test_insert_and_existing(self):
+        log = LogFactory.create()
+        other_log = LogFactory.create()
+        existing = BehaviorOption.objects.create(
+            log=log, xabsl_internal_option_id=0, option_name="root"
+        )
+        key = ("log_id", "xabsl_internal_option_id", "option_name")
+
+        ids, created = upsert_returning(
+            BehaviorOption,
+            [
+                {
+                    "log_id": log.id,
+                    "xabsl_internal_option_id": 0,
+                    "option_name": "root",
+                },
+                {
+                    "log_id": log.id,
+                    "xabsl_internal_option_id": 1,
+                    "option_name": "walk",
+                },
+                # duplicates inside the batch are sent once
+                {
+                    "log_id": log.id,
+                    "xabsl_internal_option_id": 1,
+                    "option_name": "walk",
+                },
+                # null ids take part in the conflict check as well
+                {"log_id": other_log.id, "option_name": "root"},
+            ],
+            key,
+        )
+
+        assert created == 2
+        walk = BehaviorOption.objects.get(log=log, option_name="walk")
+        other = BehaviorOption.objects.get(log=other_log)
+        assert ids == {
+            (log.id, 0, "root"): existing.id,
+            (log.id, 1, "walk"): walk.id,
+            (other_log.id, None, "root"): other.id,
+        }
+
+        ids, created = upsert_returning(
+            BehaviorOption, [{"log_id": other_log.id, "option_name": "root"}], key
+        )
+        assert (ids, created) == ({(other_log.id, None, "root"): other.id}, 0)
+        assert BehaviorOption.objects.count() == 3
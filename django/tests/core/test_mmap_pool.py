@@ -0,0 +1,49 @@
+import os
+import pytest
+from core.mmap_pool import MmapPool
+
+pytestmark = pytest.mark.unit
+
+
+class TestMmapPool:
+    def test_reuse(self, tmp_path):
+        path = tmp_path / "a.log"
+        path.write_bytes(b"abc")
+        pool = MmapPool()
+
+        with pool.open(path) as first:
+            assert first[:] == b"abc"
+        with pool.open(path) as second:
+            assert second is first
+
+    def test_file_change(self, tmp_path):
+        path = tmp_path / "a.log"
+        path.write_bytes(b"abc")
+        pool = MmapPool()
+
+        with pool.open(path) as first:
+            pass
+        path.write_bytes(b"abcdef")
+        with pool.open(path) as second:
+            assert second[:] == b"abcdef"
+        assert first.closed
+
+    def test_evict_in_use(self, tmp_path):
+        paths = [tmp_path / f"{i}.log" for i in range(3)]
+        for path in paths:
+            path.write_bytes(b"x")
+        pool = MmapPool(max_size=1)
+
+        with pool.open(paths[0]) as in_use:
+            with pool.open(paths[1]):
+                pass
+            # evicted from the pool but still usable until released
+            assert not in_use.closed
+            assert in_use[:] == b"x"
+        assert in_use.closed
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.log"
+        path.touch()
+        with MmapPool().open(os.fspath(path)) as data:
+            assert data[:] == b""
@@ -0,0 +1,36 @@
+import pytest
+from core.pagination import keyset_iterator
+from cognition.models import CognitionFrame
+from ..common.factories import LogFactory
+from ..cognition.factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestKeysetIterator:
+    @pytest.mark.django_db
+    def test_iterates_all_rows_in_order(self, django_assert_num_queries):
+        log = LogFactory.create()
+        for frame_number in [7, 3, 9, 1, 5]:
+            CognitionFrameFactory.create(log=log, frame_number=frame_number)
+
+        queryset = CognitionFrame.objects.filter(log=log).values("frame_number")
+        # 5 rows with 2 rows per chunk need three queries
+        with django_assert_num_queries(3):
+            rows = list(keyset_iterator(queryset, "frame_number", chunk_size=2))
+
+        assert [row["frame_number"] for row in rows] == [1, 3, 5, 7, 9]
+
+    @pytest.mark.django_db
+    def test_null_keys(self):
+        log = LogFactory.create()
+        for frame_number in [None, 1]:
+            CognitionFrameFactory.create(log=log, frame_number=frame_number)
+
+        queryset = CognitionFrame.objects.filter(log=log).values("frame_number")
+        rows = list(keyset_iterator(queryset, "frame_number", chunk_size=2))
+        # nulls are sorted last, the iteration ends there instead of starting over
+        assert [row["frame_number"] for row in rows] == [1, None]
+
+        with pytest.raises(ValueError):
+            list(keyset_iterator(queryset, "frame_number", chunk_size=0))
@@ -0,0 +1,22 @@
+import io
+import pytest
+from rest_framework.exceptions import ParseError
+from core.parsers import NDJSONParser
+
+pytestmark = pytest.mark.unit
+
+
+class TestNDJSONParser:
+    def test_parse_rows(self):
+        body = b'{"frame": 1, "representation_data": {}}\n\n{"frame": 2, "representation_data": {"a": 1}}\n'
+        rows = NDJSONParser().parse(io.BytesIO(body))
+
+        assert next(rows) == {"frame": 1, "representation_data": {}}
+        assert list(rows) == [{"frame": 2, "representation_data": {"a": 1}}]
+
+    def test_invalid_line(self):
+        rows = NDJSONParser().parse(io.BytesIO(b'{"frame": 1}\n{"frame":\n'))
+
+        assert next(rows) == {"frame": 1}
+        with pytest.raises(ParseError):
+            next(rows)
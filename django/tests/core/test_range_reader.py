@@ -0,0 +1,35 @@
+import pytest
+from core.range_reader import coalesce_ranges, read_ranges
+
+pytestmark = pytest.mark.unit
+
+
+class TestRangeReader:
+    def test_coalesce(self):
+        ranges = [(100, 10), (0, 10), (12, 5), (1000, 1)]
+        blocks = coalesce_ranges(ranges, max_gap=10, max_read_size=200)
+        assert blocks == [(0, 17, [1, 2]), (100, 110, [0]), (1000, 1001, [3])]
+
+    def test_max_read_size(self):
+        ranges = [(0, 10), (10, 10), (20, 10)]
+        blocks = coalesce_ranges(ranges, max_gap=0, max_read_size=20)
+        assert blocks == [(0, 20, [0, 1]), (20, 30, [2])]
+
+    def test_read(self, tmp_path):
+        path = tmp_path / "a.log"
+        path.write_bytes(bytes(range(256)))
+        ranges = [(200, 3), (0, 2), (5, 0), (3, 4)]
+
+        result = read_ranges(path, ranges, max_gap=16)
+        assert [bytes(data) for data in result] == [
+            bytes([200, 201, 202]),
+            bytes([0, 1]),
+            b"",
+            bytes([3, 4, 5, 6]),
+        ]
+
+    def test_read_beyond_end(self, tmp_path):
+        path = tmp_path / "a.log"
+        path.write_bytes(b"abc")
+        with pytest.raises(EOFError):
+            read_ranges(path, [(2, 5)])
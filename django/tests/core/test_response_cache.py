@@ -0,0 +1,28 @@
+import pytest
+from core.response_cache import bump_log_versions, log_version
+from ..cognition.factories import CognitionFrameFactory
+from ..common.factories import LogFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestResponseCache:
+    def test_bump(self):
+        version = log_version(1)
+        assert log_version("1") == version
+        bump_log_versions(1)
+        assert log_version(1) != version
+
+    @pytest.mark.django_db
+    def test_cached_list(self, admin_client):
+        log = LogFactory.create()
+        CognitionFrameFactory.create(log=log)
+        url = f"/api/cognitionframe/?log={log.id}"
+
+        assert len(admin_client.get(url).json()) == 1
+
+        # changes that do not go through the api are not seen until the log is bumped
+        CognitionFrameFactory.create(log=log)
+        assert len(admin_client.get(url).json()) == 1
+        bump_log_versions(log.id)
+        assert len(admin_client.get(url).json()) == 2
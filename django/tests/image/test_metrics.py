@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+from image import metrics
+from image.models import NaoImage
+from ..cognition.factories import CognitionFrameFactory
+from ..common.factories import LogFactory
+
+pytestmark = pytest.mark.unit
+
+
+def write_raw(path, luminance):
+    # YUYV with constant chroma
+    data = np.full(luminance.size * 2, 128, dtype=np.uint8)
+    data[::2] = luminance.ravel()
+    data.tofile(path)
+
+
+class TestImageMetrics:
+    def test_laplacian_variance(self):
+        flat = np.full((10, 10), 100, dtype=np.float32)
+        assert metrics.laplacian_variance(flat) == 0
+
+        checkerboard = (np.indices((10, 10)).sum(axis=0) % 2 * 255).astype(np.float32)
+        assert metrics.laplacian_variance(checkerboard) > 0
+
+    def test_compute_raw_metrics(self, tmp_path):
+        luminance = np.full((metrics.RAW_HEIGHT, metrics.RAW_WIDTH), 60, dtype=np.uint8)
+        write_raw(tmp_path / "frame.raw", luminance)
+        assert metrics.compute_metrics(tmp_path / "frame.raw", "RAW") == (0, 60, 0)
+
+    @pytest.mark.django_db
+    def test_command(self, settings, tmp_path):
+        settings.IMAGE_ROOT = tmp_path
+        log = LogFactory.create()
+        luminance = np.zeros((metrics.RAW_HEIGHT, metrics.RAW_WIDTH), dtype=np.uint8)
+        luminance[:, ::2] = 200
+        write_raw(tmp_path / "1.raw", luminance)
+
+        frame = CognitionFrameFactory.create(log=log)
+        image = NaoImage.objects.create(
+            frame=frame, camera="TOP", type="RAW", image_url="1.raw"
+        )
+        done = NaoImage.objects.create(
+            frame=frame,
+            camera="BOTTOM",
+            type="RAW",
+            image_url="1.raw",
+            blurredness_value=1,
+            brightness_value=1,
+            phash=1,
+        )
+        # unreadable images are skipped
+        NaoImage.objects.create(
+            frame=frame, camera="TOP", type="RAW", image_url="missing.raw"
+        )
+
+        call_command("compute_image_metrics", log.id, workers=1)
+
+        image.refresh_from_db()
+        done.refresh_from_db()
+        assert image.brightness_value == 100
+        assert image.blurredness_value > 0
+        assert image.phash is not None
+        assert (done.blurredness_value, done.brightness_value) == (1, 1)
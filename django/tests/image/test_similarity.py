@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from image.models import NaoImage
+from image.similarity import deduplicate, dhash, hamming_distance, similar_images
+from ..cognition.factories import CognitionFrameFactory
+from ..common.factories import LogFactory
+
+pytestmark = pytest.mark.unit
+
+
+def create_images(log, hashes, camera="TOP"):
+    return [
+        NaoImage.objects.create(
+            frame=CognitionFrameFactory.create(log=log, frame_number=i),
+            camera=camera,
+            phash=phash,
+        )
+        for i, phash in enumerate(hashes)
+    ]
+
+
+class TestSimilarity:
+    def test_dhash(self):
+        gradient = np.tile(np.arange(640, dtype=np.float32), (480, 1))
+        # every cell is brighter than its left neighbour, all 64 bits are set
+        assert dhash(gradient) == -1
+        assert dhash(gradient[:, ::-1]) == 0
+
+        noise = np.random.default_rng(0).random((480, 640), dtype=np.float32) * 255
+        assert hamming_distance(dhash(noise), dhash(noise + 1)) == 0
+
+    def test_hamming_distance(self):
+        assert hamming_distance(-1, 0) == 64
+        assert hamming_distance(0b1011, 0b0001) == 2
+
+    @pytest.mark.django_db
+    def test_similar_images(self):
+        log = LogFactory.create()
+        other_log = LogFactory.create()
+        base = 0x0123456789ABCDEF
+        near, far, flipped_bands = create_images(
+            log,
+            [
+                base ^ 0b101,
+                base ^ 0xFF,
+                # differs in every 16 bit band
+                base ^ 0x0001000100010001,
+            ],
+        )
+        [other] = create_images(other_log, [base])
+
+        assert [(i.id, i.distance) for i in similar_images(base, 3)] == [
+            (other.id, 0),
+            (near.id, 2),
+        ]
+        assert [i.id for i in similar_images(base, 3, log.id)] == [near.id]
+        # the band index can not find it, the log is scanned instead
+        assert [i.id for i in similar_images(base, 4, log.id)] == [
+            near.id,
+            flipped_bands.id,
+        ]
+        assert [i.id for i in similar_images(base, 8, log.id)] == [
+            near.id,
+            flipped_bands.id,
+            far.id,
+        ]
+        with pytest.raises(ValueError):
+            similar_images(base, 4)
+
+    @pytest.mark.django_db
+    def test_deduplicate(self):
+        log = LogFactory.create()
+        top = create_images(log, [0, 1, 3, 0xFFFF, None])
+        bottom = create_images(LogFactory.create(), [0], camera="BOTTOM")
+        NaoImage.objects.filter(id=bottom[0].id).update(frame=top[1].frame)
+
+        # 1 and 3 are close to 0, 0xFFFF is not, images without hash are kept
+        assert deduplicate(log.id, 4) == [
+            top[0].id,
+            bottom[0].id,
+            top[3].id,
+            top[4].id,
+        ]
+        assert deduplicate(log.id, 4, camera="TOP") == [
+            top[0].id,
+            top[3].id,
+            top[4].id,
+        ]
+
+    @pytest.mark.django_db
+    def test_views(self, auth_client):
+        log = LogFactory.create()
+        image, near, inverted = create_images(log, [0, 1, -1])
+
+        response = auth_client.get(f"/api/images/{image.id}/similar/?distance=2")
+        assert response.status_code == 200
+        assert [(r["id"], r["distance"]) for r in response.json()] == [(near.id, 1)]
+
+        # the default distance is answered from the indexes
+        response = auth_client.get(f"/api/images/{image.id}/similar/")
+        assert [r["id"] for r in response.json()] == [near.id]
+
+        response = auth_client.get(f"/api/images/deduplicated/?log={log.id}")
+        assert response.json() == {"count": 2, "ids": [image.id, inverted.id]}
+
+        for url in [
+            f"/api/images/{image.id}/similar/?distance=x",
+            f"/api/images/{image.id}/similar/?distance=8&log=x",
+            "/api/images/deduplicated/?log=x",
+            f"/api/images/deduplicated/?log={log.id}&distance=x",
+        ]:
+            assert auth_client.get(url).status_code == 400
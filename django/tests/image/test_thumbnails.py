@@ -0,0 +1,102 @@
+import io
+import os
+import threading
+import pytest
+from PIL import Image
+from image import thumbnails
+from image.models import NaoImage
+from ..cognition.factories import CognitionFrameFactory
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def roots(settings, tmp_path):
+    settings.IMAGE_ROOT = tmp_path / "images"
+    settings.THUMBNAIL_ROOT = tmp_path / "thumbnails"
+    settings.IMAGE_ROOT.mkdir()
+    return settings
+
+
+class TestThumbnails:
+    def test_evict(self, roots):
+        for i in range(5):
+            path = roots.THUMBNAIL_ROOT / f"{i:02x}" / f"{i}.webp"
+            path.parent.mkdir(parents=True)
+            path.write_bytes(b"x" * 100)
+            # file 0 is the least recently used one
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+
+        assert thumbnails.evict(500) == 0
+        # removes files until the cache is below 90% of the limit
+        assert thumbnails.evict(400) == 2
+        assert sorted(p.name for p in roots.THUMBNAIL_ROOT.glob("*/*")) == [
+            "2.webp",
+            "3.webp",
+            "4.webp",
+        ]
+
+    def test_background_eviction(self, roots, monkeypatch):
+        roots.THUMBNAIL_CACHE_SIZE = 1000
+        calls = []
+        done = threading.Event()
+
+        def evict(max_size):
+            calls.append((max_size, threading.current_thread()))
+            done.set()
+
+        monkeypatch.setattr(thumbnails, "evict", evict)
+        thumbnails._track_written(100)
+        assert done.wait(5)
+        assert calls[0][0] == 1000
+        assert calls[0][1] is not threading.current_thread()
+
+    def test_open_evicted(self, roots, monkeypatch):
+        Image.new("RGB", (640, 480), "red").save(roots.IMAGE_ROOT / "frame.png")
+        get_thumbnail = thumbnails.get_thumbnail
+        calls = []
+
+        def evicted_after_lookup(*args):
+            path = get_thumbnail(*args)
+            if not calls:
+                path.unlink()
+            calls.append(path)
+            return path
+
+        monkeypatch.setattr(thumbnails, "get_thumbnail", evicted_after_lookup)
+        with thumbnails.open_thumbnail("frame.png") as f:
+            assert f.read(4) == b"RIFF"
+        assert len(calls) == 2
+
+    @pytest.mark.django_db
+    def test_thumbnail_view(self, auth_client, roots):
+        Image.new("RGB", (640, 480), "red").save(roots.IMAGE_ROOT / "frame.png")
+        image = NaoImage.objects.create(
+            frame=CognitionFrameFactory.create(), camera="TOP", image_url="frame.png"
+        )
+
+        response = auth_client.get(f"/api/images/{image.id}/")
+        assert response.json()["thumbnails"] == {
+            "small": f"/api/images/{image.id}/thumbnail/?size=small",
+            "medium": f"/api/images/{image.id}/thumbnail/?size=medium",
+        }
+
+        response = auth_client.get(
+            f"/api/images/{image.id}/thumbnail/?size=medium&image_format=jpeg"
+        )
+        assert response.status_code == 200
+        assert response["Content-Type"] == "image/jpeg"
+        with Image.open(io.BytesIO(b"".join(response.streaming_content))) as thumbnail:
+            assert thumbnail.size == (320, 240)
+
+        # the second request is served from the cache
+        [cached] = roots.THUMBNAIL_ROOT.glob("*/*.jpg")
+        assert thumbnails.get_thumbnail("frame.png", "medium", "jpeg") == cached
+
+    @pytest.mark.django_db
+    def test_thumbnail_missing_file(self, auth_client, roots):
+        image = NaoImage.objects.create(
+            frame=CognitionFrameFactory.create(), camera="TOP", image_url="missing.png"
+        )
+        response = auth_client.get(f"/api/images/{image.id}/thumbnail/")
+        assert response.status_code == 404
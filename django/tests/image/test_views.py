@@ -0,0 +1,123 @@
+import pytest
+from django.core.cache import cache
+from annotation.models import Annotation
+from behavior.models import GameStateTimeline
+from cognition import frame_bitmap
+from cognition.models import FrameFilter
+from image.models import NaoImage
+from ..common.factories import LogFactory
+from ..cognition.factories import CognitionFrameFactory
+from ..user.factories import UserFactory
+
+pytestmark = pytest.mark.unit
+
+
+class TestImageWindow:
+    @pytest.mark.django_db
+    def test_image_window(self, auth_client):
+        log = LogFactory.create()
+        frames = {
+            n: CognitionFrameFactory.create(log=log, frame_number=n, frame_time=n * 33)
+            for n in [10, 20, 30, 40, 50]
+        }
+        bottom = NaoImage.objects.create(
+            frame=frames[30], camera="BOTTOM", image_url="30_bottom.png"
+        )
+        NaoImage.objects.create(frame=frames[30], camera="TOP", image_url="30_top.png")
+        NaoImage.objects.create(
+            frame=frames[40], camera="BOTTOM", image_url="40_bottom.png"
+        )
+        Annotation.objects.create(
+            image=bottom, type="bbox", class_name="ball", data={"x": 0.5}
+        )
+
+        response = auth_client.get(
+            f"/api/image-window/?log={log.id}&frame_number=30&before=1&after=2"
+        )
+
+        assert response.status_code == 200
+        frames = response.json()["frames"]
+        assert [
+            (f["index"], f["frame_number"], f["prev_frame"], f["next_frame"])
+            for f in frames
+        ] == [(1, 20, 10, 30), (2, 30, 20, 40), (3, 40, 30, 50), (4, 50, 40, None)]
+        assert frames[0]["images"] == {}
+        assert frames[1]["frame_time"] == 990
+        images = frames[1]["images"]
+        assert images["TOP"]["image_url"] == "30_top.png"
+        assert images["TOP"]["annotations"] == []
+        assert images["BOTTOM"]["id"] == bottom.id
+        [annotation] = images["BOTTOM"]["annotations"]
+        assert annotation["frame_number"] == "30"
+        assert annotation["image_url"] == "30_bottom.png"
+        assert annotation["color"] == "#b31290"
+        assert frames[2]["images"]["BOTTOM"]["image_url"] == "40_bottom.png"
+
+    @pytest.mark.django_db
+    def test_image_window_requires_frame(self, auth_client):
+        log = LogFactory.create()
+        response = auth_client.get(f"/api/image-window/?log={log.id}")
+        assert response.status_code == 400
+        response = auth_client.get(f"/api/image-window/?log={log.id}&frame_number=x")
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_image_window_negative_size(self, auth_client):
+        log = LogFactory.create()
+        for n in [10, 20, 30]:
+            CognitionFrameFactory.create(log=log, frame_number=n)
+
+        response = auth_client.get(
+            f"/api/image-window/?log={log.id}&frame_number=20&before=-5&after=-1"
+        )
+        assert [f["frame_number"] for f in response.json()["frames"]] == [20]
+
+    @pytest.mark.django_db
+    def test_image_window_filter(self, superuser, superuser_client):
+        log = LogFactory.create()
+        for n in [10, 20, 30]:
+            CognitionFrameFactory.create(log=log, frame_number=n)
+        own = FrameFilter.objects.create(
+            log=log, user=superuser, name="own", bitmap=frame_bitmap.encode([10, 30])
+        )
+        url = f"/api/image-window/?log={log.id}&frame_number=30&before=1&after=1"
+
+        response = superuser_client.get(f"{url}&filter={own.id}")
+        assert [f["frame_number"] for f in response.json()["frames"]] == [10, 30]
+
+        other_log = FrameFilter.objects.create(
+            log=LogFactory.create(), user=superuser, name="other log"
+        )
+        other_user = FrameFilter.objects.create(
+            log=log, user=UserFactory.create(), name="other user"
+        )
+        for filter_id, status_code in [
+            (other_log.id, 404),
+            (other_user.id, 404),
+            ("x", 400),
+        ]:
+            response = superuser_client.get(f"{url}&filter={filter_id}")
+            assert response.status_code == status_code
+
+
+class TestSynchronizedImage:
+    @pytest.mark.django_db
+    def test_synchronized_image(self, auth_client):
+        log = LogFactory.create()
+        url = f"/api/image-sync/?log={log.id}&time=1&camera=TOP"
+        # no standby frame
+        assert auth_client.get(url).status_code == 404
+
+        GameStateTimeline.objects.update_or_create(
+            log=log, defaults={"first_standby_time": 1000}
+        )
+        # no frames
+        assert auth_client.get(url).status_code == 404
+
+        frame = CognitionFrameFactory.create(log=log, frame_number=1, frame_time=2000)
+        cache.clear()
+        # no image
+        assert auth_client.get(url).status_code == 404
+
+        NaoImage.objects.create(frame=frame, camera="TOP", image_url="1_top.png")
+        assert auth_client.get(url).json() == {"url": "1_top.png"}
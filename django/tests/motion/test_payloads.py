@@ -0,0 +1,60 @@
+import pytest
+from core.mmap_pool import mmap_pool
+from motion.models import IMUData, MotionFrame
+from motion.payloads import decode_payloads, export_size, stream_payloads
+from ..common.factories import LogFactory
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def sensor_log(tmp_path):
+    path = tmp_path / "sensor.log"
+    path.write_bytes(b"aaaa" + b"bb" + b"cccccc")
+    return path
+
+
+class TestPayloads:
+    def test_roundtrip(self, sensor_log):
+        rows = [(1, 0, 4), (2, 4, 2), (3, 6, 6)]
+        data = b"".join(stream_payloads(sensor_log, rows, chunk_size=8))
+
+        assert len(data) == export_size(rows)
+        assert decode_payloads(data) == [(1, b"aaaa"), (2, b"bb"), (3, b"cccccc")]
+
+    def test_empty(self, sensor_log):
+        assert decode_payloads(b"".join(stream_payloads(sensor_log, []))) == []
+
+    @pytest.mark.django_db
+    def test_binary_endpoint(self, admin_client, sensor_log, settings):
+        settings.LOG_ROOT = str(sensor_log.parent)
+        log = LogFactory.create(sensor_log_path=sensor_log.name)
+        for frame_number, start_pos, size in [(1, 0, 4), (2, 4, 2), (3, 6, 6)]:
+            frame = MotionFrame.objects.create(log=log, frame_number=frame_number)
+            IMUData.objects.create(frame=frame, start_pos=start_pos, size=size)
+
+        response = admin_client.get(f"/api/motion/IMUData/binary/?log={log.id}&start=2")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/octet-stream"
+        data = b"".join(response.streaming_content)
+        assert decode_payloads(data) == [(2, b"bb"), (3, b"cccccc")]
+
+        for query in ["log=x", f"log={log.id}&start=x", f"log={log.id}&end=1.5"]:
+            response = admin_client.get(f"/api/motion/IMUData/binary/?{query}")
+            assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_list_endpoint(self, admin_client, sensor_log, settings):
+        settings.LOG_ROOT = str(sensor_log.parent)
+        log = LogFactory.create(sensor_log_path=sensor_log.name)
+        frame = MotionFrame.objects.create(log=log, frame_number=1)
+        IMUData.objects.create(frame=frame, start_pos=4, size=2)
+        mmap_pool.clear()
+
+        response = admin_client.get(f"/api/motion/IMUData/?log={log.id}")
+        assert response.status_code == 200
+        assert response.json()["results"][0]["binary_data"] == list(b"bb")
+        # the log file stays mapped for the next page
+        with mmap_pool.open(sensor_log) as data:
+            assert data is mmap_pool._mappings[str(sensor_log)].data
+        mmap_pool.clear()